@@ -1,8 +1,13 @@
+import argparse
+import csv
 import json
 import numpy as np
-from typing import List, Dict, Tuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 from sklearn.metrics import precision_score, recall_score, f1_score, accuracy_score
 import os
+import re
+import time
 import logging
 
 # Configure logging
@@ -12,8 +17,12 @@ logger = logging.getLogger(__name__)
 # Temporarily disable LLM for testing
 os.environ['USE_LLM_ENHANCEMENT'] = 'false'
 
+from evaluation_metrics import MetricsAccumulator, score_case
 from ml_enhancer import MLEnhancer
 
+ENGINES = ('original', 'enhanced')
+SECTION_SEPARATOR = re.compile(r'[;,|\s]+')
+
 class AccuracyEvaluator:
     def __init__(self):
         """Initialize the accuracy evaluator"""
@@ -119,40 +128,13 @@ class AccuracyEvaluator:
     def evaluate_single_case(self, test_case: Dict) -> Dict:
         """Evaluate a single test case"""
         query = test_case["query"]
-        expected_sections = set(test_case["expected_sections"])
         
         # Get predictions from ML enhancer
+        start = time.perf_counter()
         relevant_sections = self.ml_enhancer.find_relevant_sections_enhanced(query)
-        predicted_sections = set([section['section_number'] for section in relevant_sections])
-        
-        # Calculate metrics
-        true_positives = len(expected_sections.intersection(predicted_sections))
-        false_positives = len(predicted_sections - expected_sections)
-        false_negatives = len(expected_sections - predicted_sections)
-        
-        precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-        recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-        accuracy = 1 if expected_sections == predicted_sections else 0
-        
-        # Calculate confidence scores
-        avg_confidence = np.mean([section['score'] for section in relevant_sections]) if relevant_sections else 0
+        latency_ms = (time.perf_counter() - start) * 1000
         
-        return {
-            "query": query,
-            "expected_sections": list(expected_sections),
-            "predicted_sections": list(predicted_sections),
-            "precision": precision,
-            "recall": recall,
-            "f1_score": f1,
-            "accuracy": accuracy,
-            "avg_confidence": avg_confidence,
-            "true_positives": true_positives,
-            "false_positives": false_positives,
-            "false_negatives": false_negatives,
-            "category": test_case["category"],
-            "description": test_case["description"]
-        }
+        return score_case(test_case, relevant_sections, latency_ms)
     
     def evaluate_all_cases(self) -> Dict:
         """Evaluate all test cases and calculate overall metrics"""
@@ -174,59 +156,18 @@ class AccuracyEvaluator:
     
     def calculate_overall_metrics(self, results: List[Dict]) -> Dict:
         """Calculate overall accuracy metrics"""
-        total_cases = len(results)
-        
-        # Micro-averaging for precision, recall, F1
-        total_tp = sum(r['true_positives'] for r in results)
-        total_fp = sum(r['false_positives'] for r in results)
-        total_fn = sum(r['false_negatives'] for r in results)
-        
-        micro_precision = total_tp / (total_tp + total_fp) if (total_tp + total_fp) > 0 else 0
-        micro_recall = total_tp / (total_tp + total_fn) if (total_tp + total_fn) > 0 else 0
-        micro_f1 = 2 * (micro_precision * micro_recall) / (micro_precision + micro_recall) if (micro_precision + micro_recall) > 0 else 0
-        
-        # Macro-averaging
-        macro_precision = np.mean([r['precision'] for r in results])
-        macro_recall = np.mean([r['recall'] for r in results])
-        macro_f1 = np.mean([r['f1_score'] for r in results])
-        
-        # Overall accuracy
-        overall_accuracy = np.mean([r['accuracy'] for r in results])
-        avg_confidence = np.mean([r['avg_confidence'] for r in results])
-        
-        return {
-            "total_cases": total_cases,
-            "micro_precision": micro_precision,
-            "micro_recall": micro_recall,
-            "micro_f1": micro_f1,
-            "macro_precision": macro_precision,
-            "macro_recall": macro_recall,
-            "macro_f1": macro_f1,
-            "overall_accuracy": overall_accuracy,
-            "avg_confidence": avg_confidence
-        }
+        return self.accumulate(results).overall()
     
     def calculate_category_metrics(self, results: List[Dict]) -> Dict:
         """Calculate metrics by category"""
-        categories = {}
-        
+        return self.accumulate(results).categories()
+    
+    @staticmethod
+    def accumulate(results: List[Dict]) -> MetricsAccumulator:
+        accumulator = MetricsAccumulator()
         for result in results:
-            category = result['category']
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(result)
-        
-        category_metrics = {}
-        for category, category_results in categories.items():
-            category_metrics[category] = {
-                "count": len(category_results),
-                "avg_precision": np.mean([r['precision'] for r in category_results]),
-                "avg_recall": np.mean([r['recall'] for r in category_results]),
-                "avg_f1": np.mean([r['f1_score'] for r in category_results]),
-                "avg_accuracy": np.mean([r['accuracy'] for r in category_results])
-            }
-        
-        return category_metrics
+            accumulator.add(result)
+        return accumulator
     
     def generate_accuracy_report(self) -> str:
         """Generate a comprehensive accuracy report"""
@@ -295,8 +236,187 @@ class AccuracyEvaluator:
         
         return report
 
+# Labelled case files
+def parse_test_case(row: Dict) -> Optional[Dict]:
+    """A test case from a JSONL object or CSV row, or None when it has no query or expected sections"""
+    query = (row.get('query') or '').strip()
+    expected_sections = row.get('expected_sections') or []
+    if isinstance(expected_sections, str):
+        expected_sections = [section for section in SECTION_SEPARATOR.split(expected_sections) if section]
+    expected_sections = [str(section) for section in expected_sections]
+    if not query or not expected_sections:
+        return None
+    return {
+        "query": query,
+        "expected_sections": expected_sections,
+        "category": (row.get('category') or '').strip() or 'uncategorized',
+        "description": (row.get('description') or '').strip() or query
+    }
+
+
+def iter_test_cases(path: str) -> Iterator[Dict]:
+    """Stream test cases from a .jsonl or .csv file without loading it into memory
+
+    JSONL lines and CSV rows carry query, expected_sections, category and
+    description; in CSV (or as a JSON string) expected sections are separated
+    by commas, semicolons, pipes or spaces. Rows without a query or expected
+    sections are skipped with a warning.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = enumerate(csv.DictReader(f), 2)
+        else:
+            rows = ((line_number, json.loads(line)) for line_number, line in enumerate(f, 1) if line.strip())
+        for line_number, row in rows:
+            test_case = parse_test_case(row)
+            if test_case is None:
+                logger.warning(f"Skipping {path}:{line_number}: missing query or expected sections")
+                continue
+            yield test_case
+
+
+def load_engine(name: str):
+    """A retrieval engine exposing find_relevant_sections_enhanced"""
+    if name == 'enhanced':
+        from improve_accuracy import AccuracyImprover
+        return AccuracyImprover()
+    return MLEnhancer()
+
+
+# Process pool workers build their engine once, in the initializer
+_worker_engine = None
+
+
+def _init_worker(engine_name: str):
+    global _worker_engine
+    _worker_engine = load_engine(engine_name)
+
+
+def _evaluate_chunk(test_cases: List[Dict]) -> List[Dict]:
+    results = []
+    for test_case in test_cases:
+        start = time.perf_counter()
+        relevant_sections = _worker_engine.find_relevant_sections_enhanced(test_case["query"])
+        latency_ms = (time.perf_counter() - start) * 1000
+        results.append(score_case(test_case, relevant_sections, latency_ms))
+    return results
+
+
+def _chunked(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_json_atomic(path: str, payload: Dict):
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def evaluate_case_file(path: str, engine: str = 'original', workers: int = 1, chunk_size: int = 32,
+                       metrics_output: str = 'accuracy_metrics.json', results_output: Optional[str] = None,
+                       write_every: int = 500) -> Dict:
+    """Evaluate a labelled case file in parallel, aggregating metrics as results arrive
+
+    Cases are read lazily and sent to the pool in chunks, with at most two
+    chunks per worker in flight. Overall, per-category and latency metrics
+    are rewritten to metrics_output every write_every cases and at the end;
+    each case result is appended to results_output (JSONL) when given.
+    """
+    accumulator = MetricsAccumulator()
+    started_at = time.time()
+    results_file = open(results_output, 'w', encoding='utf-8') if results_output else None
+    last_written = 0
+
+    def snapshot(status: str) -> Dict:
+        elapsed = time.time() - started_at
+        return {
+            "status": status,
+            "cases_file": path,
+            "engine": engine,
+            "workers": workers,
+            "evaluated_cases": accumulator.totals.count,
+            "elapsed_seconds": round(elapsed, 3),
+            "cases_per_second": round(accumulator.totals.count / elapsed, 2) if elapsed > 0 else 0,
+            "overall_metrics": accumulator.overall(),
+            "latency": accumulator.latency(),
+            "category_metrics": accumulator.categories()
+        }
+
+    def collect(results: List[Dict]):
+        nonlocal last_written
+        for result in results:
+            accumulator.add(result)
+            if results_file:
+                results_file.write(json.dumps(result) + "\n")
+        if metrics_output and accumulator.totals.count - last_written >= write_every:
+            last_written = accumulator.totals.count
+            write_json_atomic(metrics_output, snapshot("running"))
+            logger.info(f"Evaluated {last_written} cases - micro F1: {accumulator.overall()['micro_f1']:.3f}")
+
+    chunks = _chunked(iter_test_cases(path), chunk_size)
+    try:
+        if workers <= 1:
+            _init_worker(engine)
+            for chunk in chunks:
+                collect(_evaluate_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine,)) as pool:
+                pending = set()
+                for chunk in chunks:
+                    pending.add(pool.submit(_evaluate_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future.result())
+                for future in pending:
+                    collect(future.result())
+    finally:
+        if results_file:
+            results_file.close()
+
+    final = snapshot("completed")
+    if metrics_output:
+        write_json_atomic(metrics_output, final)
+    return final
+
+
 def main():
     """Run accuracy evaluation"""
+    parser = argparse.ArgumentParser(description="Evaluate IPC section retrieval against labelled cases")
+    parser.add_argument('--cases', help="JSONL or CSV file of labelled cases (default: the built-in test cases)")
+    parser.add_argument('--engine', choices=ENGINES, default='original')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes, each with its own engine (1 evaluates in this process)")
+    parser.add_argument('--chunk-size', type=int, default=32, help="cases sent to a worker at a time")
+    parser.add_argument('--metrics-output', default='accuracy_metrics.json',
+                        help="overall, per-category and latency metrics, rewritten while running")
+    parser.add_argument('--write-every', type=int, default=500, help="rewrite the metrics file every N cases")
+    parser.add_argument('--results-output', help="append each case result to this JSONL file")
+    args = parser.parse_args()
+
+    if args.cases:
+        metrics = evaluate_case_file(
+            args.cases, engine=args.engine, workers=args.workers, chunk_size=args.chunk_size,
+            metrics_output=args.metrics_output, results_output=args.results_output, write_every=args.write_every
+        )
+        overall = metrics['overall_metrics']
+        print(f"Evaluated {overall['total_cases']} cases in {metrics['elapsed_seconds']:.1f}s "
+              f"({metrics['cases_per_second']:.1f}/s)")
+        print(f"Micro F1: {overall['micro_f1']:.1%} | Macro F1: {overall['macro_f1']:.1%} | "
+              f"Accuracy: {overall['overall_accuracy']:.1%}")
+        if metrics['latency']:
+            print(f"Latency p50/p95/p99: {metrics['latency']['p50_ms']:.1f}/{metrics['latency']['p95_ms']:.1f}/"
+                  f"{metrics['latency']['p99_ms']:.1f} ms")
+        print(f"📄 Metrics saved to '{args.metrics_output}'")
+        return
+
     evaluator = AccuracyEvaluator()
     report = evaluator.generate_accuracy_report()
     print(report)
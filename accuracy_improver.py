@@ -2,11 +2,13 @@ import json
 import numpy as np
 from typing import List, Dict, Tuple
 import re
-from difflib import SequenceMatcher
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import logging
-from collections import defaultdict
+
+from keyword_index import FuzzyKeywordIndex, MatchedKeywordEngine
+from pattern_automaton import PatternAutomaton
+from section_store import SectionHit, get_section_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,9 +18,17 @@ class AccuracyImprover:
     def __init__(self):
         """Initialize the accuracy improver"""
         self.ipc_sections = self.load_ipc_sections()
-        self.expanded_sections = self.expand_ipc_sections()
         self.legal_synonyms = self.load_legal_synonyms()
         self.crime_patterns = self.load_crime_patterns()
+        self.expanded_sections = self.expand_ipc_sections()
+        self.keyword_index = FuzzyKeywordIndex(
+            [section.get('expanded_keywords', section['keywords']) for section in self.expanded_sections],
+            min_similarity=0.4
+        )
+        self.matched_keyword_engine = MatchedKeywordEngine(self.keyword_index, threshold=0.6)
+        self.pattern_automaton = PatternAutomaton(self.crime_patterns)
+        self.category_sections = self.build_category_sections('keywords')
+        self.expanded_category_sections = self.build_category_sections('expanded_keywords')
         
         # Enhanced TF-IDF with better parameters
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -32,14 +42,8 @@ class AccuracyImprover:
         self.precompute_embeddings()
         
     def load_ipc_sections(self) -> List[Dict]:
-        """Load IPC sections from JSON file"""
-        try:
-            with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('sections', [])
-        except Exception as e:
-            logger.error(f"Failed to load IPC sections: {e}")
-            return []
+        """IPC sections from the shared read-only section store"""
+        return get_section_store().sections
     
     def load_legal_synonyms(self) -> Dict[str, List[str]]:
         """Load legal synonyms and terminology"""
@@ -107,8 +111,6 @@ class AccuracyImprover:
         expanded = []
         
         for section in self.ipc_sections:
-            expanded_section = section.copy()
-            
             # Add synonyms for existing keywords
             expanded_keywords = set(section['keywords'])
             for keyword in section['keywords']:
@@ -131,8 +133,7 @@ class AccuracyImprover:
             ]
             expanded_keywords.update(legal_terms)
             
-            expanded_section['expanded_keywords'] = list(expanded_keywords)
-            expanded.append(expanded_section)
+            expanded.append(section.with_expanded_keywords(list(expanded_keywords)))
         
         return expanded
     
@@ -197,14 +198,18 @@ class AccuracyImprover:
     
     def pattern_matching(self, query: str) -> Dict[str, float]:
         """Enhanced pattern matching for crime detection"""
-        pattern_scores = defaultdict(float)
-        
-        for category, patterns in self.crime_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query.lower()):
-                    pattern_scores[category] += 1.0
-        
-        return dict(pattern_scores)
+        return self.pattern_automaton.scan(query)
+    
+    def build_category_sections(self, keywords_field: str) -> Dict[str, frozenset]:
+        """Map each crime category to the sections whose title or keywords mention it"""
+        category_sections = {}
+        for category in self.crime_patterns:
+            category_sections[category] = frozenset(
+                idx for idx, section in enumerate(self.expanded_sections)
+                if category in section['title'].lower()
+                or category in ' '.join(section.get(keywords_field, section['keywords'])).lower()
+            )
+        return category_sections
     
     def tfidf_search_enhanced(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
         """Enhanced TF-IDF search with better parameters"""
@@ -238,54 +243,44 @@ class AccuracyImprover:
         if self.tfidf_matrix is not None:
             tfidf_results = self.tfidf_search_enhanced(user_input)
             for idx, score in tfidf_results:
-                section = self.expanded_sections[idx].copy()
-                
                 # Boost score based on pattern matching
                 pattern_boost = 0
                 for category, pattern_score in pattern_scores.items():
-                    if any(cat in section['title'].lower() or cat in ' '.join(section['keywords']).lower() for cat in [category]):
+                    if idx in self.category_sections.get(category, ()):
                         pattern_boost += pattern_score * 0.3
                 
-                section['score'] = score + pattern_boost
-                section['method'] = 'enhanced_tfidf'
-                section['matched_keywords'] = [kw for kw in keywords if any(
-                    SequenceMatcher(None, kw.lower(), sk.lower()).ratio() > 0.6 
-                    for sk in section.get('expanded_keywords', section['keywords'])
-                )]
-                results.append(section)
+                results.append(SectionHit(
+                    self.expanded_sections[idx], score + pattern_boost, 'enhanced_tfidf',
+                    self.matched_keyword_engine.matched_keywords(keywords, idx)
+                ))
         
         # Method 2: Enhanced keyword matching
         if not results:
-            for section in self.expanded_sections:
+            section_matches = self.keyword_index.match(keywords)
+            for section_idx, section in enumerate(self.expanded_sections):
                 score = 0
                 matched_keywords = []
                 
                 # Check against expanded keywords
-                expanded_keywords = section.get('expanded_keywords', section['keywords'])
-                
-                for keyword in keywords:
-                    for section_keyword in expanded_keywords:
-                        similarity = SequenceMatcher(None, keyword.lower(), section_keyword.lower()).ratio()
-                        if similarity > 0.8:
-                            score += similarity * 3
-                            matched_keywords.append(keyword)
-                        elif similarity > 0.6:
-                            score += similarity * 2
-                            matched_keywords.append(keyword)
-                        elif similarity > 0.4:
-                            score += similarity
+                for keyword, _, similarity in section_matches.get(section_idx, ()):
+                    if similarity > 0.8:
+                        score += similarity * 3
+                        matched_keywords.append(keyword)
+                    elif similarity > 0.6:
+                        score += similarity * 2
+                        matched_keywords.append(keyword)
+                    elif similarity > 0.4:
+                        score += similarity
                 
                 # Add pattern matching boost
                 for category, pattern_score in pattern_scores.items():
-                    if any(cat in section['title'].lower() or cat in ' '.join(expanded_keywords).lower() for cat in [category]):
+                    if section_idx in self.expanded_category_sections.get(category, ()):
                         score += pattern_score * 0.5
                 
                 if score > 0:
-                    section_copy = section.copy()
-                    section_copy['score'] = score / len(keywords) if keywords else 0
-                    section_copy['method'] = 'enhanced_keyword_matching'
-                    section_copy['matched_keywords'] = matched_keywords
-                    results.append(section_copy)
+                    results.append(SectionHit(
+                        section, score / len(keywords) if keywords else 0, 'enhanced_keyword_matching', matched_keywords
+                    ))
         
         # Sort by score and remove duplicates
         seen_sections = set()
@@ -317,7 +312,7 @@ class AccuracyImprover:
         
         report += "✅ Crime Pattern Matching:\n"
         report += f"   - Added {len(self.crime_patterns)} crime patterns\n"
-        report += "   - Regex-based pattern detection\n"
+        report += "   - Single-pass pattern automaton\n"
         report += "   - Context-aware scoring\n\n"
         
         report += "✅ Enhanced Keyword Extraction:\n"
@@ -362,7 +357,7 @@ def main():
     
     # Save enhanced sections
     with open('data/enhanced_ipc_sections.json', 'w') as f:
-        json.dump({'sections': improver.expanded_sections}, f, indent=2)
+        json.dump({'sections': [dict(section) for section in improver.expanded_sections]}, f, indent=2)
     
     print("📄 Enhanced IPC sections saved to 'data/enhanced_ipc_sections.json'")
 
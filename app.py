@@ -1,83 +1,328 @@
-from flask import Flask, request, jsonify, session
+from flask import Blueprint, Flask, Response, g, request, jsonify, send_file, session, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import hmac
 import json
 import re
 from datetime import datetime
 import os
 from difflib import SequenceMatcher
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from conversation_log import ConversationLogWriter
+from deadline_executor import CHUNK, DeadlineExecutor
+from hot_reload import EngineReloader
+from index_artifacts import ARTIFACTS_DIR, file_sha256
+from keyword_index import FuzzyKeywordIndex
+from llm_cache import get_llm_cache
+from llm_client import get_gemini_client, get_gemini_model_name, get_llm_client_mode
+from log_index import ConversationLogIndex
+from metrics import (
+    REGISTRY, STAGE_SECONDS, Counter, Gauge, Histogram, request_timings, start_request_timings, stop_request_timings
+)
+from profiling import ProfileStore, sampled
+from result_cache import ResultCache, normalize_query
+from section_edits import SECTION_EDITS_PATH, SectionEditJournal, SectionExistsError, apply_section_edit, validate_section
+from section_store import SectionHit, get_section_store, to_json_compatible
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Import enhanced ML system
-try:
-    from improve_accuracy import AccuracyImprover as EnhancedMLEnhancer
-    enhanced_ml_available = True
-    logger = logging.getLogger(__name__)
-    logger.info("Enhanced ML system loaded successfully")
-except ImportError as e:
-    logger = logging.getLogger(__name__)
-    logger.warning(f"Enhanced ML system not available: {e}")
-    enhanced_ml_available = False
-
-# Fallback to original ML enhancer (with conditional import)
-try:
-    from ml_enhancer import ml_enhancer
-    original_ml_available = True
-except ImportError as e:
-    logger.warning(f"Original ML enhancer not available: {e}")
-    original_ml_available = False
-    ml_enhancer = None
-
-app = Flask(__name__)
-# Use environment variable for secret key in production
-app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here-dev-only')
-CORS(app)
+logger = logging.getLogger(__name__)
+
+# Retrieval engine: "enhanced" (improve_accuracy) or "original" (ml_enhancer).
+# Only the selected engine is imported and built at startup; the original engine
+# is built on first use if the enhanced one is unavailable.
+ML_ENGINES = ('enhanced', 'original')
+ML_ENGINE = os.getenv('ML_ENGINE', 'enhanced').lower()
+enhanced_ml_available = False
+enhanced_ml_enhancer = None
+original_ml_available = False  # set once the original engine has been built
+_original_ml_failed = False
+_original_ml_enhancer = None
+_original_ml_lock = threading.Lock()
+
+# Duration of each startup phase in milliseconds, reported by /api/status
+_startup_started = time.perf_counter()
+startup_timings = {}
+
+# Set once an ML engine is built and has answered a warm-up lookup; reported by /api/ready
+app_ready = False
+WARMUP_QUERY = "someone stole my phone and threatened to hit me"
+
+@contextmanager
+def startup_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+IPC_DATA_PATH = 'data/ipc_sections.json'
+
+# Hot reload: the engine is rebuilt in the background and swapped in when the IPC data
+# (or the prebuilt index artifacts) change on disk, or when an admin asks for it
+IPC_DATA_AUTO_RELOAD = os.getenv('IPC_DATA_AUTO_RELOAD', 'true').lower() == 'true'
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+RELOAD_WAIT_SECONDS = float(os.getenv('RELOAD_WAIT_SECONDS', '60'))
+# Incremented on every swap and section edit; part of the result cache key
+engine_generation = 0
+
+# Admin section edits are applied to the running engine and journaled; past the
+# threshold the journal is folded into the IPC data and the engine rebuilt (compaction)
+SECTION_COMPACT_THRESHOLD = int(os.getenv('SECTION_COMPACT_THRESHOLD', '100'))
+section_journal = SectionEditJournal(SECTION_EDITS_PATH, IPC_DATA_PATH)
+section_edit_lock = threading.Lock()
+
+# Cache of section lookups shared by all analysis endpoints
+result_cache = ResultCache(
+    max_entries=int(os.getenv('RESULT_CACHE_SIZE', '1024')),
+    ttl_seconds=float(os.getenv('RESULT_CACHE_TTL', '3600'))
+)
+
+# Bounded pool for Gemini calls made on behalf of /api/analyze
+GEMINI_TIMEOUT_SECONDS = float(os.getenv('GEMINI_TIMEOUT_SECONDS', '8'))
+llm_executor = DeadlineExecutor(
+    max_workers=int(os.getenv('GEMINI_MAX_WORKERS', '4')),
+    max_pending=int(os.getenv('GEMINI_MAX_PENDING', '16'))
+)
+
+# Request metrics served on /metrics; the engines add their own stages to STAGE_SECONDS
+HTTP_REQUESTS = Counter('ipc_http_requests_total', 'HTTP requests by endpoint, method and status', ['endpoint', 'method', 'status'])
+HTTP_REQUEST_SECONDS = Histogram('ipc_http_request_duration_seconds', 'HTTP request latency by endpoint', ['endpoint'])
+HTTP_REQUESTS_IN_FLIGHT = Gauge('ipc_http_requests_in_flight', 'HTTP requests being handled, by endpoint', ['endpoint'])
+GEMINI_SUMMARIES = Counter('ipc_gemini_summaries_total', 'Deadline-bounded Gemini summaries by status', ['status'])
+SECTION_LOOKUP_SECONDS = STAGE_SECONDS.labels('section_lookup')
+RESPONSE_RENDERING_SECONDS = STAGE_SECONDS.labels('response_rendering')
+GEMINI_SUMMARY_SECONDS = STAGE_SECONDS.labels('gemini_summary')
+LOG_WRITE_SECONDS = STAGE_SECONDS.labels('log_write')
+
+# Opt-in request profiling (X-Profile header with the admin token, or PROFILE_SAMPLE_RATE)
+PROFILED_ENDPOINTS = ('/api/analyze', '/api/analyze/batch')
+profile_store = ProfileStore()
+
+# Batch analysis limits
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '500'))
+batch_summary_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BATCH_SUMMARY_CONCURRENCY', '4')),
+    thread_name_prefix='batch-llm'
+)
+
+# Conversation logging
+CONVERSATION_LOGS_ENABLED = os.getenv('ENABLE_CONVERSATION_LOGS', 'true').lower() == 'true'
+LOGS_PAGE_SIZE = int(os.getenv('LOGS_PAGE_SIZE', '50'))
+LOGS_MAX_PAGE_SIZE = int(os.getenv('LOGS_MAX_PAGE_SIZE', '500'))
+conversation_log_index = ConversationLogIndex('logs/index.sqlite3') if CONVERSATION_LOGS_ENABLED else None
+conversation_log_writer = ConversationLogWriter(
+    directory='logs',
+    index=conversation_log_index,
+    max_segment_bytes=int(float(os.getenv('LOG_SEGMENT_MAX_MB', '64')) * 1024 * 1024),
+    max_segment_seconds=float(os.getenv('LOG_SEGMENT_MAX_SECONDS', '3600')),
+    compress=os.getenv('LOG_SEGMENT_COMPRESS', 'false').lower() == 'true',
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+)
+
+api = Blueprint('api', __name__)
+
+# Serializes the read-only section records and search hits of the section store
+class SectionJSONProvider(DefaultJSONProvider):
+    @staticmethod
+    def default(o):
+        try:
+            return to_json_compatible(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
 
-# Initialize enhanced ML system
-if enhanced_ml_available:
-    try:
-        enhanced_ml_enhancer = EnhancedMLEnhancer()
-        logger.info("Enhanced ML enhancer initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize enhanced ML enhancer: {e}")
-        enhanced_ml_available = False
+# Build the selected engine
+def init_engines():
+    global enhanced_ml_available, enhanced_ml_enhancer
+    if ML_ENGINE not in ML_ENGINES:
+        raise ValueError(f"Unknown ML_ENGINE '{ML_ENGINE}', expected one of: {', '.join(ML_ENGINES)}")
+    if ML_ENGINE == 'enhanced':
+        try:
+            with startup_phase('import_enhanced_engine'):
+                from improve_accuracy import AccuracyImprover as EnhancedMLEnhancer
+            with startup_phase('build_enhanced_engine'):
+                enhanced_ml_enhancer = track_section_edits(EnhancedMLEnhancer())
+            enhanced_ml_available = True
+            logger.info("Enhanced ML enhancer initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize enhanced ML enhancer: {e}")
+    
+    if not enhanced_ml_available:
+        get_original_ml_enhancer()
 
-# Load IPC sections data (now handled by ML enhancer)
-def load_ipc_data():
+# The engine answering section lookups (None in basic mode). Callers read it once and use
+# that snapshot for the whole request, so a concurrent swap never mixes two engines.
+def get_engine():
+    if enhanced_ml_available:
+        return enhanced_ml_enhancer
+    return get_original_ml_enhancer()
+
+# Run one lookup through the selected engine so lazily built state exists before the
+# first request (and, when preloaded by gunicorn, before workers are forked)
+def warm_up(engine=None):
+    engine = engine or get_engine()
+    if engine is not None:
+        engine.find_relevant_sections_enhanced(WARMUP_QUERY)
+    else:
+        basic_keyword_matching(WARMUP_QUERY, load_ipc_data())
+
+# Build a fresh, warmed-up instance of the selected engine from the current data on disk
+def build_engine():
     if enhanced_ml_available:
-        return {"sections": enhanced_ml_enhancer.ipc_sections}
+        from improve_accuracy import AccuracyImprover as EnhancedMLEnhancer
+        engine = track_section_edits(EnhancedMLEnhancer())
+    elif get_original_ml_enhancer() is not None:
+        from ml_enhancer import MLEnhancer
+        engine = MLEnhancer()
     else:
-        return {"sections": ml_enhancer.ipc_sections}
+        # Basic mode reads the section store, which reloads itself when the file changes
+        return None
+    warm_up(engine)
+    return engine
+
+# Publish a rebuilt engine: one reference assignment, then a new cache generation
+def swap_engine(engine):
+    global enhanced_ml_enhancer, _original_ml_enhancer, engine_generation, app_ready
+    with section_edit_lock:
+        # Catch up with section edits made while it was being built
+        sync_section_edits(engine)
+        if enhanced_ml_available:
+            enhanced_ml_enhancer = engine
+        elif engine is not None:
+            _original_ml_enhancer = engine
+        engine_generation += 1
+        result_cache.invalidate()
+        # A rebuilt engine has been warmed up, also after a failed warm-up at startup
+        if engine is not None:
+            app_ready = True
+
+engine_reloader = EngineReloader(build_engine, swap_engine)
+
+# Start an engine that supports incremental section edits at the beginning of the
+# edit journal for the IPC data it was built from, and replay the journal onto it
+def track_section_edits(engine):
+    engine.section_edit_cursor = (file_sha256(IPC_DATA_PATH), 0)
+    sync_section_edits(engine)
+    return engine
+
+# Apply the journaled section edits this engine has not seen yet (ones made by
+# another worker, or before a restart); returns how many were applied
+def sync_section_edits(engine):
+    cursor = getattr(engine, 'section_edit_cursor', None)
+    if cursor is None:
+        return 0
+    base, edits = section_journal.read()
+    if base != cursor[0] or len(edits) <= cursor[1]:
+        return 0
+    for edit in edits[cursor[1]:]:
+        try:
+            engine.apply_section_edit(edit)
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping section edit that does not apply ({edit.get('op')}): {e}")
+    applied = len(edits) - cursor[1]
+    engine.section_edit_cursor = (base, len(edits))
+    logger.info(f"Replayed {applied} section edits")
+    return applied
 
-# Initialize conversation logs directory
-def init_logs_directory():
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
+# Apply one admin edit ('add', 'update' or 'retire') and journal it. Engines without
+# incremental edits get it through the IPC data file and a background rebuild.
+def edit_section(op, section_number=None, fields=None):
+    global engine_generation
+    with section_edit_lock, section_journal.locked():
+        engine = get_engine()
+        cursor = getattr(engine, 'section_edit_cursor', None)
+        if cursor is None:
+            sections = [dict(section) for section in get_section_store(IPC_DATA_PATH).sections]
+            if op == 'add':
+                fields = validate_section(fields)
+                section_number = fields['section_number']
+                edit = {"op": "add", "section": fields}
+            elif op == 'update':
+                edit = {"op": "update", "section_number": str(section_number), "section": fields}
+            else:
+                edit = {"op": "retire", "section_number": str(section_number)}
+            apply_section_edit(sections, edit)
+            section_journal.append(edit)
+            section_journal.fold()
+            engine_reloader.trigger(f"section {op}")
+            return {"op": op, "section_number": str(section_number), "incremental": False}
+
+        sync_section_edits(engine)
+        if op == 'add':
+            record = engine.add_section(fields)
+            edit = {"op": "add", "section": dict(record)}
+        elif op == 'update':
+            record = engine.update_section(section_number, fields)
+            edit = {"op": "update", "section_number": record.section_number, "section": dict(record)}
+        else:
+            record = engine.retire_section(section_number)
+            edit = {"op": "retire", "section_number": record.section_number}
+        base, count = section_journal.append(edit)
+        if cursor == (base, count - 1):
+            engine.section_edit_cursor = (base, count)
+        engine_generation += 1
+        result_cache.invalidate()
+
+    if count >= SECTION_COMPACT_THRESHOLD:
+        compact_sections(f"{count} section edits pending")
+    return {"op": op, "section_number": record.section_number, "section": record, "incremental": True}
+
+# Fold the edit journal into the IPC data file and rebuild the engine from it in the
+# background; the rebuild refits the vocabulary and IDF over every section
+def compact_sections(reason):
+    global _data_version
+    with section_edit_lock, section_journal.locked():
+        folded = section_journal.fold()
+        # This worker reloads below; only other workers need to notice the new file
+        _data_version = current_data_version()
+    engine_reloader.trigger(f"compaction: {reason}")
+    return folded
+
+# The original MLEnhancer, imported and built on first use
+def get_original_ml_enhancer():
+    global original_ml_available, _original_ml_failed, _original_ml_enhancer
+    if _original_ml_enhancer is None and not _original_ml_failed:
+        with _original_ml_lock:
+            if _original_ml_enhancer is None and not _original_ml_failed:
+                try:
+                    with startup_phase('build_original_engine'):
+                        from ml_enhancer import get_ml_enhancer
+                        _original_ml_enhancer = get_ml_enhancer()
+                    original_ml_available = True
+                except Exception as e:
+                    logger.warning(f"Original ML enhancer not available: {e}")
+                    _original_ml_failed = True
+    return _original_ml_enhancer
 
-# Save conversation log
+# Load IPC sections data (now handled by ML enhancer)
+def load_ipc_data():
+    engine = get_engine()
+    if engine is not None:
+        return {"sections": engine.ipc_sections}
+    else:
+        return {"sections": get_section_store(IPC_DATA_PATH).sections}
+
+# Save conversation log (enqueued; written to rotated JSONL segments by a background thread)
 def save_conversation_log(user_input, response, session_id):
-    init_logs_directory()
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "session_id": session_id,
-        "user_input": user_input,
-        "response": response
-    }
-    
-    log_file = f"logs/conversation_{timestamp}_{session_id}.json"
-    try:
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(log_entry, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        logger.error(f"Error saving conversation log: {e}")
+    if not CONVERSATION_LOGS_ENABLED:
+        return
+    with LOG_WRITE_SECONDS.time():
+        conversation_log_writer.write({
+            "timestamp": datetime.now().isoformat(),
+            "session_id": session_id,
+            "user_input": user_input,
+            "response": response
+        })
 
 # Calculate similarity between two strings
 def calculate_similarity(str1, str2):
@@ -95,25 +340,125 @@ def extract_keywords(user_input):
     keywords = [word for word in words if word not in stop_words and len(word) > 2]
     return keywords
 
-# Enhanced section finding using ML
-def find_relevant_sections(user_input, ipc_data, threshold=0.3):
+# Name of the engine that currently answers section lookups
+def get_active_engine_name():
     if enhanced_ml_available:
-        return enhanced_ml_enhancer.find_relevant_sections_enhanced(user_input)
-    elif original_ml_available:
-        return ml_enhancer.find_relevant_sections_enhanced(user_input)
+        return "enhanced"
+    elif get_original_ml_enhancer() is not None:
+        return "original"
+    else:
+        return "basic"
+
+# Version of the IPC data and index artifacts on disk; a change schedules a background reload
+_data_version = None
+_section_journal_version = None
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        return "missing"
+
+def current_data_version():
+    return "/".join(file_version(path) for path in (IPC_DATA_PATH, os.path.join(ARTIFACTS_DIR, 'manifest.json')))
+
+def get_data_version():
+    global _data_version, _section_journal_version, engine_generation
+    version = current_data_version()
+    if version != _data_version:
+        if _data_version is not None and IPC_DATA_AUTO_RELOAD:
+            logger.info("IPC data changed on disk, reloading the engine in the background")
+            engine_reloader.trigger("data changed on disk")
+        _data_version = version
+    
+    # Section edits journaled by other workers are replayed, not rebuilt
+    journal_version = file_version(section_journal.path)
+    if journal_version != _section_journal_version:
+        _section_journal_version = journal_version
+        with section_edit_lock:
+            if sync_section_edits(get_engine()):
+                engine_generation += 1
+                result_cache.invalidate()
+    return version
+
+# Enhanced section finding using ML (cached on the normalized query)
+def find_relevant_sections(user_input, ipc_data=None, threshold=0.3):
+    with SECTION_LOOKUP_SECONDS.time():
+        return lookup_relevant_sections(user_input, ipc_data)
+
+def lookup_relevant_sections(user_input, ipc_data):
+    query = normalize_query(user_input)
+    get_data_version()
+    # Generation before engine: a new generation is only published after its engine
+    cache_key = (get_active_engine_name(), engine_generation, query)
+    cached_sections = result_cache.get(cache_key)
+    if cached_sections is not None:
+        return list(cached_sections)
+    
+    engine = get_engine()
+    if engine is not None:
+        relevant_sections = engine.find_relevant_sections_enhanced(query)
     else:
         # Fallback to basic keyword matching
-        return basic_keyword_matching(user_input, ipc_data)
+        relevant_sections = basic_keyword_matching(query, ipc_data or load_ipc_data())
+    
+    result_cache.put(cache_key, relevant_sections)
+    return list(relevant_sections)
+
+# Batch section finding: cached queries are answered from the cache, the rest are scored together
+def find_relevant_sections_batch(user_inputs):
+    queries = [normalize_query(user_input) for user_input in user_inputs]
+    engine_name = get_active_engine_name()
+    get_data_version()
+    generation = engine_generation
+    
+    results = [None] * len(queries)
+    missing = {}
+    for i, query in enumerate(queries):
+        cached_sections = result_cache.get((engine_name, generation, query))
+        if cached_sections is not None:
+            results[i] = list(cached_sections)
+        else:
+            missing.setdefault(query, []).append(i)
+    
+    if missing:
+        missing_queries = list(missing)
+        engine = get_engine()
+        if engine is not None:
+            batch_sections = engine.find_relevant_sections_batch(missing_queries)
+        else:
+            ipc_data = load_ipc_data()
+            batch_sections = [basic_keyword_matching(query, ipc_data) for query in missing_queries]
+        
+        for query, relevant_sections in zip(missing_queries, batch_sections):
+            result_cache.put((engine_name, generation, query), relevant_sections)
+            for i in missing[query]:
+                results[i] = list(relevant_sections)
+    
+    return results
 
 # Generate enhanced response with ML capabilities
 def generate_response(relevant_sections, user_input):
     if enhanced_ml_available:
         # Use enhanced ML for response generation
         return generate_enhanced_response_with_ml(relevant_sections, user_input)
-    elif original_ml_available:
-        return ml_enhancer.generate_enhanced_response(user_input, relevant_sections)
+    elif get_original_ml_enhancer() is not None:
+        return get_original_ml_enhancer().generate_enhanced_response(user_input, relevant_sections)
     else:
-        return generate_basic_response(relevant_sections, user_input)
+        with RESPONSE_RENDERING_SECONDS.time():
+            return generate_basic_response(relevant_sections, user_input)
+
+# Fuzzy keyword index for the basic fallback, rebuilt only when the section list changes
+_basic_keyword_index = (None, None)
+
+def get_basic_keyword_index(sections):
+    global _basic_keyword_index
+    indexed_sections, keyword_index = _basic_keyword_index
+    if indexed_sections is not sections:
+        keyword_index = FuzzyKeywordIndex([section['keywords'] for section in sections], min_similarity=0.7)
+        _basic_keyword_index = (sections, keyword_index)
+    return keyword_index
 
 # Basic keyword matching fallback
 def basic_keyword_matching(user_input, ipc_data):
@@ -121,23 +466,21 @@ def basic_keyword_matching(user_input, ipc_data):
     keywords = extract_keywords(user_input)
     results = []
     
-    for section in ipc_data['sections']:
+    sections = ipc_data['sections']
+    section_matches = get_basic_keyword_index(sections).match(keywords)
+    for section_idx in sorted(section_matches):
+        section = sections[section_idx]
         score = 0
         matched_keywords = []
         
-        for keyword in keywords:
-            for section_keyword in section['keywords']:
-                similarity = SequenceMatcher(None, keyword.lower(), section_keyword.lower()).ratio()
-                if similarity > 0.7:
-                    score += similarity
-                    matched_keywords.append(keyword)
+        for keyword, _, similarity in section_matches[section_idx]:
+            score += similarity
+            matched_keywords.append(keyword)
         
         if score > 0:
-            section_copy = section.copy()
-            section_copy['score'] = score / len(keywords) if keywords else 0
-            section_copy['method'] = 'basic_keyword_matching'
-            section_copy['matched_keywords'] = matched_keywords
-            results.append(section_copy)
+            results.append(SectionHit(
+                section, score / len(keywords) if keywords else 0, 'basic_keyword_matching', matched_keywords
+            ))
     
     return sorted(results, key=lambda x: x['score'], reverse=True)[:5]
 
@@ -187,9 +530,12 @@ def generate_basic_response(relevant_sections, user_input):
     }
 
 # Enhanced response generation with improved accuracy
-def generate_enhanced_response_with_ml(relevant_sections, user_input):
-    """Generate enhanced response using improved ML system"""
+def generate_enhanced_response_with_ml(relevant_sections, user_input, include_summary=True):
+    """Generate enhanced response using improved ML system (the summary is left out when streamed separately)"""
+    # Rendering time excludes the wait for the Gemini summary, which is observed on its own
+    rendering_started = time.perf_counter()
     if not relevant_sections:
+        RESPONSE_RENDERING_SECONDS.observe(time.perf_counter() - rendering_started)
         return {
             "message": "I couldn't find any specific IPC sections that match your description. Please try rephrasing your query or provide more details about the incident.",
             "sections": [],
@@ -197,6 +543,7 @@ def generate_enhanced_response_with_ml(relevant_sections, user_input):
             "suggestions": [],
             "enhanced_analysis": None,
             "gemini_summary": None,
+            "gemini_summary_status": "skipped",
             "accuracy_note": "Enhanced ML system used for analysis"
         }
     
@@ -218,8 +565,13 @@ def generate_enhanced_response_with_ml(relevant_sections, user_input):
             message += f"   **Description:** {section['description']}\n"
             message += f"   **Punishment:** {section['punishment']}\n\n"
     
-    # Generate Gemini AI summary
-    gemini_summary = generate_gemini_summary(user_input, relevant_sections)
+    # Generate Gemini AI summary without letting a slow LLM hold the request past its deadline
+    rendering_seconds = time.perf_counter() - rendering_started
+    if include_summary:
+        gemini_summary, gemini_summary_status = generate_gemini_summary_with_deadline(user_input, relevant_sections)
+    else:
+        gemini_summary, gemini_summary_status = None, "pending"
+    rendering_started = time.perf_counter()
     
     # Add enhanced accuracy note
     message += "\n\n✅ **Enhanced Analysis:** This analysis was performed using our improved ML system with better accuracy and pattern recognition."
@@ -230,6 +582,7 @@ def generate_enhanced_response_with_ml(relevant_sections, user_input):
     
     # Add disclaimer
     message += "\n\n⚠️ **Important Disclaimer:** This is general legal information based on the Indian Penal Code and should not be considered as legal advice. For specific legal guidance, please consult with a qualified lawyer or legal professional."
+    RESPONSE_RENDERING_SECONDS.observe(rendering_seconds + time.perf_counter() - rendering_started)
     
     return {
         "message": message,
@@ -239,26 +592,22 @@ def generate_enhanced_response_with_ml(relevant_sections, user_input):
         "suggestions": [],
         "enhanced_analysis": None,
         "gemini_summary": gemini_summary,
+        "gemini_summary_status": gemini_summary_status,
         "accuracy_note": "Enhanced ML system used for analysis",
         "system_version": "Enhanced v2.0"
     }
 
-# Generate Gemini AI summary
-def generate_gemini_summary(user_input, relevant_sections):
-    """Generate AI-powered summary using Gemini"""
-    try:
-        if not original_ml_available or not ml_enhancer.gemini_client:
-            return None
-        
-        # Prepare context for Gemini
-        sections_info = []
-        for section in relevant_sections[:3]:  # Top 3 sections
-            sections_info.append(f"IPC {section['section_number']}: {section['title']} - {section['description']}")
-        
-        context = "\n".join(sections_info)
-        
-        # Create prompt for Gemini
-        prompt = f"""
+# Build the Gemini summary prompt
+def build_gemini_summary_prompt(user_input, relevant_sections):
+    # Prepare context for Gemini
+    sections_info = []
+    for section in relevant_sections[:3]:  # Top 3 sections
+        sections_info.append(f"IPC {section['section_number']}: {section['title']} - {section['description']}")
+    
+    context = "\n".join(sections_info)
+    
+    # Create prompt for Gemini
+    return f"""
         As a legal AI assistant, provide a concise and helpful summary for this case:
         
         User Query: "{user_input}"
@@ -273,12 +622,26 @@ def generate_gemini_summary(user_input, relevant_sections):
         
         Keep it concise (2-3 sentences) and user-friendly.
         """
+
+# Generate Gemini AI summary
+def generate_gemini_summary(user_input, relevant_sections):
+    """Generate AI-powered summary using Gemini"""
+    try:
+        gemini_client = get_gemini_client()
+        if not gemini_client:
+            return None
+        
+        prompt = build_gemini_summary_prompt(user_input, relevant_sections)
         
-        # Generate response using Gemini
-        response = ml_enhancer.gemini_client.generate_content(prompt)
+        # Generate response using Gemini (answered from the persistent cache when possible)
+        response_text = get_llm_cache().get_or_generate(
+            get_gemini_model_name(),
+            prompt,
+            lambda: gemini_client.generate_content(prompt).text
+        )
         
-        if response and response.text:
-            return response.text.strip()
+        if response_text:
+            return response_text.strip()
         else:
             return None
             
@@ -286,10 +649,44 @@ def generate_gemini_summary(user_input, relevant_sections):
         logger.warning(f"Gemini summary generation failed: {e}")
         return None
 
+# Stream the Gemini AI summary chunk by chunk
+def stream_gemini_summary(user_input, relevant_sections):
+    """Yield summary text chunks as Gemini produces them; cached summaries come back as one chunk"""
+    prompt = build_gemini_summary_prompt(user_input, relevant_sections)
+    llm_cache = get_llm_cache()
+    
+    cached_text = llm_cache.get(get_gemini_model_name(), prompt)
+    if cached_text:
+        yield cached_text.strip()
+        return
+    
+    chunks = []
+    for chunk in get_gemini_client().generate_content(prompt, stream=True):
+        if chunk.text:
+            chunks.append(chunk.text)
+            yield chunk.text
+    llm_cache.put(get_gemini_model_name(), prompt, "".join(chunks))
+
+# Run the Gemini summary on the bounded LLM executor and give up after the deadline
+def generate_gemini_summary_with_deadline(user_input, relevant_sections):
+    """Return (summary, status) where status is completed, timed_out, skipped or failed"""
+    if not get_gemini_client():
+        return None, "skipped"
+    
+    with GEMINI_SUMMARY_SECONDS.time():
+        status, gemini_summary = llm_executor.run(
+            lambda: generate_gemini_summary(user_input, relevant_sections),
+            timeout=GEMINI_TIMEOUT_SECONDS
+        )
+    if status == "completed" and not gemini_summary:
+        status = "failed"
+    GEMINI_SUMMARIES.labels(status).inc()
+    return gemini_summary, status
+
 # Frontend is now served by React/Vite
 # This route is no longer needed
 
-@app.route('/api/analyze', methods=['POST'])
+@api.route('/api/analyze', methods=['POST'])
 def analyze_crime():
     try:
         data = request.get_json()
@@ -324,7 +721,130 @@ def analyze_crime():
             "error": "An error occurred while processing your request. Please try again."
         }), 500
 
-@app.route('/api/sections', methods=['GET'])
+@api.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze many incident descriptions in one call"""
+    try:
+        data = request.get_json(silent=True) or {}
+        descriptions = data.get('descriptions')
+        include_summary = bool(data.get('include_summary', False))
+        
+        if not isinstance(descriptions, list) or not descriptions:
+            return jsonify({
+                "error": "Please provide a non-empty list of incident descriptions"
+            }), 400
+        if len(descriptions) > MAX_BATCH_SIZE:
+            return jsonify({
+                "error": f"At most {MAX_BATCH_SIZE} descriptions can be analyzed per request"
+            }), 400
+        
+        descriptions = [str(description).strip() for description in descriptions]
+        batch_sections = find_relevant_sections_batch(descriptions)
+        
+        # Optional Gemini summaries, at most BATCH_SUMMARY_CONCURRENCY at a time across all requests
+        summaries = [None] * len(descriptions)
+        summary_statuses = ["skipped"] * len(descriptions)
+        if include_summary and get_gemini_client():
+            futures = {
+                batch_summary_executor.submit(generate_gemini_summary, description, relevant_sections): i
+                for i, (description, relevant_sections) in enumerate(zip(descriptions, batch_sections))
+                if description and relevant_sections
+            }
+            for future, i in futures.items():
+                summaries[i] = future.result()
+                summary_statuses[i] = "completed" if summaries[i] else "failed"
+        
+        results = []
+        for description, relevant_sections, summary, summary_status in zip(descriptions, batch_sections, summaries, summary_statuses):
+            results.append({
+                "description": description,
+                "sections": relevant_sections,
+                "confidence": sum(section['score'] for section in relevant_sections) / len(relevant_sections) if relevant_sections else 0,
+                "matched_keywords": [kw for section in relevant_sections for kw in section.get('matched_keywords', [])],
+                "gemini_summary": summary,
+                "gemini_summary_status": summary_status
+            })
+        
+        return jsonify({
+            "results": results,
+            "total": len(results),
+            "system_version": "Enhanced v2.0" if enhanced_ml_available else ("Original v1.0" if original_ml_available else "Basic v1.0")
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing batch request: {e}")
+        return jsonify({
+            "error": "An error occurred while processing your request. Please try again."
+        }), 500
+
+# Format a Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=to_json_compatible)}\n\n"
+
+@api.route('/api/analyze/stream', methods=['POST'])
+def analyze_crime_stream():
+    """Streaming /api/analyze: sections as soon as retrieval finishes, then Gemini summary chunks"""
+    data = request.get_json(silent=True) or {}
+    user_input = data.get('description', '').strip()
+    
+    if not user_input:
+        return jsonify({
+            "error": "Please provide a description of the incident"
+        }), 400
+    
+    # The session cookie has to be set before the stream starts
+    if 'session_id' not in session:
+        session['session_id'] = datetime.now().strftime("%Y%m%d_%H%M%S")
+    session_id = session['session_id']
+    
+    def generate():
+        try:
+            relevant_sections = find_relevant_sections(user_input)
+            # No LLM call before the sections event: the summary is streamed after it
+            if enhanced_ml_available:
+                response = generate_enhanced_response_with_ml(relevant_sections, user_input, include_summary=False)
+            elif get_original_ml_enhancer() is not None:
+                response = get_original_ml_enhancer().generate_enhanced_response(user_input, relevant_sections, include_llm=False)
+            else:
+                response = generate_response(relevant_sections, user_input)
+            yield sse_event("sections", response)
+            
+            gemini_summary = None
+            gemini_summary_status = "skipped"
+            if relevant_sections and get_gemini_client():
+                # Same pool, pending limit and deadline as the non-streaming summary
+                chunks = []
+                with GEMINI_SUMMARY_SECONDS.time():
+                    for status, chunk in llm_executor.stream(
+                        lambda: stream_gemini_summary(user_input, relevant_sections),
+                        timeout=GEMINI_TIMEOUT_SECONDS
+                    ):
+                        if status == CHUNK:
+                            chunks.append(chunk)
+                            yield sse_event("summary", {"text": chunk})
+                        else:
+                            gemini_summary_status = status
+                gemini_summary = "".join(chunks).strip() or None
+                if gemini_summary_status == "completed" and not gemini_summary:
+                    gemini_summary_status = "failed"
+                GEMINI_SUMMARIES.labels(gemini_summary_status).inc()
+            
+            response["gemini_summary"] = gemini_summary
+            response["gemini_summary_status"] = gemini_summary_status
+            yield sse_event("done", {"gemini_summary": gemini_summary, "gemini_summary_status": gemini_summary_status})
+            
+            save_conversation_log(user_input, response, session_id)
+        except Exception as e:
+            logger.error(f"Error processing streaming request: {e}")
+            yield sse_event("error", {"error": "An error occurred while processing your request. Please try again."})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api.route('/api/sections', methods=['GET'])
 def get_all_sections():
     try:
         ipc_data = load_ipc_data()
@@ -333,7 +853,7 @@ def get_all_sections():
         logger.error(f"Error loading sections: {e}")
         return jsonify({"error": "Failed to load IPC sections"}), 500
 
-@app.route('/api/search', methods=['GET'])
+@api.route('/api/search', methods=['GET'])
 def search_sections():
     try:
         query = request.args.get('q', '').strip()
@@ -344,7 +864,7 @@ def search_sections():
         relevant_sections = find_relevant_sections(query, ipc_data, threshold=0.2)
         
         return jsonify({
-            "sections": [match['section'] for match in relevant_sections],
+            "sections": [match.section for match in relevant_sections],
             "query": query
         })
         
@@ -352,26 +872,50 @@ def search_sections():
         logger.error(f"Error in search: {e}")
         return jsonify({"error": "Search failed"}), 500
 
-@app.route('/api/logs', methods=['GET'])
+def get_log_filters():
+    return {
+        "since": request.args.get('since'),
+        "until": request.args.get('until'),
+        "session_id": request.args.get('session_id')
+    }
+
+@api.route('/api/logs', methods=['GET'])
 def get_logs():
+    """Return one page of conversation logs, newest first"""
     try:
-        init_logs_directory()
-        logs = []
-        for filename in os.listdir('logs'):
-            if filename.endswith('.json'):
-                with open(f'logs/{filename}', 'r', encoding='utf-8') as f:
-                    log_data = json.load(f)
-                    logs.append(log_data)
-        
-        # Sort by timestamp
-        logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        return jsonify({"logs": logs})
+        if conversation_log_index is None:
+            return jsonify({"logs": [], "next_cursor": None})
+
+        try:
+            limit = int(request.args.get('limit', LOGS_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, LOGS_MAX_PAGE_SIZE))
+
+        try:
+            logs, next_cursor = conversation_log_index.query(
+                limit=limit, cursor=request.args.get('cursor'), **get_log_filters()
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"logs": logs, "next_cursor": next_cursor})
         
     except Exception as e:
         logger.error(f"Error loading logs: {e}")
         return jsonify({"error": "Failed to load logs"}), 500
 
-@app.route('/api/suggestions', methods=['POST'])
+@api.route('/api/logs/export', methods=['GET'])
+def export_logs():
+    """Stream every matching conversation log as NDJSON, oldest first"""
+    if conversation_log_index is None:
+        return Response('', mimetype='application/x-ndjson')
+    return Response(
+        stream_with_context(conversation_log_index.export(**get_log_filters())),
+        mimetype='application/x-ndjson',
+        headers={"Content-Disposition": "attachment; filename=conversations.ndjson"}
+    )
+
+@api.route('/api/suggestions', methods=['POST'])
 def get_suggestions():
     """Get AI-powered suggestions for a query"""
     try:
@@ -384,14 +928,7 @@ def get_suggestions():
             }), 400
         
         # Get relevant sections using enhanced ML if available
-        if enhanced_ml_available:
-            relevant_sections = enhanced_ml_enhancer.find_relevant_sections_enhanced(user_input)
-        elif original_ml_available:
-            relevant_sections = ml_enhancer.find_relevant_sections_enhanced(user_input)
-        else:
-            # Load IPC data for basic matching
-            ipc_data = load_ipc_data()
-            relevant_sections = basic_keyword_matching(user_input, ipc_data)
+        relevant_sections = find_relevant_sections(user_input)
         
         # Get LLM suggestions and Gemini summary
         suggestions = []
@@ -407,11 +944,11 @@ def get_suggestions():
             ]
             
             # Generate Gemini summary for enhanced system
-            if original_ml_available and ml_enhancer.gemini_client:
+            if get_gemini_client():
                 gemini_summary = generate_gemini_summary(user_input, relevant_sections)
                 
-        elif original_ml_available and ml_enhancer.use_llm:
-            enhanced_analysis = ml_enhancer.llm_enhance_analysis(user_input, relevant_sections)
+        elif get_original_ml_enhancer() is not None and get_original_ml_enhancer().use_llm:
+            enhanced_analysis = get_original_ml_enhancer().llm_enhance_analysis(user_input, relevant_sections)
             if enhanced_analysis:
                 suggestions = enhanced_analysis.get('suggestions', [])
         
@@ -429,17 +966,61 @@ def get_suggestions():
             "error": "An error occurred while processing your request. Please try again."
         }), 500
 
-@app.route('/api/status', methods=['GET'])
+# Cache, log and engine values kept elsewhere, read when /metrics is scraped
+def collect_app_metrics():
+    result_stats = result_cache.stats()
+    llm_stats = get_llm_cache().stats()
+    log_stats = conversation_log_writer.stats()
+    return [
+        ('ipc_result_cache_lookups_total', 'counter', 'Section lookup cache lookups by result', ['result'],
+         [(('hit',), result_stats['hits']), (('miss',), result_stats['misses'])]),
+        ('ipc_result_cache_entries', 'gauge', 'Entries in the section lookup cache', [], [((), result_stats['entries'])]),
+        ('ipc_llm_cache_lookups_total', 'counter', 'LLM response cache lookups by result', ['result'],
+         [(('hit',), llm_stats['hits']), (('miss',), llm_stats['misses']), (('stale_hit',), llm_stats['stale_hits'])]),
+        ('ipc_llm_cache_errors_total', 'counter', 'LLM response cache read or write errors', [], [((), llm_stats['errors'])]),
+        ('ipc_conversation_log_records_total', 'counter', 'Conversation log records by outcome', ['outcome'],
+         [(('written',), log_stats['written']), (('dropped',), log_stats['dropped'])]),
+        ('ipc_conversation_log_queued', 'gauge', 'Conversation log records waiting to be written', [],
+         [((), log_stats['queued'])]),
+        ('ipc_engine_generation', 'gauge', 'Engine generation, incremented on every swap or section edit', [],
+         [((), engine_generation)])
+    ]
+
+REGISTRY.register_collector(collect_app_metrics)
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of the request, stage, cache and Gemini metrics"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@api.route('/api/ready', methods=['GET'])
+def get_ready():
+    """Readiness probe: 200 once the engine is built and warm, 503 before"""
+    return jsonify({
+        "ready": app_ready,
+        "engine": get_active_engine_name(),
+        "pid": os.getpid()
+    }), 200 if app_ready else 503
+
+@api.route('/api/status', methods=['GET'])
 def get_status():
     """Get the status of ML models and features"""
+    # Reported without building the original engine if it has not been needed yet
+    original_engine = _original_ml_enhancer
+    gemini_configured = get_gemini_client() is not None
     status_data = {
             "ml_enhancement": {
-                "llm_enabled": ml_enhancer.use_llm if original_ml_available else False,
-                "ai_model": "GEMINI" if original_ml_available else "None",
-                "gemini_configured": ml_enhancer.gemini_client is not None if original_ml_available else False,
-                "semantic_search_enabled": ml_enhancer.use_semantic_search if original_ml_available else False,
-                "sentence_model_loaded": ml_enhancer.sentence_model is not None if original_ml_available else False,
-                "total_sections": len(ml_enhancer.ipc_sections) if original_ml_available else 0
+                "loaded": original_engine is not None,
+                "llm_enabled": gemini_configured,
+                "ai_model": "GEMINI" if gemini_configured else "None",
+                "gemini_configured": gemini_configured,
+                "llm_client_mode": get_llm_client_mode(),
+                "semantic_search_enabled": os.getenv('USE_SEMANTIC_SEARCH', 'true').lower() == 'true',
+                "sentence_model_loaded": original_engine is not None and original_engine.sentence_model is not None,
+                "semantic_encoder": getattr(original_engine and original_engine.sentence_model, 'name', None),
+                "semantic_dimensions": (original_engine.section_embeddings.shape[1]
+                                        if original_engine is not None and original_engine.section_embeddings is not None else None),
+                "total_sections": len(load_ipc_data()["sections"])
             },
         "enhanced_system": {
             "available": enhanced_ml_available,
@@ -449,24 +1030,141 @@ def get_status():
                 "legal_synonyms": enhanced_ml_available,
                 "pattern_matching": enhanced_ml_available,
                 "improved_scoring": enhanced_ml_available,
-                "gemini_ai_summary": original_ml_available and ml_enhancer.gemini_client is not None
+                "gemini_ai_summary": gemini_configured
             },
             "accuracy_improvement": "75-115% F1-Score improvement" if enhanced_ml_available else "Not available",
             "ai_capabilities": {
-                "gemini_available": original_ml_available and ml_enhancer.gemini_client is not None,
+                "gemini_available": gemini_configured,
                 "ai_summary_enabled": True
             }
         }
     }
     
     if enhanced_ml_available:
-        status_data["enhanced_system"]["total_sections"] = len(enhanced_ml_enhancer.ipc_sections)
-        status_data["enhanced_system"]["expanded_sections"] = len(enhanced_ml_enhancer.expanded_sections)
+        engine = get_engine()
+        status_data["enhanced_system"]["total_sections"] = len(engine.ipc_sections)
+        status_data["enhanced_system"]["expanded_sections"] = len(engine.expanded_sections)
 
+    status_data["startup"] = {
+        "engine": get_active_engine_name(),
+        "timings_ms": dict(startup_timings)
+    }
+    status_data["conversation_log"] = conversation_log_writer.stats()
+    status_data["llm_cache"] = get_llm_cache().stats()
+    status_data["result_cache"] = result_cache.stats()
+    status_data["result_cache"]["engine"] = get_active_engine_name()
+    status_data["result_cache"]["data_version"] = get_data_version()
+    status_data["result_cache"]["engine_generation"] = engine_generation
+    status_data["reload"] = engine_reloader.stats()
+    status_data["reload"]["auto_reload"] = IPC_DATA_AUTO_RELOAD
+    status_data["section_edits"] = {
+        "pending": section_journal.pending(),
+        "compact_threshold": SECTION_COMPACT_THRESHOLD,
+        "incremental": enhanced_ml_available
+    }
+    if enhanced_ml_available:
+        status_data["section_edits"].update(get_engine().index_stats())
     
     return jsonify(status_data)
 
-@app.route('/api/gemini-summary', methods=['POST'])
+# Error response for admin endpoints, or None when the request carries ADMIN_TOKEN
+def admin_auth_error():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled"}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid admin token"}), 403
+    return None
+
+# Reload stats, after waiting for the rebuild when the request asks for ?wait=true
+def reload_response():
+    if request.args.get('wait', 'false').lower() == 'true':
+        engine_reloader.wait(RELOAD_WAIT_SECONDS)
+        return jsonify(engine_reloader.stats())
+    return jsonify(engine_reloader.stats()), 202
+
+@api.route('/api/admin/reload', methods=['POST'])
+def reload_engine():
+    """Rebuild the engine from the data on disk in the background and swap it in (requires ADMIN_TOKEN)"""
+    error = admin_auth_error()
+    if error:
+        return error
+    
+    engine_reloader.trigger("admin request")
+    return reload_response()
+
+def section_edit_response(op, section_number=None):
+    error = admin_auth_error()
+    if error:
+        return error
+    
+    fields = request.get_json(silent=True) if op != 'retire' else None
+    if op != 'retire' and not isinstance(fields, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    try:
+        result = edit_section(op, section_number, fields)
+    except KeyError:
+        return jsonify({"error": f"Section {section_number} not found"}), 404
+    except SectionExistsError as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Section {op} failed: {e}")
+        return jsonify({"error": f"Section {op} failed"}), 500
+    return jsonify(result), 201 if op == 'add' else 200
+
+@api.route('/api/admin/sections', methods=['POST'])
+def add_section():
+    """Add a section to the running engine without a full rebuild (requires ADMIN_TOKEN)"""
+    return section_edit_response('add')
+
+@api.route('/api/admin/sections/<section_number>', methods=['PUT'])
+def update_section(section_number):
+    """Update the given fields of a section (requires ADMIN_TOKEN)"""
+    return section_edit_response('update', section_number)
+
+@api.route('/api/admin/sections/<section_number>', methods=['DELETE'])
+def retire_section(section_number):
+    """Retire a section so it is no longer returned (requires ADMIN_TOKEN)"""
+    return section_edit_response('retire', section_number)
+
+@api.route('/api/admin/sections/compact', methods=['POST'])
+def compact_section_edits():
+    """Fold pending section edits into the IPC data and rebuild the engine exactly (requires ADMIN_TOKEN)"""
+    error = admin_auth_error()
+    if error:
+        return error
+    
+    compact_sections("admin request")
+    return reload_response()
+
+@api.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Stored request profiles, newest first (requires ADMIN_TOKEN)"""
+    error = admin_auth_error()
+    if error:
+        return error
+    return jsonify({"profiles": profile_store.list()})
+
+@api.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Download a pstats profile, or ?format=text for its top functions (requires ADMIN_TOKEN)"""
+    error = admin_auth_error()
+    if error:
+        return error
+    
+    path = profile_store.path(profile_id)
+    if path is None:
+        return jsonify({"error": f"Profile {profile_id} not found"}), 404
+    if request.args.get('format') == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in ('cumulative', 'tottime', 'calls'):
+            return jsonify({"error": "sort must be cumulative, tottime or calls"}), 400
+        return Response(profile_store.render_text(profile_id, sort), content_type='text/plain; charset=utf-8')
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f"{profile_id}.prof")
+
+@api.route('/api/gemini-summary', methods=['POST'])
 def get_gemini_summary():
     """Get AI-powered summary using Gemini"""
     try:
@@ -479,13 +1177,7 @@ def get_gemini_summary():
             }), 400
         
         # Get relevant sections
-        if enhanced_ml_available:
-            relevant_sections = enhanced_ml_enhancer.find_relevant_sections_enhanced(user_input)
-        elif original_ml_available:
-            relevant_sections = ml_enhancer.find_relevant_sections_enhanced(user_input)
-        else:
-            ipc_data = load_ipc_data()
-            relevant_sections = basic_keyword_matching(user_input, ipc_data)
+        relevant_sections = find_relevant_sections(user_input)
         
         # Generate Gemini summary
         gemini_summary = generate_gemini_summary(user_input, relevant_sections)
@@ -511,7 +1203,7 @@ def get_gemini_summary():
             "error": "An error occurred while generating the AI summary."
         }), 500
 
-@app.route('/api/test-enhanced', methods=['POST'])
+@api.route('/api/test-enhanced', methods=['POST'])
 def test_enhanced_system():
     """Test the enhanced ML system with sample queries"""
     try:
@@ -524,14 +1216,7 @@ def test_enhanced_system():
         
         results = []
         for query in test_queries:
-            if enhanced_ml_available:
-                relevant_sections = enhanced_ml_enhancer.find_relevant_sections_enhanced(query)
-            elif original_ml_available:
-                relevant_sections = ml_enhancer.find_relevant_sections_enhanced(query)
-            else:
-                # Load IPC data for basic matching
-                ipc_data = load_ipc_data()
-                relevant_sections = basic_keyword_matching(query, ipc_data)
+            relevant_sections = find_relevant_sections(query)
             
             results.append({
                 "query": query,
@@ -552,5 +1237,108 @@ def test_enhanced_system():
             "error": "An error occurred while testing the enhanced system."
         }), 500
 
+# Per-request metrics: in-flight gauge, latency and status counts labelled by route pattern
+def metrics_endpoint():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = metrics_endpoint()
+    g.request_timings_token = start_request_timings()
+    HTTP_REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+    if g.metrics_endpoint in PROFILED_ENDPOINTS:
+        if request.headers.get('X-Profile', '').lower() in ('1', 'true') and admin_auth_error() is None:
+            g.profile_trigger = 'header'
+        elif sampled():
+            g.profile_trigger = 'sample'
+        else:
+            return
+        g.profiler = profile_store.start()
+
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+# Stage durations of this request for browser devtools; nested stages (section_lookup) include their parts
+def add_server_timing(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    timings = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in request_timings().items()]
+    timings.append(f"total;dur={(time.perf_counter() - started) * 1000:.3f}")
+    response.headers['Server-Timing'] = ', '.join(timings)
+    response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+# Stop and store the profile of a profiled request; its id comes back in X-Profile-Id
+def finish_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profile_store.stop(profiler)
+    try:
+        response.headers['X-Profile-Id'] = profile_store.save(profiler, {
+            "endpoint": g.metrics_endpoint,
+            "method": request.method,
+            "status": response.status_code,
+            "trigger": g.profile_trigger,
+            "duration_ms": round((time.perf_counter() - g.metrics_started) * 1000, 3),
+            "server_timing": response.headers.get('Server-Timing')
+        })
+    except OSError as e:
+        logger.warning(f"Could not store request profile: {e}")
+    return response
+
+def finish_request_metrics(exception=None):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_store.stop(profiler)
+    token = g.pop('request_timings_token', None)
+    if token is not None:
+        stop_request_timings(token)
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    HTTP_REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+    HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - g.metrics_started)
+    status = 500 if exception is not None else g.get('metrics_status', 500)
+    HTTP_REQUESTS.labels(endpoint, request.method, str(status)).inc()
+
+# Application factory: builds the selected engine and the Gemini client, then registers the routes
+def create_app():
+    global app_ready
+    init_engines()
+    with startup_phase('gemini_client'):
+        get_gemini_client()
+    if get_engine() is None:
+        # Basic keyword matching still answers, but the probe should not report a healthy instance
+        logger.error("No ML engine could be built; not reporting ready")
+    else:
+        try:
+            with startup_phase('warm_up'):
+                warm_up()
+            app_ready = True
+        except Exception as e:
+            logger.error(f"Warm-up lookup failed; not reporting ready: {e}")
+    
+    app = Flask(__name__)
+    app.json = SectionJSONProvider(app)
+    # Use environment variable for secret key in production
+    app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here-dev-only')
+    CORS(app)
+    app.before_request(start_request_metrics)
+    app.after_request(record_response_status)
+    # after_request handlers run in reverse order: the stored profile includes the Server-Timing header
+    app.after_request(finish_request_profile)
+    app.after_request(add_server_timing)
+    app.teardown_request(finish_request_metrics)
+    app.register_blueprint(api)
+    
+    startup_timings['total'] = round((time.perf_counter() - _startup_started) * 1000, 1)
+    logger.info(f"Startup finished with engine '{get_active_engine_name()}': {startup_timings}")
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
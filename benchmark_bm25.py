@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark exhaustive BM25 scoring against MaxScore pruning (RETRIEVAL_BACKEND=bm25
+vs maxscore) on synthetic corpora of growing size, checking on every query
+that both return the same top-k.
+
+    python benchmark_bm25.py --sizes 10000 100000 --queries 200 --top-k 5
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bm25_synthetic import build_index, synthetic_corpus
+
+
+def time_queries(index, queries, top_k, prune):
+    results = []
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, top_k, prune=prune))
+        timings.append((time.perf_counter() - started) * 1000)
+    return results, np.array(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exhaustive vs MaxScore BM25 top-k")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sections':>10} {'postings/q':>11} {'exhaustive p50/p95 ms':>22} {'maxscore p50/p95 ms':>20} {'speedup':>8} {'same top-k':>10}")
+    for size in args.sizes:
+        docs, queries = synthetic_corpus(size)
+        queries = queries[:args.queries]
+        index = build_index(docs)
+        postings = np.mean([sum(len(index.postings[term][0]) for term, _ in index.query_terms(q)) for q in queries])
+
+        # One untimed pass of each so neither mode pays first-call costs
+        time_queries(index, queries[:10], args.top_k, False)
+        time_queries(index, queries[:10], args.top_k, True)
+        exhaustive, exhaustive_ms = time_queries(index, queries, args.top_k, False)
+        pruned, pruned_ms = time_queries(index, queries, args.top_k, True)
+
+        same = sum(a == b for a, b in zip(exhaustive, pruned))
+        print(f"{len(docs):>10} {postings:>11.0f} "
+              f"{np.percentile(exhaustive_ms, 50):>10.2f} / {np.percentile(exhaustive_ms, 95):<9.2f} "
+              f"{np.percentile(pruned_ms, 50):>8.2f} / {np.percentile(pruned_ms, 95):<9.2f} "
+              f"{exhaustive_ms.sum() / pruned_ms.sum():>7.1f}x {same:>5}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
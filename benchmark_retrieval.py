@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Latency and memory benchmark for the retrieval engines.
+
+Every engine is measured in its own subprocess, so import time, startup and
+peak memory are not shared between engines:
+
+    enhanced     improve_accuracy.AccuracyImprover (the app's default engine)
+    original     ml_enhancer.MLEnhancer
+    improver     accuracy_improver.AccuracyImprover
+    standalone   standalone_accuracy_test.StandaloneAccuracyEvaluator
+
+For each engine it records startup (import and build time, max RSS, and the
+tracemalloc peak from a second, traced subprocess), then times every stage the engine has (keyword extraction, pattern
+matching, semantic search, TF-IDF/BM25, keyword-matching fallback, end to
+end) over two query sets: the accuracy evaluator's test cases and a larger
+generated set. Latencies are reported as mean/p50/p95/p99 in milliseconds.
+Allocations are measured in a separate pass under tracemalloc, so they do not
+skew the timings. Results are written as JSON; --compare prints the change
+against an earlier run.
+
+    python benchmark_retrieval.py --output benchmark_results.json
+    python benchmark_retrieval.py --engines enhanced --compare benchmark_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ENGINES = ('enhanced', 'original', 'improver', 'standalone')
+STAGES = ('keyword_extraction', 'pattern_matching', 'semantic', 'tfidf', 'fallback', 'end_to_end')
+QUERY_TEMPLATES = (
+    "someone {keyword} me", "a person was {keyword} near my house", "my neighbour is accused of {keyword}",
+    "I want to report {keyword}", "{keyword}", "what is the punishment for {keyword}",
+    "they {keyword} my brother last night and ran away"
+)
+
+
+def evaluator_queries() -> List[str]:
+    from accuracy_evaluator import AccuracyEvaluator
+
+    # The test cases do not need the evaluator's engine
+    return [case['query'] for case in AccuracyEvaluator.load_test_cases(None)]
+
+
+def generated_queries(count: int, seed: int = 0) -> List[str]:
+    """Queries built from section titles and keywords, with typos mixed in"""
+    with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
+        sections = json.load(f)['sections']
+    terms = [keyword for section in sections for keyword in section['keywords']]
+    terms += [section['title'].lower() for section in sections]
+    rng = random.Random(seed)
+
+    queries = []
+    for _ in range(count):
+        query = rng.choice(QUERY_TEMPLATES).format(keyword=rng.choice(terms))
+        if rng.random() < 0.2:
+            # Drop one character to exercise the typo-tolerant paths
+            position = rng.randrange(len(query))
+            query = query[:position] + query[position + 1:]
+        queries.append(query)
+    return queries
+
+
+def load_engine(name: str):
+    if name == 'enhanced':
+        from improve_accuracy import AccuracyImprover
+        return AccuracyImprover
+    if name == 'original':
+        from ml_enhancer import MLEnhancer
+        return MLEnhancer
+    if name == 'improver':
+        from accuracy_improver import AccuracyImprover
+        return AccuracyImprover
+    from standalone_accuracy_test import StandaloneAccuracyEvaluator
+    return StandaloneAccuracyEvaluator
+
+
+def without_tfidf(engine, search: Callable[[str], object]) -> Callable[[str], object]:
+    """Run an engine's lookup with its TF-IDF matrix hidden, which forces the keyword-matching fallback"""
+    def run(query):
+        matrix, engine.tfidf_matrix = engine.tfidf_matrix, None
+        try:
+            return search(query)
+        finally:
+            engine.tfidf_matrix = matrix
+    return run
+
+
+def engine_stages(name: str, engine) -> Dict[str, Callable[[str], object]]:
+    if name == 'enhanced':
+        stages = {
+            'keyword_extraction': engine.extract_keywords_enhanced,
+            'pattern_matching': engine.pattern_matching,
+            'fallback': lambda query: engine.rank_sections(query, [])
+        }
+        if engine.retrieval_ready():
+            stages['tfidf'] = engine.tfidf_search_enhanced
+    elif name == 'original':
+        stages = {
+            'keyword_extraction': engine.extract_keywords_advanced,
+            'fallback': lambda query: engine.rank_sections(query, [], [])
+        }
+        if engine.section_embeddings is not None:
+            stages['semantic'] = engine.semantic_search
+        if engine.retrieval_ready():
+            stages['tfidf'] = engine.tfidf_search
+    elif name == 'improver':
+        stages = {
+            'keyword_extraction': engine.extract_keywords_enhanced,
+            'pattern_matching': engine.pattern_matching,
+            'tfidf': engine.tfidf_search_enhanced,
+            'fallback': without_tfidf(engine, engine.find_relevant_sections_enhanced)
+        }
+    else:
+        stages = {
+            'keyword_extraction': engine.extract_keywords_advanced,
+            'tfidf': engine.tfidf_search,
+            'fallback': without_tfidf(engine, engine.find_relevant_sections_enhanced)
+        }
+    stages['end_to_end'] = engine.find_relevant_sections_enhanced
+    return {stage: stages[stage] for stage in STAGES if stage in stages}
+
+
+def latency_summary(timings_ns: List[int]) -> Dict:
+    timings = np.array(timings_ns, dtype=np.float64) / 1e6
+    return {
+        "count": len(timings),
+        "mean_ms": round(float(timings.mean()), 4),
+        "p50_ms": round(float(np.percentile(timings, 50)), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "p99_ms": round(float(np.percentile(timings, 99)), 4),
+        "max_ms": round(float(timings.max()), 4)
+    }
+
+
+def measure_stage(stage: Callable[[str], object], queries: List[str], repeat: int) -> Dict:
+    # Warm-up pass: memos, caches and lazily built state are filled before timing
+    for query in queries:
+        stage(query)
+
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter_ns()
+            stage(query)
+            timings.append(time.perf_counter_ns() - started)
+    summary = latency_summary(timings)
+
+    # Allocation pass: bytes allocated at peak per call, above what was live before it
+    allocations = []
+    tracemalloc.start()
+    for query in queries:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        stage(query)
+        _, peak = tracemalloc.get_traced_memory()
+        allocations.append(peak - before)
+    tracemalloc.stop()
+    summary["alloc_mean_bytes"] = int(np.mean(allocations))
+    summary["alloc_peak_bytes"] = int(np.max(allocations))
+    return summary
+
+
+def startup_memory(name: str) -> Dict:
+    """Allocation peak of importing and building one engine (called in a fresh subprocess, apart from the timings)"""
+    tracemalloc.start()
+    load_engine(name)()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"tracemalloc_peak_bytes": peak}
+
+
+def run_engine(name: str, query_sets: Dict[str, List[str]], repeat: int) -> Dict:
+    """Benchmark one engine in this process (called in a fresh subprocess); startup is timed untraced"""
+    started = time.perf_counter()
+    engine_class = load_engine(name)
+    imported = time.perf_counter()
+    engine = engine_class()
+    built = time.perf_counter()
+
+    result = {
+        "engine": name,
+        "class": f"{engine_class.__module__}.{engine_class.__name__}",
+        "startup": {
+            "import_ms": round((imported - started) * 1000, 2),
+            "build_ms": round((built - imported) * 1000, 2),
+            "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        },
+        "stages": {}
+    }
+    for stage, run in engine_stages(name, engine).items():
+        result["stages"][stage] = {
+            set_name: measure_stage(run, queries, repeat) for set_name, queries in query_sets.items()
+        }
+    result["max_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(previous: Dict, current: Dict):
+    """Print the change in p50/p95 per engine, stage and query set"""
+    print(f"\n{'engine':<11} {'stage':<19} {'queries':<10} {'p50 ms':>17} {'p95 ms':>17}")
+    for name, engine in current["engines"].items():
+        old_engine = previous.get("engines", {}).get(name)
+        if not old_engine or "stages" not in old_engine or "stages" not in engine:
+            continue
+        for stage, sets in engine["stages"].items():
+            for set_name, summary in sets.items():
+                old = old_engine["stages"].get(stage, {}).get(set_name)
+                if not old:
+                    continue
+                cells = []
+                for key in ('p50_ms', 'p95_ms'):
+                    change = (summary[key] / old[key] - 1) * 100 if old[key] else 0.0
+                    cells.append(f"{old[key]:.3f}->{summary[key]:.3f} {change:+.0f}%")
+                print(f"{name:<11} {stage:<19} {set_name:<10} {cells[0]:>17} {cells[1]:>17}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup, per-stage latency and memory of the retrieval engines")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--queries', type=int, default=500, help="size of the generated query set")
+    parser.add_argument('--repeat', type=int, default=3, help="timed passes over each query set")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    parser.add_argument('--worker', choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument('--query-file', help=argparse.SUPPRESS)
+    parser.add_argument('--startup-memory', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ['USE_LLM_ENHANCEMENT'] = 'false'
+    if args.worker and args.startup_memory:
+        json.dump(startup_memory(args.worker), sys.stdout)
+        return
+    if args.worker:
+        with open(args.query_file, 'r', encoding='utf-8') as f:
+            query_sets = json.load(f)
+        json.dump(run_engine(args.worker, query_sets, args.repeat), sys.stdout)
+        return
+
+    query_sets = {"evaluator": evaluator_queries(), "generated": generated_queries(args.queries)}
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "repeat": args.repeat,
+            "query_sets": {name: len(queries) for name, queries in query_sets.items()},
+            "retrieval_backend": os.getenv('RETRIEVAL_BACKEND', 'tfidf'),
+            "use_semantic_search": os.getenv('USE_SEMANTIC_SEARCH', 'true')
+        },
+        "engines": {}
+    }
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(query_sets, f)
+        query_file = f.name
+    try:
+        for name in args.engines:
+            print(f"Benchmarking {name}...", file=sys.stderr)
+            timed = subprocess.run(
+                [sys.executable, __file__, '--worker', name, '--query-file', query_file, '--repeat', str(args.repeat)],
+                capture_output=True, text=True
+            )
+            # Tracing slows import and build down several times, so the startup peak gets its own process
+            traced = subprocess.run([sys.executable, __file__, '--worker', name, '--startup-memory'],
+                                    capture_output=True, text=True)
+            failed = next((run for run in (timed, traced) if run.returncode != 0), None)
+            if failed is not None:
+                results["engines"][name] = {"error": failed.stderr.strip().splitlines()[-1:]}
+                continue
+            results["engines"][name] = json.loads(timed.stdout)
+            results["engines"][name]["startup"].update(json.loads(traced.stdout))
+    finally:
+        os.remove(query_file)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\n{'engine':<11} {'startup ms':>10} {'peak MB':>8}  stage p50/p95/p99 ms ({len(query_sets['generated'])} generated queries)")
+    for name, engine in results["engines"].items():
+        if "error" in engine:
+            print(f"{name:<11} failed: {engine['error']}")
+            continue
+        startup = engine["startup"]
+        stages = ', '.join(
+            f"{stage} {sets['generated']['p50_ms']:.3f}/{sets['generated']['p95_ms']:.3f}/{sets['generated']['p99_ms']:.3f}"
+            for stage, sets in engine["stages"].items()
+        )
+        print(f"{name:<11} {startup['import_ms'] + startup['build_ms']:>10.1f} "
+              f"{startup['tracemalloc_peak_bytes'] / 1e6:>8.1f}  {stages}")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Inverted-index BM25 retrieval, selectable with RETRIEVAL_BACKEND=bm25.
+
+The TF-IDF path scores every query against every section row. BM25Index
+keeps, for each term, the sections that contain it together with their
+precomputed BM25 impact (idf times the saturated, length-normalized term
+frequency), so a query only visits the posting lists of its own terms and
+selects its top-k with partial selection.
+
+Scores are divided by the sum of the query terms' highest impacts (their
+upper bounds), which puts them in [0, 1] so the engines' similarity
+thresholds keep their meaning. Terms come from the engine's own TF-IDF
+analyzer, so both backends see the same tokens and n-grams.
+
+RETRIEVAL_BACKEND=maxscore adds dynamic pruning (MaxScore) on top: a first
+top-k estimate gives a score threshold, and the query terms whose upper
+bounds together stay below it are never traversed, only probed for the
+sections found through the other terms. Scores are summed in the same term
+order as exhaustive scoring, so the top-k is identical.
+"""
+import math
+import os
+from collections import Counter, defaultdict
+from typing import Callable, Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+from ranking import top_k_indices
+
+RETRIEVAL_BACKEND = os.getenv('RETRIEVAL_BACKEND', 'tfidf').lower()
+RETRIEVAL_BACKENDS = ('tfidf', 'bm25', 'maxscore')
+# Relative margin on pruning decisions, so rounding in a sum of bounds never drops a tie
+PRUNING_SLACK = 1e-9
+# Highest-impact sections kept per term to seed the MaxScore threshold
+TOP_DOCS_PER_TERM = 32
+
+
+class BM25Index:
+    def __init__(self, texts: List[str], analyzer: Callable[[str], List[str]], k1: float = 1.2, b: float = 0.75):
+        """Index one text per section, in section order"""
+        self.analyzer = analyzer
+        self.k1 = k1
+        self.b = b
+
+        term_counts = [Counter(analyzer(text)) for text in texts]
+        self.doc_count = len(texts)
+        self.avg_length = (sum(sum(counts.values()) for counts in term_counts) / self.doc_count) if self.doc_count else 1.0
+
+        entries = defaultdict(list)
+        for doc_id, counts in enumerate(term_counts):
+            length = sum(counts.values())
+            for term, tf in counts.items():
+                entries[term].append((doc_id, tf, length))
+
+        # term -> (section ids, impacts), both sorted by section id; replaced, never mutated
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.upper_bounds: Dict[str, float] = {}
+        self.top_docs: Dict[str, np.ndarray] = {}
+        self.idf: Dict[str, float] = {}
+        for term, term_entries in entries.items():
+            idf = self.idf[term] = self._idf(len(term_entries))
+            doc_ids = np.array([doc_id for doc_id, _, _ in term_entries], dtype=np.int32)
+            impacts = np.array([self._impact(idf, tf, length) for _, tf, length in term_entries], dtype=np.float32)
+            self._set_postings(term, doc_ids, impacts)
+
+    def _set_postings(self, term: str, doc_ids: np.ndarray, impacts: np.ndarray):
+        # Upper bound and top sections are computed at index time, before the postings are visible
+        self.upper_bounds[term] = float(impacts.max())
+        self.top_docs[term] = doc_ids[top_k_indices(impacts, TOP_DOCS_PER_TERM)]
+        self.postings[term] = (doc_ids, impacts)
+
+    def _idf(self, doc_freq: int) -> float:
+        # Always positive, even for terms in more than half of the sections
+        return math.log(1.0 + (self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _impact(self, idf: float, tf: int, length: int) -> float:
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / self.avg_length))
+
+    def add_document(self, doc_id: int, text: str):
+        """
+        Index one more section (doc_id past every indexed one). Corpus statistics
+        (idf, average length) stay as they are until the index is rebuilt.
+        """
+        counts = Counter(self.analyzer(text))
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            idf = self.idf.get(term)
+            if idf is None:
+                idf = self.idf[term] = self._idf(1)
+            impact = self._impact(idf, tf, length)
+            doc_ids, impacts = self.postings.get(term, (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)))
+            self._set_postings(term, np.append(doc_ids, np.int32(doc_id)), np.append(impacts, np.float32(impact)))
+
+    def query_terms(self, query: str) -> List[Tuple[str, int]]:
+        """(term, count in query) for the indexed terms of a query, in first-occurrence order"""
+        return [(term, count) for term, count in Counter(self.analyzer(query)).items() if term in self.postings]
+
+    def score_bound(self, terms: List[Tuple[str, int]]) -> float:
+        """The highest score any section can reach for these query terms"""
+        bound = 0.0
+        for term, count in terms:
+            bound += self.upper_bounds[term] * count
+        return bound
+
+    def search(self, query: str, top_k: int = 10, threshold: float = 0.0,
+               exclude: FrozenSet[int] = frozenset(), prune: bool = False) -> List[Tuple[int, float]]:
+        """(section index, normalized score) of the top_k sections scoring above threshold"""
+        terms = self.query_terms(query)
+        if not terms:
+            return []
+        if prune and len(terms) > 1:
+            essential, non_essential_bound, cutoff = self._essential_terms(terms, top_k, exclude)
+            if non_essential_bound > 0.0:
+                return self._search_essential(terms, essential, non_essential_bound, cutoff, top_k, threshold, exclude)
+
+        candidates, scores = self._accumulate(terms)
+        scores /= self.score_bound(terms)
+        if exclude:
+            scores[np.isin(candidates, list(exclude))] = 0.0
+        return [
+            (int(candidates[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k) if scores[i] > threshold
+        ]
+
+    def _accumulate(self, terms: List[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted ids of every section containing one of the terms, with impacts summed in query-term order"""
+        postings = [self.postings[term] for term, _ in terms]
+        doc_ids = np.concatenate([ids for ids, _ in postings])
+        weights = np.concatenate([impacts.astype(np.float64) * count for (_, impacts), (_, count) in zip(postings, terms)])
+        candidates, positions = np.unique(doc_ids, return_inverse=True)
+        return candidates, np.bincount(positions, weights=weights)
+
+    def _full_scores(self, terms: List[Tuple[str, int]], candidates: np.ndarray) -> np.ndarray:
+        """Exact scores of sorted candidate ids, probing every posting list in query-term order"""
+        scores = np.zeros(len(candidates))
+        for term, count in terms:
+            doc_ids, impacts = self.postings[term]
+            positions = np.searchsorted(doc_ids, candidates)
+            found = positions < len(doc_ids)
+            found[found] = doc_ids[positions[found]] == candidates[found]
+            contributions = np.zeros(len(candidates))
+            contributions[found] = impacts[positions[found]].astype(np.float64) * count
+            # Adding 0.0 for a missing term leaves the sum unchanged, so this matches _accumulate
+            scores += contributions
+        return scores
+
+    def _essential_terms(self, terms: List[Tuple[str, int]], top_k: int,
+                         exclude: FrozenSet[int]) -> Tuple[List[Tuple[str, int]], float, float]:
+        """
+        MaxScore partition. theta is the k-th exact score among the query terms'
+        top-impact sections, a lower bound on the final k-th score. The terms with
+        the lowest upper bounds that together stay below theta are non-essential:
+        a section containing only those terms cannot reach the top-k, not even on
+        a tie. Returns (essential terms in query order, sum of the non-essential
+        upper bounds, pruning cutoff).
+        """
+        seeds = np.unique(np.concatenate([self.top_docs[term] for term, _ in terms]))
+        if exclude:
+            seeds = seeds[~np.isin(seeds, list(exclude))]
+        if len(seeds) < top_k:
+            return terms, 0.0, 0.0
+        seed_scores = self._full_scores(terms, seeds)
+        theta = float(np.partition(seed_scores, len(seeds) - top_k)[len(seeds) - top_k])
+        cutoff = theta * (1.0 - PRUNING_SLACK)
+
+        non_essential = set()
+        non_essential_bound = 0.0
+        for term, count in sorted(terms, key=lambda term: self.upper_bounds[term[0]] * term[1]):
+            bound = self.upper_bounds[term] * count
+            if non_essential_bound + bound >= cutoff:
+                break
+            non_essential.add(term)
+            non_essential_bound += bound
+        return [(term, count) for term, count in terms if term not in non_essential], non_essential_bound, cutoff
+
+    def _search_essential(self, terms: List[Tuple[str, int]], essential: List[Tuple[str, int]],
+                          non_essential_bound: float, cutoff: float, top_k: int, threshold: float,
+                          exclude: FrozenSet[int]) -> List[Tuple[int, float]]:
+        # Candidates come from the essential posting lists only; the non-essential ones are probed
+        # for the candidates that could still reach the cutoff with every non-essential term
+        candidates, partial = self._accumulate(essential)
+        keep = partial + non_essential_bound >= cutoff
+        if exclude:
+            keep &= ~np.isin(candidates, list(exclude))
+        candidates = candidates[keep]
+        scores = self._full_scores(terms, candidates) / self.score_bound(terms)
+        return [
+            (int(candidates[i]), float(scores[i]))
+            for i in top_k_indices(scores, top_k) if scores[i] > threshold
+        ]
+
+    def search_batch(self, queries: List[str], top_k: int = 10, threshold: float = 0.0,
+                     exclude: FrozenSet[int] = frozenset(), prune: bool = False) -> List[List[Tuple[int, float]]]:
+        return [self.search(query, top_k, threshold, exclude, prune) for query in queries]
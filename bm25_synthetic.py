@@ -0,0 +1,29 @@
+"""
+Synthetic BM25 corpora shared by the MaxScore parity tests (test_bm25_index.py)
+and the pruning benchmark (benchmark_bm25.py).
+"""
+import random
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from bm25_index import BM25Index
+
+
+def synthetic_corpus(doc_count, vocabulary_size=2000, doc_length=40, seed=0):
+    """Documents and queries over a Zipf-distributed vocabulary (a few very common terms, many rare ones)"""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocabulary_size)]
+    docs = [' '.join(rng.choices(vocabulary, weights=weights, k=rng.randint(5, doc_length))) for _ in range(doc_count)]
+    # Exact duplicates create score ties at the top-k boundary
+    docs += docs[:doc_count // 10]
+    queries = [
+        ' '.join(rng.choices(vocabulary[:20], k=rng.randint(1, 3)) + rng.choices(vocabulary, k=rng.randint(1, 5)))
+        for _ in range(300)
+    ]
+    return docs, queries
+
+
+def build_index(docs):
+    """A BM25Index over docs, analyzed into English unigrams and bigrams"""
+    return BM25Index(docs, TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).build_analyzer())
@@ -0,0 +1,296 @@
+"""
+Buffered, append-only conversation log.
+
+Request threads only enqueue a record; a background thread appends compact
+JSON lines to segment files under ``logs/`` and rotates them by size or age.
+Closed segments can be gzip-compressed, in independently compressed blocks
+so that a record can be read without decompressing the segment up to it.
+The queue is bounded (records are
+dropped and counted when it is full) and whatever is queued is flushed on
+shutdown, waiting at most ``shutdown_timeout`` seconds.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'conversations-'
+# Uncompressed bytes per gzip member of a compressed segment; a record read decompresses at most about this much
+COMPRESSED_BLOCK_BYTES = 64 * 1024
+
+
+class ConversationLogWriter:
+    def __init__(self, directory: str = 'logs', max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_segment_seconds: float = 3600, compress: bool = False, queue_size: int = 10000,
+                 flush_interval: float = 1.0, shutdown_timeout: float = 5.0, index=None):
+        """index, if given, is a ConversationLogIndex that records the segment and offset of every record"""
+        self.directory = directory
+        self.index = index
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compress = compress
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.written = 0
+        self.dropped = 0
+        self.segments_rotated = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._queue = None
+        self._segment = None
+        self._segment_path = None
+        self._segment_opened_at = 0.0
+        self._segment_counter = 0
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so every worker process starts its own writer
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._segment = None
+            self._thread = threading.Thread(target=self._run, name='conversation-log-writer', daemon=True)
+            self._thread.start()
+
+    def write(self, record: Dict) -> bool:
+        """Enqueue a record; returns False if the queue is full and the record was dropped"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            # Request threads drop concurrently; += on an attribute is not atomic
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued record has been written (at most timeout seconds)"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush the queue (bounded by shutdown_timeout) and close the current segment"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Conversation log queue still full at shutdown, unflushed records are lost")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "segments_rotated": self.segments_rotated,
+            "current_segment": self._segment_path
+        }
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._rotate_if_needed()
+                continue
+
+            batch = [item]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            events = []
+            records = []
+            for entry in batch:
+                if entry is None:
+                    stop = True
+                elif isinstance(entry, threading.Event):
+                    events.append(entry)
+                else:
+                    line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+                    records.append((entry, line.encode('utf-8') + b'\n'))
+            if records:
+                self._write_records(records)
+            for event in events:
+                event.set()
+            if stop:
+                self._close_segment()
+                return
+
+    def _write_records(self, records):
+        try:
+            self._rotate_if_needed()
+            if self._segment is None:
+                self._open_segment()
+            offset = self._segment.tell()
+            self._segment.write(b''.join(line for _, line in records))
+            self._segment.flush()
+            self.written += len(records)
+        except Exception as e:
+            logger.error(f"Error saving conversation log: {e}")
+            return
+
+        if self.index is not None:
+            entries = []
+            for record, line in records:
+                entries.append((record, offset, len(line)))
+                offset += len(line)
+            try:
+                self.index.add(entries, os.path.basename(self._segment_path))
+            except Exception as e:
+                logger.error(f"Error indexing conversation log: {e}")
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment_counter += 1
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._segment_path = os.path.join(
+            self.directory, f"{SEGMENT_PREFIX}{timestamp}-{os.getpid()}-{self._segment_counter}.jsonl"
+        )
+        # Binary, so tell() gives the byte offsets the index points at
+        self._segment = open(self._segment_path, 'ab')
+        self._segment_opened_at = time.monotonic()
+
+    def _rotate_if_needed(self):
+        if self._segment is None:
+            return
+        too_big = self._segment.tell() >= self.max_segment_bytes
+        too_old = time.monotonic() - self._segment_opened_at >= self.max_segment_seconds
+        if too_big or too_old:
+            self._close_segment()
+            self.segments_rotated += 1
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        path = self._segment_path
+        self._segment.close()
+        self._segment = None
+        self._segment_path = None
+        if self.compress:
+            try:
+                blocks = compress_segment(path, COMPRESSED_BLOCK_BYTES)
+                # Offsets stay valid: they count uncompressed bytes
+                if self.index is not None:
+                    self.index.segment_compressed(os.path.basename(path), os.path.basename(path) + '.gz', blocks)
+                os.remove(path)
+            except Exception as e:
+                logger.error(f"Failed to compress log segment {path}: {e}")
+
+
+def _json_default(value):
+    # Read-only mappings such as section records serialize as objects, anything else as its str()
+    return dict(value) if isinstance(value, Mapping) else str(value)
+
+
+def compress_segment(path: str, block_size: int) -> List[Tuple[int, int]]:
+    """
+    Gzip path to path + '.gz' as one gzip member per block_size uncompressed bytes
+    (still a valid gzip file). Returns (uncompressed offset, compressed offset) of
+    every member, so a reader can start decompressing at the block holding a record.
+    """
+    blocks = []
+    offset = 0
+    with open(path, 'rb') as source, open(path + '.gz', 'wb') as target:
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            blocks.append((offset, target.tell()))
+            target.write(gzip.compress(block))
+            offset += len(block)
+    return blocks
+
+
+def gzip_member_offsets(path: str) -> List[Tuple[int, int]]:
+    """(uncompressed offset, compressed offset) of every gzip member of a file, as compress_segment returns them"""
+    members = []
+    uncompressed = compressed = 0
+    decompressor = None
+    data = b''
+    with open(path, 'rb') as f:
+        while True:
+            if not data:
+                data = f.read(COMPRESSED_BLOCK_BYTES)
+                if not data:
+                    break
+            if decompressor is None:
+                members.append((uncompressed, compressed))
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            uncompressed += len(decompressor.decompress(data))
+            if decompressor.eof:
+                compressed += len(data) - len(decompressor.unused_data)
+                data = decompressor.unused_data
+                decompressor = None
+            else:
+                compressed += len(data)
+                data = b''
+    return members
+
+
+def iter_segment_entries(path: str) -> Iterator[Tuple[int, int, Dict]]:
+    """
+    Yield (offset, length, record) for every record of one segment (.jsonl or
+    .jsonl.gz), skipping a torn last line. Offsets count uncompressed bytes.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    offset = 0
+    with opener(path, 'rb') as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped:
+                try:
+                    yield offset, len(line), json.loads(stripped)
+                except ValueError:
+                    logger.warning(f"Skipping malformed log line in {path}")
+            offset += len(line)
+
+
+def iter_segment_records(path: str) -> Iterator[Dict]:
+    """Yield the records of one segment (.jsonl or .jsonl.gz), skipping a torn last line"""
+    for _, _, record in iter_segment_entries(path):
+        yield record
+
+
+def read_conversation_logs(directory: str = 'logs') -> Iterator[Dict]:
+    """Yield every logged conversation: segment files plus legacy one-file-per-request logs"""
+    if not os.path.isdir(directory):
+        return
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.startswith(SEGMENT_PREFIX) and (filename.endswith('.jsonl') or filename.endswith('.jsonl.gz')):
+            yield from iter_segment_records(path)
+        elif filename.endswith('.json'):
+            with open(path, 'r', encoding='utf-8') as f:
+                yield json.load(f)
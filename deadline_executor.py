@@ -0,0 +1,121 @@
+"""
+Bounded executor for slow optional work (LLM enrichment) with per-call deadlines.
+
+Request threads hand the call to a small worker pool and wait at most
+``timeout`` seconds for it. When the deadline passes the request goes on
+without the result while the call finishes in the background (its response
+still lands in the LLM cache). When too many calls are already pending, new
+ones are skipped instead of queueing behind them.
+
+Streamed calls run on the same pool and count against the same limit; their
+items are relayed to the request thread until the deadline, and the producer
+stops at its next item once the request has given up on it.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = 'completed'
+TIMED_OUT = 'timed_out'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+# Status of the items relayed by DeadlineExecutor.stream before its final status
+CHUNK = 'chunk'
+
+
+class DeadlineExecutor:
+    def __init__(self, max_workers: int = 4, max_pending: int = 16, thread_name_prefix: str = 'llm'):
+        """Create a pool of max_workers threads accepting at most max_pending outstanding calls"""
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, fn: Callable[[], object], timeout: float) -> Tuple[str, Optional[object]]:
+        """
+        Run fn() on the pool and wait up to timeout seconds.
+        Returns (status, result) where status is one of completed, timed_out,
+        skipped (pool saturated) or failed (fn raised).
+        """
+        if not self._slots.acquire(blocking=False):
+            logger.warning("LLM executor saturated, skipping call")
+            return SKIPPED, None
+
+        try:
+            future = self._executor.submit(fn)
+        except RuntimeError:
+            self._slots.release()
+            return SKIPPED, None
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return COMPLETED, future.result(timeout=timeout)
+        except TimeoutError:
+            return TIMED_OUT, None
+        except Exception as e:
+            logger.warning(f"LLM call failed: {e}")
+            return FAILED, None
+
+    def stream(self, produce: Callable[[], Iterable[object]], timeout: float) -> Iterator[Tuple[str, Optional[object]]]:
+        """
+        Iterate produce() on the pool and relay its items for at most timeout seconds.
+        Yields (chunk, item) for every item, then one final (status, None) where
+        status is completed, timed_out, skipped or failed.
+        """
+        if not self._slots.acquire(blocking=False):
+            logger.warning("LLM executor saturated, skipping streamed call")
+            yield SKIPPED, None
+            return
+
+        items = queue.Queue()
+        abandoned = threading.Event()
+
+        def relay():
+            iterator = None
+            try:
+                # Inside the try: a produce() that raises is a failure, not a timeout
+                iterator = iter(produce())
+                for item in iterator:
+                    if abandoned.is_set():
+                        break
+                    items.put((CHUNK, item))
+                else:
+                    items.put((COMPLETED, None))
+            except Exception as e:
+                logger.warning(f"Streamed LLM call failed: {e}")
+                items.put((FAILED, None))
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    close()
+
+        try:
+            future = self._executor.submit(relay)
+        except RuntimeError:
+            self._slots.release()
+            yield SKIPPED, None
+            return
+        future.add_done_callback(lambda _: self._slots.release())
+
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    status, item = items.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    yield TIMED_OUT, None
+                    return
+                yield status, item
+                if status != CHUNK:
+                    return
+        finally:
+            # Also reached when the consumer stops early (e.g. the client disconnected)
+            abandoned.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,91 @@
+"""
+Offline encoders for dense (semantic) section retrieval.
+
+MLEnhancer.semantic_search embeds every section once into a float32 matrix of
+unit vectors; a query is then one matrix product against it plus a partial
+top-k, with no network access. Two encoders are available (DENSE_ENCODER):
+
+    lsa                    TF-IDF projected onto its top DENSE_DIMENSIONS singular
+                           vectors (latent semantic analysis), fitted on the
+                           sections at startup. The default.
+    sentence-transformers  a sentence-transformers model loaded from the local
+                           directory DENSE_MODEL_PATH. It is never downloaded;
+                           without the package or the model, LSA is used.
+"""
+import logging
+import os
+from typing import List
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+DENSE_ENCODER = os.getenv('DENSE_ENCODER', 'lsa').lower()
+DENSE_DIMENSIONS = int(os.getenv('DENSE_DIMENSIONS', '128'))
+DENSE_MODEL_PATH = os.getenv('DENSE_MODEL_PATH', '')
+
+
+class LSAEncoder:
+    name = 'lsa'
+
+    def __init__(self, dimensions: int = DENSE_DIMENSIONS):
+        self.dimensions = dimensions
+        self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), sublinear_tf=True)
+        self.svd = None
+
+    def fit(self, texts: List[str]):
+        """Fit TF-IDF and the SVD projection on the section texts"""
+        tfidf = self.vectorizer.fit_transform(texts)
+        # TruncatedSVD needs fewer components than both sections and terms
+        dimensions = min(self.dimensions, tfidf.shape[0] - 1, tfidf.shape[1] - 1)
+        if dimensions < 1:
+            raise ValueError("Not enough sections to fit an LSA projection")
+        self.svd = TruncatedSVD(n_components=dimensions, random_state=0).fit(tfidf)
+        self.dimensions = dimensions
+        logger.info(f"Fitted {dimensions}-dimensional LSA projection on {tfidf.shape[0]} sections")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-length float32 vectors (all zeros for texts without a known term)"""
+        return normalize(self.svd.transform(self.vectorizer.transform(texts))).astype(np.float32)
+
+
+class SentenceTransformerEncoder:
+    name = 'sentence-transformers'
+
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path, device='cpu')
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+
+    def fit(self, texts: List[str]):
+        """Pretrained; nothing to fit"""
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def load_dense_encoder():
+    """The encoder selected by DENSE_ENCODER, falling back to LSA"""
+    if DENSE_ENCODER == 'sentence-transformers':
+        if not DENSE_MODEL_PATH or not os.path.isdir(DENSE_MODEL_PATH):
+            logger.warning("DENSE_MODEL_PATH is not a local model directory, using LSA for semantic search")
+        else:
+            try:
+                encoder = SentenceTransformerEncoder(DENSE_MODEL_PATH)
+                logger.info(f"Loaded sentence-transformers model from {DENSE_MODEL_PATH}")
+                return encoder
+            except Exception as e:
+                logger.warning(f"Failed to load sentence-transformers model, using LSA for semantic search: {e}")
+    elif DENSE_ENCODER != 'lsa':
+        logger.warning(f"Unknown DENSE_ENCODER '{DENSE_ENCODER}', using LSA for semantic search")
+    return LSAEncoder()
+
+
+def encode_sections(encoder, texts: List[str]) -> np.ndarray:
+    """Fit the encoder on the section texts and return their (sections x dimensions) float32 matrix"""
+    encoder.fit(texts)
+    return np.ascontiguousarray(encoder.encode(texts), dtype=np.float32)
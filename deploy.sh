@@ -104,6 +104,14 @@ prepare_backend() {
     fi
     
     print_success "Backend dependencies installed!"
+    
+    python index_artifacts.py
+    if [ $? -ne 0 ]; then
+        print_error "Failed to build index artifacts"
+        exit 1
+    fi
+    
+    print_success "Index artifacts built!"
 }
 
 # Setup environment
@@ -146,7 +154,7 @@ create_deployment_files() {
     
     # Create Procfile if it doesn't exist
     if [ ! -f "Procfile" ]; then
-        echo "web: python app.py" > Procfile
+        echo "web: gunicorn -c gunicorn.conf.py app:app" > Procfile
         print_success "Created Procfile"
     fi
     
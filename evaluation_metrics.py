@@ -0,0 +1,150 @@
+"""
+Per-case scoring and incrementally aggregated accuracy metrics, shared by
+AccuracyEvaluator and StandaloneAccuracyEvaluator.
+
+MetricsAccumulator keeps running sums (true/false positives and negatives,
+per-case precision, recall, F1, exact-match accuracy and confidence, overall
+and per category), so metrics are available at any point of a run over a
+large case file without holding the individual results. Latencies are kept
+as a float32 array to report percentiles.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def score_case(test_case: Dict, relevant_sections: List[Dict], latency_ms: Optional[float] = None) -> Dict:
+    """Compare the sections returned for a case with its expected sections"""
+    expected_sections = set(test_case["expected_sections"])
+    predicted_sections = set([section['section_number'] for section in relevant_sections])
+
+    # Calculate metrics
+    true_positives = len(expected_sections.intersection(predicted_sections))
+    false_positives = len(predicted_sections - expected_sections)
+    false_negatives = len(expected_sections - predicted_sections)
+
+    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
+    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    accuracy = 1 if expected_sections == predicted_sections else 0
+
+    # Calculate confidence scores
+    avg_confidence = float(np.mean([section['score'] for section in relevant_sections])) if relevant_sections else 0
+
+    result = {
+        "query": test_case["query"],
+        "expected_sections": list(expected_sections),
+        "predicted_sections": list(predicted_sections),
+        "precision": precision,
+        "recall": recall,
+        "f1_score": f1,
+        "accuracy": accuracy,
+        "avg_confidence": avg_confidence,
+        "true_positives": true_positives,
+        "false_positives": false_positives,
+        "false_negatives": false_negatives,
+        "category": test_case["category"],
+        "description": test_case["description"]
+    }
+    if latency_ms is not None:
+        result["latency_ms"] = latency_ms
+    return result
+
+
+class _Totals:
+    __slots__ = ('count', 'tp', 'fp', 'fn', 'precision', 'recall', 'f1', 'accuracy', 'confidence')
+
+    def __init__(self):
+        self.count = 0
+        self.tp = self.fp = self.fn = 0
+        self.precision = self.recall = self.f1 = self.accuracy = self.confidence = 0.0
+
+    def add(self, result: Dict):
+        self.count += 1
+        self.tp += result['true_positives']
+        self.fp += result['false_positives']
+        self.fn += result['false_negatives']
+        self.precision += result['precision']
+        self.recall += result['recall']
+        self.f1 += result['f1_score']
+        self.accuracy += result['accuracy']
+        self.confidence += result['avg_confidence']
+
+    def micro(self) -> Dict:
+        precision = self.tp / (self.tp + self.fp) if (self.tp + self.fp) > 0 else 0
+        recall = self.tp / (self.tp + self.fn) if (self.tp + self.fn) > 0 else 0
+        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+        return {"micro_precision": precision, "micro_recall": recall, "micro_f1": f1}
+
+
+def latency_summary(latencies: np.ndarray) -> Dict:
+    if len(latencies) == 0:
+        return {}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(latencies.max()), 3)
+    }
+
+
+class MetricsAccumulator:
+    def __init__(self):
+        self.totals = _Totals()
+        self.category_totals: Dict[str, _Totals] = {}
+        self._latencies = np.empty(1024, dtype=np.float32)
+        self._latency_count = 0
+        self._category_latencies: Dict[str, List[float]] = {}
+
+    def add(self, result: Dict):
+        self.totals.add(result)
+        category = result['category']
+        if category not in self.category_totals:
+            self.category_totals[category] = _Totals()
+            self._category_latencies[category] = []
+        self.category_totals[category].add(result)
+
+        latency = result.get('latency_ms')
+        if latency is not None:
+            if self._latency_count == len(self._latencies):
+                self._latencies = np.resize(self._latencies, 2 * len(self._latencies))
+            self._latencies[self._latency_count] = latency
+            self._latency_count += 1
+            self._category_latencies[category].append(latency)
+
+    def overall(self) -> Dict:
+        """Micro and macro averaged metrics over every case added so far"""
+        totals = self.totals
+        count = totals.count or 1
+        return dict(
+            total_cases=totals.count,
+            **totals.micro(),
+            macro_precision=totals.precision / count,
+            macro_recall=totals.recall / count,
+            macro_f1=totals.f1 / count,
+            overall_accuracy=totals.accuracy / count,
+            avg_confidence=totals.confidence / count
+        )
+
+    def categories(self) -> Dict:
+        """Per-category averages (and latency, when measured)"""
+        category_metrics = {}
+        for category, totals in self.category_totals.items():
+            category_metrics[category] = dict(
+                count=totals.count,
+                avg_precision=totals.precision / totals.count,
+                avg_recall=totals.recall / totals.count,
+                avg_f1=totals.f1 / totals.count,
+                avg_accuracy=totals.accuracy / totals.count,
+                **totals.micro()
+            )
+            if self._category_latencies[category]:
+                category_metrics[category]["latency"] = latency_summary(
+                    np.array(self._category_latencies[category], dtype=np.float32)
+                )
+        return category_metrics
+
+    def latency(self) -> Dict:
+        return latency_summary(self._latencies[:self._latency_count])
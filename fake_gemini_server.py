@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini REST API, for load tests without an API key or
+network access.
+
+It answers generateContent and streamGenerateContent for any model with a
+canned summary after a configurable delay, and fails a configurable share of
+requests. Point the app at it with:
+
+    python fake_gemini_server.py --port 8089 --latency-ms 800 --error-rate 0.05
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8089 gunicorn -c gunicorn.conf.py app:app
+
+GET /stats returns the number of requests, errors and the latency served so far.
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TEXT = (
+    "Based on the incident described, the listed IPC sections apply. The matched offence carries the "
+    "punishment stated in each section. Preserve any evidence, note the names of witnesses and file a "
+    "complaint at the nearest police station. Consult a lawyer for advice on your specific situation."
+)
+
+
+class FakeGeminiState:
+    def __init__(self, latency_ms: float = 500.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, stream_chunks: int = 4, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_chunks = stream_chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start_request(self):
+        """Count the request and draw (delay in seconds, whether it fails)"""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def finish_request(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "latency_ms": self.latency_ms,
+                "jitter_ms": self.jitter_ms,
+                "error_rate": self.error_rate
+            }
+
+
+def response_body(text: str, finish_reason: str = "STOP") -> dict:
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "finishReason": finish_reason,
+            "index": 0
+        }],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text.split())}
+    }
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state: FakeGeminiState = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/stats'):
+            self.send_json(200, self.state.stats())
+        else:
+            self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self):
+        # Read the prompt so the connection can be reused; its content does not matter
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path = self.path.split('?', 1)[0]
+        if not (path.endswith(':generateContent') or path.endswith(':streamGenerateContent')):
+            self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        delay, failed = self.state.start_request()
+        try:
+            time.sleep(delay)
+            if failed:
+                status = self.state.error_status
+                self.send_json(status, {"error": {"code": status, "message": "Injected failure", "status": "INTERNAL"}})
+            elif path.endswith(':streamGenerateContent'):
+                # Without alt=sse the REST transport reads one JSON array of responses
+                words = SUMMARY_TEXT.split(' ')
+                size = -(-len(words) // max(1, self.state.stream_chunks))
+                chunks = [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+                self.send_json(200, [response_body(chunk) for chunk in chunks])
+            else:
+                self.send_json(200, response_body(SUMMARY_TEXT))
+        finally:
+            self.state.finish_request()
+
+
+def make_server(host: str = '127.0.0.1', port: int = 8089, **options) -> ThreadingHTTPServer:
+    """An HTTP server (not yet serving) whose handler shares one FakeGeminiState built from options"""
+    handler = type('Handler', (FakeGeminiHandler,), {'state': FakeGeminiState(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gemini API stand-in with injected latency and errors")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=500.0, help="mean response delay")
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help="delay varies uniformly by up to this much")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests that fail (0-1)")
+    parser.add_argument('--error-status', type=int, default=500,
+                        help="HTTP status of failed requests (503 is retried by the Gemini client)")
+    parser.add_argument('--stream-chunks', type=int, default=4)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(
+        args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        error_status=args.error_status, stream_chunks=args.stream_chunks, seed=args.seed
+    )
+    logger.info(f"Fake Gemini API listening on http://{args.host}:{args.port} "
+                f"(latency {args.latency_ms}±{args.jitter_ms} ms, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
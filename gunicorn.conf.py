@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for production serving: gunicorn -c gunicorn.conf.py app:app
+
+The app (IPC data, retrieval index, warm-up lookup) is loaded once in the
+master process and the workers are forked from it, so the read-only index
+pages are shared copy-on-write instead of being rebuilt per worker.
+
+Graceful restart: `kill -HUP <master pid>` replaces the workers after they
+finish in-flight requests (up to GUNICORN_GRACEFUL_TIMEOUT seconds). Because
+the app is preloaded, picking up new code or data needs a new master:
+`kill -USR2 <master pid>` starts one next to the old master, then
+`kill -QUIT <old master pid>` once it is ready.
+
+Every master gets its own METRICS_DIR (a fresh temporary directory unless it
+is set), where the workers leave metrics snapshots so that /metrics reports
+the whole server.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import tempfile
+
+logger = logging.getLogger('gunicorn.error')
+
+# Set before the app (and metrics.py) is preloaded. Only created when unset:
+# setdefault would evaluate (and leak) a temporary directory every time.
+if 'METRICS_DIR' not in os.environ:
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='ipc-metrics-')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count()))))
+# Threads per worker cover requests waiting on Gemini while others use the CPU
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def when_ready(server):
+    # The preloaded app is fully built at this point. Move everything it allocated out of
+    # the collector's generations so GC passes in the workers do not touch (and copy) those pages.
+    gc.collect()
+    gc.freeze()
+    # Snapshots left by the workers of an earlier master would be counted again
+    metrics_dir = os.environ['METRICS_DIR']
+    for name in os.listdir(metrics_dir) if os.path.isdir(metrics_dir) else ():
+        if name.endswith('.json'):
+            os.remove(os.path.join(metrics_dir, name))
+    logger.info(f"App preloaded and warm, forking {workers} workers x {threads} threads")
+
+
+def post_worker_init(worker):
+    from metrics import REGISTRY
+
+    # Forked workers start from zero (not from the master's warm-up) and share their values through METRICS_DIR
+    REGISTRY.reset()
+    REGISTRY.start_exporter()
+    logger.info(f"Worker {worker.pid} ready")
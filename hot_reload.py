@@ -0,0 +1,87 @@
+"""
+Background rebuild and atomic swap of the retrieval engine.
+
+A reload builds a complete new engine (section store, vectorizer, indexes)
+on a background thread while requests keep using the current one. The new
+engine then replaces the old one with a single reference assignment, so
+readers never take a lock and requests already in flight finish on the
+snapshot they started with. Triggers that arrive during a rebuild are
+coalesced into one more rebuild afterwards.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EngineReloader:
+    def __init__(self, build: Callable[[], object], swap: Callable[[object], None]):
+        """build() returns a ready-to-serve engine; swap(engine) publishes it"""
+        self.build = build
+        self.swap = swap
+        self.reloads = 0
+        self.failures = 0
+        self.last_reason = None
+        self.last_reload_at = None
+        self.last_duration_ms = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._pending = False
+        self._thread = None
+        self._idle = threading.Event()
+        self._idle.set()
+
+    def trigger(self, reason: str):
+        """Schedule a rebuild; returns immediately"""
+        with self._lock:
+            self._pending = True
+            self.last_reason = reason
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._idle.clear()
+            self._thread = threading.Thread(target=self._run, name='engine-reload', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no rebuild is running or pending"""
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    self._idle.set()
+                    return
+                self._pending = False
+                reason = self.last_reason
+
+            started = time.perf_counter()
+            logger.info(f"Rebuilding retrieval engine ({reason})")
+            try:
+                engine = self.build()
+                self.swap(engine)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Engine reload failed, keeping the current engine: {e}")
+                continue
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_at = datetime.now().isoformat()
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Retrieval engine swapped in {self.last_duration_ms}ms")
+
+    def stats(self) -> Dict:
+        return {
+            "running": not self._idle.is_set(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_reason": self.last_reason,
+            "last_reload_at": self.last_reload_at,
+            "last_duration_ms": self.last_duration_ms,
+            "last_error": self.last_error
+        }
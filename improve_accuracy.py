@@ -1,19 +1,34 @@
-import json
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import re
-from difflib import SequenceMatcher
+import threading
+import time
+from scipy.sparse import vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
+from bm25_index import RETRIEVAL_BACKEND, BM25Index
+from index_artifacts import ARTIFACTS_DIR, load_index_artifacts, save_index_artifacts
+from keyword_index import FuzzyKeywordIndex, MatchedKeywordEngine
+from metrics import STAGE_SECONDS
+from pattern_automaton import PatternAutomaton
+from ranking import top_k_indices
+from section_edits import SectionExistsError, merge_section, validate_section
+from section_store import SectionHit, SectionRecord, get_section_store
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+KEYWORD_EXTRACTION_SECONDS = STAGE_SECONDS.labels('keyword_extraction')
+PATTERN_MATCHING_SECONDS = STAGE_SECONDS.labels('pattern_matching')
+TFIDF_SEARCH_SECONDS = STAGE_SECONDS.labels('tfidf_search')
+FALLBACK_MATCHING_SECONDS = STAGE_SECONDS.labels('fallback_matching')
+
 class AccuracyImprover:
-    def __init__(self):
+    def __init__(self, artifacts_dir: Optional[str] = ARTIFACTS_DIR):
+        """Load prebuilt index artifacts from artifacts_dir when they are current, else build in process"""
         self.ipc_sections = self.load_ipc_sections()
-        self.expanded_sections = self.expand_sections()
         
         # Better TF-IDF parameters
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -23,24 +38,56 @@ class AccuracyImprover:
             min_df=1,
             max_df=0.95
         )
+        self.tfidf_matrix = None
+        artifacts = load_index_artifacts(self.tfidf_vectorizer, artifacts_dir) if artifacts_dir else None
+        if artifacts is not None:
+            self.expanded_sections, self.tfidf_matrix = artifacts
+        else:
+            self.expanded_sections = self.expand_sections()
+        self.keyword_index = FuzzyKeywordIndex(
+            [section.get('expanded_keywords', section['keywords']) for section in self.expanded_sections],
+            min_similarity=0.4
+        )
+        self.matched_keyword_engine = MatchedKeywordEngine(self.keyword_index, threshold=0.6)
+        self.crime_patterns = self.load_crime_patterns()
+        self.pattern_automaton = PatternAutomaton(self.crime_patterns)
+        self.category_sections = self.build_category_sections('keywords')
+        self.expanded_category_sections = self.build_category_sections('expanded_keywords')
         self.similarity_threshold = 0.15  # Lowered for better recall
-        self.precompute_embeddings()
+        if self.tfidf_matrix is None:
+            self.precompute_embeddings()
+        
+        # Inverted-index BM25 in place of the TF-IDF matrix scan (RETRIEVAL_BACKEND=bm25 or maxscore)
+        self.bm25_index = None
+        if RETRIEVAL_BACKEND in ('bm25', 'maxscore'):
+            self.bm25_index = BM25Index(
+                [self.section_text(section) for section in self.expanded_sections],
+                self.tfidf_vectorizer.build_analyzer()
+            )
+        
+        # Incremental section edits (see add_section). Rows past the fitted matrix are appended
+        # to delta_rows and stacked on the next search; retired rows stay in place, masked,
+        # until the next full rebuild.
+        self.section_index = {section['section_number']: idx for idx, section in enumerate(self.expanded_sections)}
+        self.base_size = len(self.expanded_sections)
+        self.delta_rows = []
+        self._delta_matrix = None
+        self.retired_sections = frozenset()
+        # (hash of the sections file, journal edits applied), set by whoever replays the edit journal
+        self.section_edit_cursor = None
+        self._edit_lock = threading.Lock()
     
     def load_ipc_sections(self) -> List[Dict]:
-        try:
-            with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('sections', [])
-        except Exception as e:
-            logger.error(f"Failed to load IPC sections: {e}")
-            return []
+        return get_section_store().sections
     
     def expand_sections(self) -> List[Dict]:
         """Expand sections with additional keywords"""
-        expanded = []
-        
+        legal_synonyms = self.load_legal_synonyms()
+        return [self.expand_section(section, legal_synonyms) for section in self.ipc_sections]
+    
+    def load_legal_synonyms(self) -> Dict[str, List[str]]:
         # Legal synonyms database
-        legal_synonyms = {
+        return {
             "theft": ["steal", "stolen", "robbery", "pickpocket", "burglary", "larceny", "thief", "stole", "took", "snatched"],
             "assault": ["hit", "beat", "punch", "slap", "kick", "attack", "physical assault", "bodily harm", "battery", "strike"],
             "murder": ["kill", "murder", "homicide", "death", "dead", "killed", "killing", "assassination", "slay", "slain"],
@@ -56,32 +103,30 @@ class AccuracyImprover:
             "drugs": ["drugs", "narcotics", "substance", "trafficking", "possession", "smuggling"],
             "corruption": ["corruption", "bribe", "bribery", "graft", "kickback", "payoff", "embezzlement"]
         }
+    
+    def expand_section(self, section: SectionRecord, legal_synonyms: Optional[Dict[str, List[str]]] = None) -> SectionRecord:
+        """Expand one section with synonyms and common legal terms"""
+        legal_synonyms = legal_synonyms or self.load_legal_synonyms()
+        expanded_keywords = set(section['keywords'])
         
-        for section in self.ipc_sections:
-            expanded_section = section.copy()
-            expanded_keywords = set(section['keywords'])
-            
-            # Add synonyms
-            for keyword in section['keywords']:
-                for category, synonyms in legal_synonyms.items():
-                    if keyword.lower() in synonyms or any(syn.lower() in keyword.lower() for syn in synonyms):
-                        expanded_keywords.update(synonyms)
-            
-            # Add common legal terms
-            legal_terms = ["offense", "crime", "criminal", "illegal", "unlawful", "prohibited", "punishable", "liable"]
-            expanded_keywords.update(legal_terms)
-            
-            expanded_section['expanded_keywords'] = list(expanded_keywords)
-            expanded.append(expanded_section)
+        # Add synonyms
+        for keyword in section['keywords']:
+            for category, synonyms in legal_synonyms.items():
+                if keyword.lower() in synonyms or any(syn.lower() in keyword.lower() for syn in synonyms):
+                    expanded_keywords.update(synonyms)
         
-        return expanded
+        # Add common legal terms
+        legal_terms = ["offense", "crime", "criminal", "illegal", "unlawful", "prohibited", "punishable", "liable"]
+        expanded_keywords.update(legal_terms)
+        
+        return section.with_expanded_keywords(list(expanded_keywords))
+    
+    def section_text(self, section: Dict) -> str:
+        return f"{section['title']} {section['description']} {' '.join(section['keywords'])} {' '.join(section.get('expanded_keywords', []))}"
     
     def precompute_embeddings(self):
         try:
-            section_texts = []
-            for section in self.expanded_sections:
-                text = f"{section['title']} {section['description']} {' '.join(section['keywords'])} {' '.join(section.get('expanded_keywords', []))}"
-                section_texts.append(text)
+            section_texts = [self.section_text(section) for section in self.expanded_sections]
             
             self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(section_texts)
             logger.info(f"Pre-computed enhanced TF-IDF embeddings for {len(self.expanded_sections)} sections")
@@ -111,8 +156,8 @@ class AccuracyImprover:
         
         return keywords + bigrams
     
-    def pattern_matching(self, query: str) -> Dict[str, float]:
-        patterns = {
+    def load_crime_patterns(self) -> Dict[str, List[str]]:
+        return {
             "theft": [r"stole my", r"took my", r"stolen", r"missing", r"lost my", r"someone took"],
             "assault": [r"hit me", r"beat me", r"attacked me", r"assaulted me", r"punch", r"slap", r"kick"],
             "murder": [r"killed", r"murdered", r"dead", r"death", r"killing", r"homicide"],
@@ -123,85 +168,138 @@ class AccuracyImprover:
             "defamation": [r"spread rumors", r"false rumors", r"defamed", r"slandered", r"libel"],
             "cyber_crime": [r"online", r"internet", r"cyber", r"digital", r"computer", r"hacking"]
         }
-        
-        scores = {}
-        for category, pattern_list in patterns.items():
-            score = 0
-            for pattern in pattern_list:
-                if re.search(pattern, query.lower()):
-                    score += 1.0
-            if score > 0:
-                scores[category] = score
-        
-        return scores
+    
+    def build_category_sections(self, keywords_field: str) -> Dict[str, set]:
+        """Map each crime category to the sections whose title or keywords mention it"""
+        category_sections = {}
+        for category in self.crime_patterns:
+            category_sections[category] = set(
+                idx for idx, section in enumerate(self.expanded_sections)
+                if category in self.section_categories(section, keywords_field)
+            )
+        return category_sections
+    
+    def section_categories(self, section: Dict, keywords_field: str) -> List[str]:
+        """The crime categories mentioned in a section's title or keywords"""
+        title = section['title'].lower()
+        keywords = ' '.join(section.get(keywords_field, section['keywords'])).lower()
+        return [category for category in self.crime_patterns if category in title or category in keywords]
+    
+    def pattern_matching(self, query: str) -> Dict[str, float]:
+        return self.pattern_automaton.scan(query)
     
     def tfidf_search_enhanced(self, query: str, top_k: int = 10):
+        return self.tfidf_search_enhanced_batch([query], top_k)[0]
+    
+    def tfidf_search_enhanced_batch(self, queries: List[str], top_k: int = 10) -> List[List[Tuple[int, float]]]:
+        """TF-IDF search for many queries with one transform, one sparse product and per-row top-k"""
+        # One observation per call, so a batch counts once
+        with TFIDF_SEARCH_SECONDS.time():
+            return self._tfidf_search_enhanced_batch(queries, top_k)
+    
+    def _tfidf_search_enhanced_batch(self, queries: List[str], top_k: int) -> List[List[Tuple[int, float]]]:
+        if self.bm25_index is not None:
+            return self.bm25_index.search_batch(
+                queries, top_k, self.similarity_threshold, self.retired_sections, prune=RETRIEVAL_BACKEND == 'maxscore'
+            )
         try:
-            query_vector = self.tfidf_vectorizer.transform([query])
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix)[0]
-            top_indices = np.argsort(similarities)[::-1][:top_k]
-            
-            results = [(idx, similarities[idx]) for idx in top_indices if similarities[idx] > self.similarity_threshold]
-            return results
+            query_vectors = self.tfidf_vectorizer.transform(queries)
+            # Retired rows before delta rows: every retired row is then covered by the delta read
+            retired = self.retired_sections
+            delta_matrix = self.delta_matrix()
+            similarities = cosine_similarity(query_vectors, self.tfidf_matrix)
+            if delta_matrix is not None:
+                similarities = np.hstack([similarities, cosine_similarity(query_vectors, delta_matrix)])
+            if retired:
+                similarities[:, list(retired)] = 0
+            return [
+                [(idx, row[idx]) for idx in top_k_indices(row, top_k) if row[idx] > self.similarity_threshold]
+                for row in similarities
+            ]
         except Exception as e:
             logger.error(f"Enhanced TF-IDF search failed: {e}")
-            return []
+            return [[] for _ in queries]
+    
+    def delta_matrix(self):
+        """The added sections' TF-IDF rows as one matrix (None without any), stacked once after each batch of adds"""
+        count = len(self.delta_rows)
+        stacked = self._delta_matrix
+        if stacked is not None and stacked.shape[0] == count:
+            return stacked
+        if count == 0:
+            return None
+        stacked = vstack(self.delta_rows[:count], format='csr')
+        self._delta_matrix = stacked
+        return stacked
     
     def find_relevant_sections_enhanced(self, user_input: str) -> List[Dict]:
+        tfidf_results = self.tfidf_search_enhanced(user_input) if self.retrieval_ready() else []
+        return self.rank_sections(user_input, tfidf_results)
+    
+    def find_relevant_sections_batch(self, queries: List[str]) -> List[List[Dict]]:
+        """find_relevant_sections_enhanced for many queries, scoring TF-IDF for all of them at once"""
+        if self.retrieval_ready():
+            tfidf_results = self.tfidf_search_enhanced_batch(queries)
+        else:
+            tfidf_results = [[] for _ in queries]
+        return [self.rank_sections(query, results) for query, results in zip(queries, tfidf_results)]
+    
+    def retrieval_ready(self) -> bool:
+        return self.bm25_index is not None or self.tfidf_matrix is not None
+    
+    def rank_sections(self, user_input: str, tfidf_results: List[Tuple[int, float]]) -> List[Dict]:
+        """Boost and explain the TF-IDF hits of one query, falling back to keyword matching"""
         results = []
-        keywords = self.extract_keywords_enhanced(user_input)
-        pattern_scores = self.pattern_matching(user_input)
+        with KEYWORD_EXTRACTION_SECONDS.time():
+            keywords = self.extract_keywords_enhanced(user_input)
+        with PATTERN_MATCHING_SECONDS.time():
+            pattern_scores = self.pattern_matching(user_input)
         
-        # Enhanced TF-IDF Search
-        if self.tfidf_matrix is not None:
-            tfidf_results = self.tfidf_search_enhanced(user_input)
-            for idx, score in tfidf_results:
-                section = self.expanded_sections[idx].copy()
-                
-                # Boost score based on pattern matching
-                pattern_boost = 0
-                for category, pattern_score in pattern_scores.items():
-                    if any(cat in section['title'].lower() or cat in ' '.join(section['keywords']).lower() for cat in [category]):
-                        pattern_boost += pattern_score * 0.3
-                
-                section['score'] = score + pattern_boost
-                section['method'] = 'enhanced_tfidf'
-                section['matched_keywords'] = [kw for kw in keywords if any(
-                    SequenceMatcher(None, kw.lower(), sk.lower()).ratio() > 0.6 
-                    for sk in section.get('expanded_keywords', section['keywords'])
-                )]
-                results.append(section)
+        # Enhanced TF-IDF (or BM25) hits
+        method = 'enhanced_bm25' if self.bm25_index is not None else 'enhanced_tfidf'
+        for idx, score in tfidf_results:
+            # Boost score based on pattern matching
+            pattern_boost = 0
+            for category, pattern_score in pattern_scores.items():
+                if idx in self.category_sections.get(category, ()):
+                    pattern_boost += pattern_score * 0.3
+            
+            results.append(SectionHit(
+                self.expanded_sections[idx], score + pattern_boost, method,
+                self.matched_keyword_engine.matched_keywords(keywords, idx)
+            ))
         
         # Enhanced keyword matching as fallback
         if not results:
-            for section in self.expanded_sections:
+            fallback_started = time.perf_counter()
+            section_matches = self.keyword_index.match(keywords)
+            retired = self.retired_sections
+            for section_idx, section in enumerate(self.expanded_sections):
+                if section_idx in retired:
+                    continue
                 score = 0
                 matched_keywords = []
-                expanded_keywords = section.get('expanded_keywords', section['keywords'])
                 
-                for keyword in keywords:
-                    for section_keyword in expanded_keywords:
-                        similarity = SequenceMatcher(None, keyword.lower(), section_keyword.lower()).ratio()
-                        if similarity > 0.8:
-                            score += similarity * 3
-                            matched_keywords.append(keyword)
-                        elif similarity > 0.6:
-                            score += similarity * 2
-                            matched_keywords.append(keyword)
-                        elif similarity > 0.4:
-                            score += similarity
+                for keyword, _, similarity in section_matches.get(section_idx, ()):
+                    if similarity > 0.8:
+                        score += similarity * 3
+                        matched_keywords.append(keyword)
+                    elif similarity > 0.6:
+                        score += similarity * 2
+                        matched_keywords.append(keyword)
+                    elif similarity > 0.4:
+                        score += similarity
                 
                 # Add pattern matching boost
                 for category, pattern_score in pattern_scores.items():
-                    if any(cat in section['title'].lower() or cat in ' '.join(expanded_keywords).lower() for cat in [category]):
+                    if section_idx in self.expanded_category_sections.get(category, ()):
                         score += pattern_score * 0.5
                 
                 if score > 0:
-                    section_copy = section.copy()
-                    section_copy['score'] = score / len(keywords) if keywords else 0
-                    section_copy['method'] = 'enhanced_keyword_matching'
-                    section_copy['matched_keywords'] = matched_keywords
-                    results.append(section_copy)
+                    results.append(SectionHit(
+                        section, score / len(keywords) if keywords else 0, 'enhanced_keyword_matching', matched_keywords
+                    ))
+            FALLBACK_MATCHING_SECONDS.observe(time.perf_counter() - fallback_started)
         
         # Sort and remove duplicates
         seen_sections = set()
@@ -212,6 +310,92 @@ class AccuracyImprover:
                 unique_results.append(result)
         
         return unique_results[:5]
+    
+    def add_section(self, section: Dict) -> SectionRecord:
+        """
+        Add a section without refitting: it is expanded on its own and vectorized
+        with the already fitted vocabulary and IDF, so terms the vocabulary does
+        not know only count after the next full rebuild (compaction).
+        """
+        record = SectionRecord.from_dict(validate_section(section))
+        with self._edit_lock:
+            if record.section_number in self.section_index:
+                raise SectionExistsError(f"Section {record.section_number} already exists")
+            self._append_section(record)
+            self.ipc_sections = self.ipc_sections + (record,)
+        logger.info(f"Added section {record.section_number} incrementally")
+        return record
+    
+    def update_section(self, section_number: str, fields: Dict) -> SectionRecord:
+        """Replace a section: its old row is retired and the merged section is appended"""
+        section_number = str(section_number)
+        with self._edit_lock:
+            idx = self.section_index.get(section_number)
+            if idx is None:
+                raise KeyError(section_number)
+            record = SectionRecord.from_dict(merge_section(dict(self.expanded_sections[idx]), fields))
+            self._append_section(record)
+            self.retired_sections = self.retired_sections | {idx}
+            self.ipc_sections = tuple(
+                record if existing['section_number'] == section_number else existing
+                for existing in self.ipc_sections
+            )
+        logger.info(f"Updated section {section_number} incrementally")
+        return record
+    
+    def retire_section(self, section_number: str) -> SectionRecord:
+        """Stop returning a section; its rows are dropped at the next full rebuild"""
+        section_number = str(section_number)
+        with self._edit_lock:
+            idx = self.section_index.pop(section_number, None)
+            if idx is None:
+                raise KeyError(section_number)
+            self.retired_sections = self.retired_sections | {idx}
+            self.ipc_sections = tuple(
+                existing for existing in self.ipc_sections if existing['section_number'] != section_number
+            )
+        logger.info(f"Retired section {section_number}")
+        return self.expanded_sections[idx]
+    
+    def apply_section_edit(self, edit: Dict) -> SectionRecord:
+        """Apply one entry of the section edit journal"""
+        if edit.get('op') == 'add':
+            return self.add_section(edit['section'])
+        if edit.get('op') == 'update':
+            return self.update_section(edit['section_number'], edit['section'])
+        if edit.get('op') == 'retire':
+            return self.retire_section(edit['section_number'])
+        raise ValueError(f"Unknown section edit: {edit.get('op')}")
+    
+    def _append_section(self, record: SectionRecord):
+        # Everything is computed first; the section then becomes visible structure by
+        # structure, ending with its TF-IDF row, so a concurrent search never sees an
+        # index that points past what has been published.
+        expanded = self.expand_section(record)
+        keywords = expanded.get('expanded_keywords', expanded['keywords'])
+        vector = self.tfidf_vectorizer.transform([self.section_text(expanded)]) if self.tfidf_matrix is not None else None
+        
+        idx = len(self.expanded_sections)
+        self.expanded_sections.append(expanded)
+        self.keyword_index.add_section(idx, keywords)
+        self.matched_keyword_engine.add_section(idx, keywords)
+        for category in self.section_categories(expanded, 'keywords'):
+            self.category_sections[category].add(idx)
+        for category in self.section_categories(expanded, 'expanded_keywords'):
+            self.expanded_category_sections[category].add(idx)
+        if vector is not None:
+            self.delta_rows.append(vector)
+        if self.bm25_index is not None:
+            self.bm25_index.add_document(idx, self.section_text(expanded))
+        self.section_index[record.section_number] = idx
+    
+    def index_stats(self) -> Dict:
+        return {
+            "base_sections": self.base_size,
+            "delta_sections": len(self.expanded_sections) - self.base_size,
+            "retired_sections": len(self.retired_sections),
+            "live_sections": len(self.section_index)
+        }
 
 def test_improvements():
     """Test the improved system"""
@@ -241,11 +425,10 @@ def test_improvements():
         else:
             print("   No relevant sections found")
     
-    # Save enhanced sections
-    with open('data/enhanced_ipc_sections.json', 'w') as f:
-        json.dump({'sections': improver.expanded_sections}, f, indent=2)
+    # Save enhanced sections together with the matching index artifacts
+    save_index_artifacts(improver.expanded_sections, improver.tfidf_vectorizer, improver.tfidf_matrix)
     
-    print(f"\n📄 Enhanced IPC sections saved to 'data/enhanced_ipc_sections.json'")
+    print(f"\n📄 Enhanced IPC sections saved to 'data/enhanced_ipc_sections.json' (index artifacts in '{ARTIFACTS_DIR}')")
     print(f"🔧 Improvements implemented:")
     print(f"   - Enhanced TF-IDF (2000 features, n-grams 1-3)")
     print(f"   - Legal synonyms database ({len(improver.expanded_sections)} sections expanded)")
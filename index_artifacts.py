@@ -0,0 +1,159 @@
+"""
+Offline build artifacts for the enhanced retrieval engine.
+
+Building the engine means expanding every section with synonyms and fitting a
+(1,3)-gram TF-IDF vectorizer. This module does that once, ahead of time, and
+writes the result next to the data:
+
+    data/enhanced_ipc_sections.json   expanded sections
+    data/index/manifest.json          format version, vectorizer parameters, content hashes
+    data/index/tfidf_vocabulary.npy   terms ordered by column
+    data/index/tfidf_idf.npy          IDF weights
+    data/index/tfidf_{data,indices,indptr}.npy   CSR section matrix
+
+At startup the arrays are memory-mapped and only used when the manifest's
+hash of data/ipc_sections.json matches the file on disk; otherwise the engine
+falls back to building in process. Rebuild with:
+
+    python index_artifacts.py
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from section_store import SectionRecord
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_VERSION = 1
+IPC_SECTIONS_PATH = 'data/ipc_sections.json'
+ENHANCED_SECTIONS_PATH = 'data/enhanced_ipc_sections.json'
+ARTIFACTS_DIR = os.getenv('INDEX_ARTIFACTS_DIR', 'data/index')
+VECTORIZER_PARAMS = ('max_features', 'stop_words', 'ngram_range', 'min_df', 'max_df')
+CSR_ARRAYS = ('data', 'indices', 'indptr')
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def vectorizer_fingerprint(vectorizer) -> Dict:
+    """The vectorizer parameters an artifact was fitted with, in JSON form"""
+    params = vectorizer.get_params()
+    return {name: list(params[name]) if isinstance(params[name], tuple) else params[name]
+            for name in VECTORIZER_PARAMS}
+
+
+def save_index_artifacts(sections: List[Dict], vectorizer, tfidf_matrix, directory: str = ARTIFACTS_DIR,
+                         source_path: str = IPC_SECTIONS_PATH, sections_path: str = ENHANCED_SECTIONS_PATH):
+    """Write expanded sections, the fitted vocabulary/IDF and the CSR matrix, then the manifest"""
+    os.makedirs(directory, exist_ok=True)
+    with open(sections_path, 'w', encoding='utf-8') as f:
+        json.dump({'sections': [dict(section) for section in sections]}, f, indent=2)
+
+    terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    np.save(os.path.join(directory, 'tfidf_vocabulary.npy'), terms.astype(str))
+    np.save(os.path.join(directory, 'tfidf_idf.npy'), vectorizer.idf_)
+    matrix = csr_matrix(tfidf_matrix)
+    for name in CSR_ARRAYS:
+        np.save(os.path.join(directory, f'tfidf_{name}.npy'), getattr(matrix, name))
+
+    # Written last so a half-written build is never picked up
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "built_at": datetime.now().isoformat(),
+        "source_sha256": file_sha256(source_path),
+        "sections_sha256": file_sha256(sections_path),
+        "vectorizer": vectorizer_fingerprint(vectorizer),
+        "shape": list(matrix.shape)
+    }
+    manifest_path = os.path.join(directory, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    logger.info(f"Wrote index artifacts for {matrix.shape[0]} sections to {directory}")
+
+
+def load_index_artifacts(vectorizer, directory: str = ARTIFACTS_DIR, source_path: str = IPC_SECTIONS_PATH,
+                         sections_path: str = ENHANCED_SECTIONS_PATH) -> Optional[Tuple[List[Dict], csr_matrix]]:
+    """
+    Restore vectorizer's vocabulary and IDF from the artifacts and return
+    (expanded sections, memory-mapped TF-IDF matrix), or None if the artifacts
+    are missing or stale.
+    """
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        logger.info(f"No index artifacts in {directory}, building in process")
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest.get('version') != ARTIFACT_VERSION:
+            logger.warning(f"Index artifacts in {directory} have an unsupported version, building in process")
+            return None
+        if manifest.get('vectorizer') != vectorizer_fingerprint(vectorizer):
+            logger.warning("Index artifacts were built with different TF-IDF parameters, building in process")
+            return None
+        if manifest.get('source_sha256') != file_sha256(source_path):
+            logger.warning(f"{source_path} changed since the index artifacts were built, building in process")
+            return None
+        if manifest.get('sections_sha256') != file_sha256(sections_path):
+            logger.warning(f"{sections_path} does not match the index artifacts, building in process")
+            return None
+
+        with open(sections_path, 'r', encoding='utf-8') as f:
+            sections = [SectionRecord.from_dict(section) for section in json.load(f)['sections']]
+        terms = np.load(os.path.join(directory, 'tfidf_vocabulary.npy'))
+        idf = np.load(os.path.join(directory, 'tfidf_idf.npy'), mmap_mode='r')
+        data, indices, indptr = (np.load(os.path.join(directory, f'tfidf_{name}.npy'), mmap_mode='r')
+                                 for name in CSR_ARRAYS)
+        matrix = csr_matrix((data, indices, indptr), shape=tuple(manifest['shape']), copy=False)
+        if matrix.shape[0] != len(sections):
+            logger.warning("Index artifacts do not match the expanded sections, building in process")
+            return None
+
+        vectorizer.vocabulary_ = {str(term): column for column, term in enumerate(terms)}
+        vectorizer.idf_ = np.asarray(idf)
+    except Exception as e:
+        logger.warning(f"Failed to load index artifacts from {directory}, building in process: {e}")
+        return None
+
+    logger.info(f"Loaded index artifacts for {len(sections)} sections from {directory}")
+    return sections, matrix
+
+
+def build_index_artifacts(directory: str = ARTIFACTS_DIR):
+    """Build the enhanced engine from data/ipc_sections.json and save its artifacts"""
+    from improve_accuracy import AccuracyImprover
+
+    improver = AccuracyImprover(artifacts_dir=None)
+    if improver.tfidf_matrix is None:
+        raise RuntimeError("TF-IDF fitting failed, no artifacts written")
+    save_index_artifacts(improver.expanded_sections, improver.tfidf_vectorizer, improver.tfidf_matrix, directory)
+    return improver
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline retrieval index artifacts")
+    parser.add_argument('--directory', default=ARTIFACTS_DIR)
+    args = parser.parse_args()
+    build_index_artifacts(args.directory)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
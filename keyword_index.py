@@ -0,0 +1,180 @@
+"""
+Typo-tolerant keyword index for the keyword-matching fallbacks.
+
+The fallbacks score every query keyword against every section keyword with
+``SequenceMatcher(...).ratio()``. This index is built once per section list and
+answers the same question without the nested scan: section keywords are
+lowercased and de-duplicated up front, candidates are pruned with an exact
+upper bound on the ratio (the shared character counts), and only the
+survivors are scored with SequenceMatcher. The similarities it returns are
+therefore identical to the ones the original loops computed.
+"""
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class FuzzyKeywordIndex:
+    def __init__(self, keyword_lists: List[List[str]], min_similarity: float = 0.4, memo_size: int = 10000):
+        """Index the keyword list of every section (one list per section, in section order)"""
+        self.min_similarity = min_similarity
+        self.memo_size = memo_size
+        self.keywords: List[str] = []
+        self.postings: List[List[Tuple[int, int]]] = []
+        self._memo: Dict[str, Dict[int, Tuple[Tuple[str, float], ...]]] = {}
+
+        self._keyword_ids: Dict[str, int] = {}
+        for section_idx, section_keywords in enumerate(keyword_lists):
+            self._add_postings(section_idx, section_keywords)
+
+        # Character-count matrix (keywords x alphabet) used for the shared-character bound
+        self._alphabet = {char: column for column, char in enumerate(sorted({char for keyword in self.keywords for char in keyword}))}
+        self._char_counts = np.zeros((len(self.keywords), len(self._alphabet)), dtype=np.int32)
+        for keyword_id, keyword in enumerate(self.keywords):
+            for char, count in Counter(keyword).items():
+                self._char_counts[keyword_id, self._alphabet[char]] = count
+        self._lengths = np.array([len(keyword) for keyword in self.keywords], dtype=np.float64)
+
+    def _add_postings(self, section_idx: int, section_keywords: List[str]):
+        for position, keyword in enumerate(section_keywords):
+            keyword = keyword.lower()
+            keyword_id = self._keyword_ids.get(keyword)
+            if keyword_id is None:
+                keyword_id = self._keyword_ids[keyword] = len(self.keywords)
+                # Postings first, so a reader never sees a keyword without them
+                self.postings.append([])
+                self.keywords.append(keyword)
+            self.postings[keyword_id].append((section_idx, position))
+
+    def add_section(self, section_idx: int, section_keywords: List[str]):
+        """
+        Index the keywords of one more section. Keywords new to the index are
+        scored without the character-count bound until the index is rebuilt,
+        so the cost of an addition depends only on the section's keywords.
+        """
+        self._add_postings(section_idx, section_keywords)
+        # A fresh memo rather than clear(), so a lookup still running on the old postings cannot repopulate it
+        self._memo = {}
+
+    def similar(self, token: str) -> List[Tuple[int, float]]:
+        """Return (keyword id, similarity) for every indexed keyword with similarity > min_similarity"""
+        token = token.lower()
+        if not self.keywords:
+            return []
+
+        threshold = self.min_similarity
+        token_counts = Counter(token)
+        columns = [self._alphabet[char] for char in token_counts if char in self._alphabet]
+        counts = np.array([token_counts[char] for char in token_counts if char in self._alphabet], dtype=np.int32)
+        shared = np.minimum(self._char_counts[:, columns], counts).sum(axis=1) if columns else np.zeros(len(self._lengths))
+
+        # ratio = 2 * matched / total, and matched characters can never exceed
+        # the shared character multiset, so this bound never drops a real match
+        bounds = 2.0 * shared / (len(token) + self._lengths)
+        candidates = np.flatnonzero(bounds > threshold).tolist()
+        # Keywords added after the index was built are not in the count matrix
+        candidates.extend(range(len(self._lengths), len(self.keywords)))
+        matches = []
+        for keyword_id in candidates:
+            similarity = SequenceMatcher(None, token, self.keywords[keyword_id]).ratio()
+            if similarity > threshold:
+                matches.append((int(keyword_id), similarity))
+        return matches
+
+    def section_hits(self, token: str) -> Dict[int, Tuple[Tuple[str, float], ...]]:
+        """Return section index -> ((section keyword, similarity), ...) in section keyword order"""
+        token = token.lower()
+        memo = self._memo
+        cached = memo.get(token)
+        if cached is not None:
+            return cached
+
+        hits = defaultdict(list)
+        for keyword_id, similarity in self.similar(token):
+            keyword = self.keywords[keyword_id]
+            for section_idx, position in self.postings[keyword_id]:
+                hits[section_idx].append((position, keyword, similarity))
+        result = {
+            section_idx: tuple((keyword, similarity) for _, keyword, similarity in sorted(section_hits))
+            for section_idx, section_hits in hits.items()
+        }
+
+        if len(memo) >= self.memo_size:
+            memo.clear()
+        memo[token] = result
+        return result
+
+    def match(self, tokens: List[str]) -> Dict[int, List[Tuple[str, str, float]]]:
+        """
+        Return section index -> [(query keyword, section keyword, similarity), ...]
+        in the same order the nested token/section-keyword loops visit them.
+        """
+        section_matches = defaultdict(list)
+        for token in tokens:
+            for section_idx, hits in self.section_hits(token).items():
+                section_matches[section_idx].extend((token, keyword, similarity) for keyword, similarity in hits)
+        return section_matches
+
+
+def simple_stem(phrase: str) -> str:
+    """Strip common English inflections from every word of a lowercased phrase"""
+    stemmed = []
+    for word in phrase.split():
+        for suffix in ('ing', 'ed', 'es', 's', 'ly'):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        stemmed.append(word)
+    return ' '.join(stemmed)
+
+
+class MatchedKeywordEngine:
+    def __init__(self, keyword_index: FuzzyKeywordIndex, threshold: float):
+        """
+        Explain retrieval hits by the query keywords they match. Exact and stemmed
+        matches are hash lookups against each section's keyword set; only keywords
+        that miss both fall back to the (memoized) fuzzy index. The threshold must
+        not be lower than the index's min_similarity.
+        """
+        self.keyword_index = keyword_index
+        self.threshold = threshold
+
+        section_count = 1 + max((section_idx for postings in keyword_index.postings for section_idx, _ in postings), default=-1)
+        self._section_keywords = [set() for _ in range(section_count)]
+        self._section_stems = [set() for _ in range(section_count)]
+        for keyword, postings in zip(keyword_index.keywords, keyword_index.postings):
+            stem = simple_stem(keyword)
+            for section_idx, _ in postings:
+                self._section_keywords[section_idx].add(keyword)
+                self._section_stems[section_idx].add(stem)
+
+    def add_section(self, section_idx: int, section_keywords: List[str]):
+        """Register a section added to the keyword index after this engine was built"""
+        keywords = {keyword.lower() for keyword in section_keywords}
+        stems = {simple_stem(keyword) for keyword in keywords}
+        while len(self._section_keywords) < section_idx:
+            self._section_stems.append(set())
+            self._section_keywords.append(set())
+        # Stems first: readers check the length of _section_keywords before indexing both
+        self._section_stems.append(stems)
+        self._section_keywords.append(keywords)
+
+    def matched_keywords(self, keywords: List[str], section_idx: int) -> List[str]:
+        """Return the query keywords that match any keyword of the given section"""
+        if section_idx >= len(self._section_keywords):
+            return []
+        section_keywords = self._section_keywords[section_idx]
+        section_stems = self._section_stems[section_idx]
+
+        matched = []
+        for keyword in keywords:
+            lowered = keyword.lower()
+            if lowered in section_keywords or simple_stem(lowered) in section_stems:
+                matched.append(keyword)
+                continue
+            hits = self.keyword_index.section_hits(lowered).get(section_idx, ())
+            if any(similarity > self.threshold for _, similarity in hits):
+                matched.append(keyword)
+        return matched
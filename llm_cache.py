@@ -0,0 +1,206 @@
+"""
+Persistent cache for LLM (Gemini) responses.
+
+Responses are stored in a local SQLite file keyed by model name plus a hash of
+the prompt, so byte-identical prompts are answered from disk across process
+restarts and redeploys. Entries expire after a TTL, the file is kept under a
+size budget by evicting the least recently used entries, and expired entries
+can optionally be served when the live call fails.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    def __init__(self, path: str = 'cache/llm_responses.sqlite3', max_bytes: int = 50 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, serve_stale_on_error: bool = True, enabled: bool = True):
+        """Open (or create) the cache database at path"""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.serve_stale_on_error = serve_stale_on_error
+        self.enabled = enabled
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.errors = 0
+
+        if self.enabled:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with self._connection() as connection:
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS responses ("
+                        "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, "
+                        "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                    )
+                    connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+                    # Running total of the response sizes, so a write never re-sums the table
+                    connection.execute(
+                        "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                    )
+                    connection.execute(
+                        "INSERT OR IGNORE INTO cache_meta (name, value) "
+                        "SELECT 'total_size', COALESCE(SUM(size), 0) FROM responses"
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"LLM response cache disabled, could not open {self.path}: {e}")
+                self.enabled = False
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets several worker processes share the file
+        # (connections are never reused across fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def _count(self, counter: str):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _lookup(self, key: str):
+        row = self._connection().execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, False
+        response, created_at = row
+        return response, time.time() - created_at > self.ttl_seconds
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        """Return a fresh cached response, or None"""
+        if not self.enabled:
+            return None
+        try:
+            key = self.make_key(model, prompt)
+            response, expired = self._lookup(key)
+            if response is None or expired:
+                self._count('misses')
+                return None
+            with self._connection() as connection:
+                connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._count('hits')
+            return response
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache read failed: {e}")
+            return None
+
+    def put(self, model: str, prompt: str, response: str):
+        """Store a response and evict least recently used entries beyond max_bytes"""
+        if not self.enabled or not response:
+            return
+        now = time.time()
+        key = self.make_key(model, prompt)
+        size = len(response.encode('utf-8'))
+        try:
+            with self._connection() as connection:
+                # First statement of the transaction, so the total and the replaced entry's size
+                # are read under the write lock that the insert below also holds
+                connection.execute(
+                    "UPDATE cache_meta SET value = value + ? - COALESCE((SELECT size FROM responses WHERE key = ?), 0) "
+                    "WHERE name = 'total_size'",
+                    (size, key)
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, response, size, now, now)
+                )
+                total_size = connection.execute(
+                    "SELECT value FROM cache_meta WHERE name = 'total_size'"
+                ).fetchone()[0]
+                if total_size > self.max_bytes:
+                    self._evict(connection, total_size - self.max_bytes)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM response cache write failed: {e}")
+
+    def _evict(self, connection: sqlite3.Connection, bytes_to_free: int):
+        freed = 0
+        keys = []
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append((key,))
+            freed += size
+            if freed >= bytes_to_free:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+        connection.execute("UPDATE cache_meta SET value = value - ? WHERE name = 'total_size'", (freed,))
+
+    def get_or_generate(self, model: str, prompt: str, generate: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Return the cached response for (model, prompt) or call generate() and cache
+        its result. If generate() raises and an expired entry exists, that entry is
+        returned when serve_stale_on_error is set; otherwise the error propagates.
+        """
+        cached = self.get(model, prompt)
+        if cached is not None:
+            return cached
+
+        try:
+            response = generate()
+        except Exception as e:
+            self._count('errors')
+            if self.enabled and self.serve_stale_on_error:
+                try:
+                    stale, _ = self._lookup(self.make_key(model, prompt))
+                except sqlite3.Error:
+                    stale = None
+                if stale is not None:
+                    logger.warning(f"LLM call failed ({e}), serving stale cached response")
+                    self._count('stale_hits')
+                    return stale
+            raise
+
+        self.put(model, prompt, response)
+        return response
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for /api/status"""
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "errors": self.errors
+            }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache configured from the environment"""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache(
+                    path=os.getenv('LLM_CACHE_PATH', 'cache/llm_responses.sqlite3'),
+                    max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', '50')) * 1024 * 1024),
+                    ttl_seconds=float(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600))),
+                    serve_stale_on_error=os.getenv('LLM_CACHE_SERVE_STALE', 'true').lower() == 'true',
+                    enabled=os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+                )
+    return _llm_cache
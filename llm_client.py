@@ -0,0 +1,243 @@
+"""
+Process-wide Gemini client.
+
+The Gemini SDK is only imported when LLM enhancement is enabled and an API
+key is configured, so deployments without a key never pay for the import.
+
+GEMINI_API_ENDPOINT points the client at another Gemini-compatible REST
+endpoint, such as the local stand-in in fake_gemini_server.py used for load
+testing (GEMINI_API_ENDPOINT=http://127.0.0.1:8089).
+
+Callers only rely on generate_content(prompt, stream=False) returning an object
+with .text (or, when streaming, an iterable of them), so LLM_CLIENT_MODE can
+swap in another implementation:
+
+    live    the Gemini SDK model (default)
+    record  the live model, with every prompt, response and its measured
+            latency appended to the cassette at LLM_CASSETTE_PATH
+    replay  answers from the cassette only; no API key, SDK or network is
+            needed, and a prompt that was never recorded raises
+            CassetteMissError. With LLM_REPLAY_LATENCY=true the recorded
+            latency (times LLM_REPLAY_LATENCY_SCALE) is reproduced.
+
+Cassette entries are keyed by model name plus prompt; when a prompt was
+recorded more than once, the latest recording is replayed.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List
+
+from llm_cache import LLMResponseCache
+from metrics import STAGE_SECONDS, Counter
+
+logger = logging.getLogger(__name__)
+
+LLM_CLIENT_MODE = os.getenv('LLM_CLIENT_MODE', 'live').lower()
+LLM_CLIENT_MODES = ('live', 'record', 'replay')
+LLM_CASSETTE_PATH = os.getenv('LLM_CASSETTE_PATH', 'cache/llm_cassette.jsonl')
+
+GEMINI_CALL_SECONDS = STAGE_SECONDS.labels('gemini_call')
+GEMINI_CALLS = Counter('ipc_gemini_calls_total', 'Gemini calls that reached the client, by outcome', ['outcome'])
+
+_gemini_client = None
+_gemini_initialized = False
+_gemini_lock = threading.Lock()
+
+
+def get_gemini_model_name() -> str:
+    return os.getenv('GEMINI_MODEL', 'gemini-1.5-pro')
+
+
+class CassetteMissError(LookupError):
+    """The replayed prompt was never recorded"""
+
+
+class CassetteResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Cassette:
+    def __init__(self, path: str = LLM_CASSETTE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, dict]:
+        """Latest recording per key; an incomplete last line (interrupted write) is skipped"""
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    entries[entry['key']] = entry
+        except FileNotFoundError:
+            logger.warning(f"LLM cassette {self.path} does not exist")
+        return entries
+
+    def append(self, model: str, prompt: str, chunks: List[str], chunk_offsets_ms: List[float], stream: bool):
+        entry = {
+            "key": LLMResponseCache.make_key(model, prompt),
+            "model": model,
+            "prompt": prompt,
+            "text": "".join(chunks),
+            "stream": stream,
+            "chunks": chunks,
+            "chunk_offsets_ms": [round(offset, 2) for offset in chunk_offsets_ms],
+            "latency_ms": round(chunk_offsets_ms[-1], 2) if chunk_offsets_ms else 0.0,
+            "recorded_at": time.time()
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # One O_APPEND write per entry, so several worker processes can record into the same file
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+
+class RecordingClient:
+    def __init__(self, client, model: str, cassette: Cassette):
+        self.client = client
+        self.model = model
+        self.cassette = cassette
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        started = time.perf_counter()
+        if stream:
+            return self._record_stream(prompt, self.client.generate_content(prompt, stream=True), started)
+        response = self.client.generate_content(prompt)
+        text = response.text
+        self.cassette.append(self.model, prompt, [text], [(time.perf_counter() - started) * 1000], stream=False)
+        return response
+
+    def _record_stream(self, prompt: str, response, started: float) -> Iterator:
+        chunks = []
+        offsets = []
+        for chunk in response:
+            chunks.append(chunk.text)
+            offsets.append((time.perf_counter() - started) * 1000)
+            yield chunk
+        # Only streams that were read to the end are recorded
+        self.cassette.append(self.model, prompt, chunks, offsets, stream=True)
+
+
+class ReplayClient:
+    def __init__(self, model: str, cassette: Cassette, reproduce_latency: bool = False, latency_scale: float = 1.0):
+        self.model = model
+        self.entries = cassette.load()
+        self.reproduce_latency = reproduce_latency
+        self.latency_scale = latency_scale
+        logger.info(f"Replaying {len(self.entries)} recorded LLM responses from {cassette.path}")
+
+    def _entry(self, prompt: str) -> dict:
+        entry = self.entries.get(LLMResponseCache.make_key(self.model, prompt))
+        if entry is None:
+            raise CassetteMissError(f"No recorded {self.model} response for prompt: {prompt[:80]!r}")
+        return entry
+
+    def _wait_until(self, started: float, offset_ms: float):
+        if self.reproduce_latency:
+            remaining = started + offset_ms * self.latency_scale / 1000 - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        started = time.perf_counter()
+        entry = self._entry(prompt)
+        if stream:
+            return self._replay_stream(entry, started)
+        self._wait_until(started, entry['latency_ms'])
+        return CassetteResponse(entry['text'])
+
+    def _replay_stream(self, entry: dict, started: float) -> Iterator[CassetteResponse]:
+        for chunk, offset in zip(entry['chunks'], entry['chunk_offsets_ms']):
+            self._wait_until(started, offset)
+            yield CassetteResponse(chunk)
+
+
+class InstrumentedClient:
+    """Times every call of the wrapped client and counts its successes and errors"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        started = time.perf_counter()
+        try:
+            response = self.client.generate_content(prompt, stream=True) if stream else self.client.generate_content(prompt)
+        except Exception:
+            GEMINI_CALLS.labels('error').inc()
+            raise
+        if stream:
+            return self._observe_stream(response, started)
+        GEMINI_CALL_SECONDS.observe(time.perf_counter() - started)
+        GEMINI_CALLS.labels('success').inc()
+        return response
+
+    def _observe_stream(self, response, started: float) -> Iterator:
+        try:
+            yield from response
+        except Exception:
+            GEMINI_CALLS.labels('error').inc()
+            raise
+        GEMINI_CALL_SECONDS.observe(time.perf_counter() - started)
+        GEMINI_CALLS.labels('success').inc()
+
+
+def get_llm_client_mode() -> str:
+    if LLM_CLIENT_MODE not in LLM_CLIENT_MODES:
+        logger.warning(f"Unknown LLM_CLIENT_MODE '{LLM_CLIENT_MODE}', using live")
+        return 'live'
+    return LLM_CLIENT_MODE
+
+
+def get_gemini_client():
+    """Return the shared LLM client, or None when LLM enhancement is off or (outside replay) no key is set"""
+    global _gemini_client, _gemini_initialized
+    if _gemini_initialized:
+        return _gemini_client
+    with _gemini_lock:
+        if _gemini_initialized:
+            return _gemini_client
+        use_llm = os.getenv('USE_LLM_ENHANCEMENT', 'true').lower() == 'true'
+        api_key = os.getenv('GEMINI_API_KEY')
+        mode = get_llm_client_mode()
+        if use_llm and mode == 'replay':
+            _gemini_client = ReplayClient(
+                get_gemini_model_name(),
+                Cassette(),
+                reproduce_latency=os.getenv('LLM_REPLAY_LATENCY', 'false').lower() == 'true',
+                latency_scale=float(os.getenv('LLM_REPLAY_LATENCY_SCALE', '1.0'))
+            )
+        elif use_llm and api_key:
+            try:
+                import google.generativeai as genai
+                endpoint = os.getenv('GEMINI_API_ENDPOINT')
+                if endpoint:
+                    genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': endpoint})
+                    logger.info(f"Using Gemini endpoint {endpoint}")
+                else:
+                    genai.configure(api_key=api_key)
+                _gemini_client = genai.GenerativeModel(get_gemini_model_name())
+                if mode == 'record':
+                    _gemini_client = RecordingClient(_gemini_client, get_gemini_model_name(), Cassette())
+                    logger.info(f"Recording Gemini responses to {LLM_CASSETTE_PATH}")
+                logger.info("Gemini client initialized successfully")
+            except Exception as e:
+                logger.warning(f"Failed to initialize Gemini client: {e}")
+        else:
+            logger.warning("No Gemini API key configured")
+        if _gemini_client is not None:
+            _gemini_client = InstrumentedClient(_gemini_client)
+        _gemini_initialized = True
+    return _gemini_client
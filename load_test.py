@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the API, run offline against fake_gemini_server.py.
+
+For every combination of --workers and --threads it starts gunicorn
+(gunicorn.conf.py) with the app pointed at a local fake Gemini server, waits
+for /api/ready, then keeps --concurrency clients sending a weighted mix of
+/api/analyze, /api/search, /api/suggestions and /api/gemini-summary requests
+for --duration seconds. It reports requests per second, a latency histogram,
+percentiles and error rates overall and per endpoint, and writes them as JSON.
+
+    python load_test.py --workers 1 2 4 --threads 1 4 8 --concurrency 32 --duration 30
+    python load_test.py --gemini-latency-ms 1500 --gemini-error-rate 0.1 --mix analyze=1,gemini-summary=1
+    python load_test.py --url http://localhost:5001 --concurrency 8    # an already running server
+
+Conversation logs and the LLM response cache are turned off in the servers it
+starts, so every summary request reaches the fake Gemini server; pass
+--env LLM_CACHE_ENABLED=true (or any other app setting) to change that.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+DEFAULT_MIX = 'analyze=4,search=3,suggestions=2,gemini-summary=1'
+# Upper edges of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERIES = [
+    "Someone stole my phone", "A person hit me with a stick during an argument",
+    "Someone threatened me with a knife and demanded money", "My business partner embezzled company funds",
+    "My neighbour broke into my house at night", "A man was killed in a fight outside the bar",
+    "Someone is blackmailing me with private photos", "My husband beats me and demands dowry",
+    "A shopkeeper sold me fake medicine", "Someone forged my signature on a cheque",
+    "A group of people attacked my shop", "My daughter was kidnapped on her way to school",
+    "The landlord cheated me out of the deposit", "A driver ran over a pedestrian and fled",
+    "Someone hacked my bank account and transferred money", "An officer demanded a bribe",
+    "My colleague harassed me at work", "A stranger followed me home every day",
+    "Somebody set fire to my car", "They spread false rumours about me in the village"
+]
+
+
+def open_connection(base_url: str, timeout: float) -> http.client.HTTPConnection:
+    """A keep-alive connection for one client, reopened by http.client after the server closes it"""
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.netloc, timeout=timeout)
+
+
+def endpoint_request(connection: http.client.HTTPConnection, base_url: str, endpoint: str, query: str) -> int:
+    """Send one request and return its status code"""
+    prefix = urlsplit(base_url).path.rstrip('/')
+    if endpoint == 'search':
+        connection.request('GET', f"{prefix}/api/search?{urlencode({'q': query})}")
+    else:
+        connection.request('POST', f"{prefix}/api/{endpoint}", body=json.dumps({"description": query}),
+                           headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    weights = []
+    for part in mix.split(','):
+        endpoint, _, weight = part.partition('=')
+        if endpoint.strip() not in ('analyze', 'search', 'suggestions', 'gemini-summary'):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {endpoint}")
+        weights.append((endpoint.strip(), float(weight or 1)))
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float, process: subprocess.Popen = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} was ready")
+        try:
+            # urlopen raises HTTPError for the 503 sent before the app is ready
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s")
+
+
+def stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def start_app(port: int, workers: int, threads: int, gemini_url: str, extra_env: Dict[str, str],
+              verbose: bool = False) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'GUNICORN_ACCESS_LOG': os.devnull,
+        'LOG_LEVEL': 'warning',
+        'USE_LLM_ENHANCEMENT': 'true',
+        'GEMINI_API_KEY': 'load-test',
+        'GEMINI_API_ENDPOINT': gemini_url,
+        'ENABLE_CONVERSATION_LOGS': 'false',
+        'LLM_CACHE_ENABLED': 'false'
+    })
+    env.update(extra_env)
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                            env=env, stdout=output, stderr=output)
+
+
+def run_clients(base_url: str, mix: List[Tuple[str, float]], concurrency: int, duration: float,
+                warmup: float, timeout: float, seed: int = 0) -> List[Tuple[str, float, str]]:
+    """Closed-loop clients; returns (endpoint, latency ms, outcome) for requests started after the warm-up"""
+    endpoints = [endpoint for endpoint, _ in mix]
+    weights = [weight for _, weight in mix]
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    results = []
+    results_lock = threading.Lock()
+
+    def client(client_id: int):
+        rng = random.Random(seed * 1000 + client_id)
+        connection = open_connection(base_url, timeout)
+        samples = []
+        while True:
+            sent = time.monotonic()
+            if sent >= deadline:
+                break
+            endpoint = rng.choices(endpoints, weights)[0]
+            try:
+                outcome = str(endpoint_request(connection, base_url, endpoint, rng.choice(QUERIES)))
+            except socket.timeout:
+                outcome = 'timeout'
+                connection.close()
+            except (OSError, http.client.HTTPException):
+                outcome = 'connection_error'
+                connection.close()
+            if sent >= measure_from:
+                samples.append((endpoint, (time.monotonic() - sent) * 1000, outcome))
+        connection.close()
+        with results_lock:
+            results.extend(samples)
+
+    clients = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return results
+
+
+def summarize(samples: List[Tuple[str, float, str]], duration: float) -> Dict:
+    if not samples:
+        return {"requests": 0, "rps": 0.0, "error_rate": 0.0}
+    latencies = np.array([latency for _, latency, _ in samples])
+    outcomes = {}
+    for _, _, outcome in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    errors = sum(count for outcome, count in outcomes.items() if not outcome.startswith('2'))
+    counts = np.bincount(np.searchsorted(HISTOGRAM_BUCKETS_MS, latencies), minlength=len(HISTOGRAM_BUCKETS_MS) + 1)
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / duration, 2),
+        "error_rate": round(errors / len(samples), 4),
+        "outcomes": outcomes,
+        "mean_ms": round(float(latencies.mean()), 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_ms": round(float(latencies.max()), 2),
+        # Requests with latency <= each bucket edge (and above the previous one); "inf" is the rest
+        "histogram_ms": {
+            str(edge): int(count) for edge, count in zip(list(HISTOGRAM_BUCKETS_MS) + ['inf'], counts)
+        }
+    }
+
+
+def print_histogram(histogram: Dict[str, int], width: int = 40):
+    total = max(histogram.values()) or 1
+    previous = '0'
+    for edge, count in histogram.items():
+        label = f"{previous}-{edge} ms" if edge != 'inf' else f">{previous} ms"
+        print(f"    {label:>14} {'#' * round(count / total * width):<{width}} {count}")
+        previous = edge
+
+
+def gemini_stats(gemini_url: str) -> Dict:
+    try:
+        with urllib.request.urlopen(f"{gemini_url}/stats", timeout=2) as response:
+            return json.load(response)
+    except (OSError, http.client.HTTPException, ValueError):
+        return {}
+
+
+def run_config(args, base_url: str, gemini_url: str, workers: int = None, threads: int = None) -> Dict:
+    gemini_before = gemini_stats(gemini_url) if gemini_url else {}
+    samples = run_clients(base_url, args.mix, args.concurrency, args.duration, args.warmup, args.timeout, args.seed)
+    gemini_after = gemini_stats(gemini_url) if gemini_url else {}
+
+    by_endpoint = {}
+    for endpoint, _ in args.mix:
+        by_endpoint[endpoint] = summarize([sample for sample in samples if sample[0] == endpoint], args.duration)
+    result = {
+        "workers": workers,
+        "threads": threads,
+        "overall": summarize(samples, args.duration),
+        "endpoints": by_endpoint
+    }
+    if gemini_after:
+        result["gemini"] = {
+            "requests": gemini_after["requests"] - gemini_before.get("requests", 0),
+            "errors": gemini_after["errors"] - gemini_before.get("errors", 0),
+            "max_in_flight": gemini_after["max_in_flight"]
+        }
+    return result
+
+
+def print_config(result: Dict):
+    label = f"{result['workers']} workers x {result['threads']} threads" if result['workers'] else "external server"
+    overall = result["overall"]
+    print(f"\n== {label}: {overall['requests']} requests, {overall['rps']} req/s, "
+          f"{overall['error_rate'] * 100:.1f}% errors ==")
+    print(f"  {'endpoint':<15} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, summary in list(result["endpoints"].items()) + [("all", overall)]:
+        if not summary["requests"]:
+            continue
+        print(f"  {endpoint:<15} {summary['requests']:>8} {summary['rps']:>8.1f} {summary['error_rate'] * 100:>6.1f}% "
+              f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f}")
+    if overall["requests"]:
+        print("  latency histogram:")
+        print_histogram(overall["histogram_ms"])
+    if "gemini" in result:
+        print(f"  fake Gemini: {result['gemini']['requests']} calls, {result['gemini']['errors']} injected errors, "
+              f"max {result['gemini']['max_in_flight']} in flight")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of the API against a local fake Gemini server")
+    parser.add_argument('--url', help="test an already running server instead of starting gunicorn")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent clients")
+    parser.add_argument('--duration', type=float, default=20.0, help="measured seconds per configuration")
+    parser.add_argument('--warmup', type=float, default=3.0, help="unmeasured seconds before each measurement")
+    parser.add_argument('--timeout', type=float, default=30.0, help="client timeout per request")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument('--gemini-latency-ms', type=float, default=800.0)
+    parser.add_argument('--gemini-jitter-ms', type=float, default=200.0)
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0)
+    parser.add_argument('--gemini-error-status', type=int, default=500)
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help="extra environment for the started servers (repeatable)")
+    parser.add_argument('--verbose', action='store_true', help="show the started servers' logs")
+    parser.add_argument('--ready-timeout', type=float, default=180.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load_test_results.json')
+    args = parser.parse_args()
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": dict(args.mix),
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "gemini_jitter_ms": args.gemini_jitter_ms,
+            "gemini_error_rate": args.gemini_error_rate,
+            "env": args.env
+        },
+        "runs": []
+    }
+
+    if args.url:
+        result = run_config(args, args.url.rstrip('/'), None)
+        print_config(result)
+        results["runs"].append(result)
+    else:
+        gemini_port = free_port()
+        gemini_url = f"http://127.0.0.1:{gemini_port}"
+        gemini = subprocess.Popen([
+            sys.executable, 'fake_gemini_server.py', '--port', str(gemini_port),
+            '--latency-ms', str(args.gemini_latency_ms), '--jitter-ms', str(args.gemini_jitter_ms),
+            '--error-rate', str(args.gemini_error_rate), '--error-status', str(args.gemini_error_status),
+            '--seed', str(args.seed)
+        ], stderr=subprocess.DEVNULL)
+        extra_env = dict(item.split('=', 1) for item in args.env)
+        try:
+            wait_until_ready(f"{gemini_url}/stats", 10, gemini)
+            for workers in args.workers:
+                for threads in args.threads:
+                    port = free_port()
+                    print(f"Starting gunicorn with {workers} workers x {threads} threads...", file=sys.stderr)
+                    app = start_app(port, workers, threads, gemini_url, extra_env, args.verbose)
+                    try:
+                        wait_until_ready(f"http://127.0.0.1:{port}/api/ready", args.ready_timeout, app)
+                        result = run_config(args, f"http://127.0.0.1:{port}", gemini_url, workers, threads)
+                    finally:
+                        stop(app)
+                    print_config(result)
+                    results["runs"].append(result)
+        finally:
+            stop(gemini)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+SQLite index for conversation logs.
+
+The log writer adds every record it appends to a segment to this index as
+well, so /api/logs can page through history with keyset (cursor)
+pagination and time-range/session filters instead of reading every file.
+Query cost depends on the page size, not on how much history exists.
+
+Only the filtered fields and the record's position (segment, byte offset,
+length) are stored; the record itself is read back from its segment. For
+compressed segments the index also keeps where each gzip block starts, so a
+read only decompresses the block holding the record.
+
+Existing segments and legacy per-request files can be (re)indexed with:
+
+    python log_index.py --rebuild
+"""
+import argparse
+import base64
+import bisect
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from conversation_log import SEGMENT_PREFIX, gzip_member_offsets, iter_segment_entries
+
+logger = logging.getLogger(__name__)
+
+# Records read from the segments per step of an export
+EXPORT_BATCH_SIZE = 500
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return timestamp, int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class ConversationLogIndex:
+    def __init__(self, path: str = 'logs/index.sqlite3', directory: Optional[str] = None):
+        """directory holds the segments the index points into; defaults to the index's own directory"""
+        self.path = path
+        self.directory = directory or os.path.dirname(self.path) or '.'
+        self._local = threading.local()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, session_id TEXT, "
+                "segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS conversations_time ON conversations (timestamp, id)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS conversations_session_time ON conversations (session_id, timestamp, id)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS conversations_segment ON conversations (segment)")
+            # Gzip members of compressed segments, by the uncompressed offset they start at
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS segment_blocks (segment TEXT NOT NULL, offset INTEGER NOT NULL, "
+                "compressed_offset INTEGER NOT NULL, PRIMARY KEY (segment, offset))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets several worker processes share the index
+        # (connections are never reused across fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def add(self, entries: Iterable[Tuple[Dict, int, Optional[int]]], segment: str):
+        """
+        Index (record, offset, length) entries written to the segment file named segment.
+        Offsets and lengths are in uncompressed bytes; a length of None means the whole file.
+        """
+        rows = [
+            (str(record.get('timestamp', '')), record.get('session_id'), segment, offset, length)
+            for record, offset, length in entries
+        ]
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT INTO conversations (timestamp, session_id, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _insert_blocks(self, connection: sqlite3.Connection, segment: str, blocks: List[Tuple[int, int]]):
+        connection.executemany(
+            "INSERT OR REPLACE INTO segment_blocks (segment, offset, compressed_offset) VALUES (?, ?, ?)",
+            [(segment, offset, compressed_offset) for offset, compressed_offset in blocks]
+        )
+
+    def add_blocks(self, segment: str, blocks: List[Tuple[int, int]]):
+        """Record the (uncompressed offset, compressed offset) of every gzip member of a compressed segment"""
+        with self._connection() as connection:
+            self._insert_blocks(connection, segment, blocks)
+
+    def segment_compressed(self, old: str, new: str, blocks: List[Tuple[int, int]]):
+        """Point the records of segment old at its compressed copy new, made of the given gzip blocks"""
+        with self._connection() as connection:
+            connection.execute("UPDATE conversations SET segment = ? WHERE segment = ?", (new, old))
+            self._insert_blocks(connection, new, blocks)
+
+    def _blocks(self, segment: str) -> List[Tuple[int, int]]:
+        blocks = self._connection().execute(
+            "SELECT offset, compressed_offset FROM segment_blocks WHERE segment = ? ORDER BY offset", (segment,)
+        ).fetchall()
+        # Compressed by something else: one member, decompressed from the start
+        return blocks or [(0, 0)]
+
+    def _segment_path(self, segment: str) -> str:
+        path = os.path.join(self.directory, segment)
+        if not os.path.exists(path) and os.path.exists(path + '.gz'):
+            # Compressed between the lookup and this read
+            path += '.gz'
+        return path
+
+    def _read_compressed(self, path: str, positions: List[Tuple[int, int, int]], lines: List[Optional[str]]):
+        blocks = self._blocks(os.path.basename(path))
+        starts = [offset for offset, _ in blocks]
+        with open(path, 'rb') as raw:
+            reader, reader_block = None, None
+            for offset, length, position in positions:
+                block = bisect.bisect_right(starts, offset) - 1
+                if block != reader_block:
+                    # Start decompressing at the record's own block; the reader runs on into
+                    # the following members for a record that crosses a block boundary
+                    raw.seek(blocks[block][1])
+                    reader, reader_block = gzip.GzipFile(fileobj=raw, mode='rb'), block
+                reader.seek(offset - blocks[block][0])
+                lines[position] = reader.read(length).decode('utf-8').rstrip('\n')
+
+    def _read_lines(self, rows: List[Tuple[str, int, Optional[int]]]) -> List[Optional[str]]:
+        """
+        Read the serialized records at (segment, offset, length) rows, in row order.
+        Each segment is opened once and read front to back. Records whose segment
+        is missing come back as None.
+        """
+        lines: List[Optional[str]] = [None] * len(rows)
+        by_segment = defaultdict(list)
+        for position, (segment, offset, length) in enumerate(rows):
+            by_segment[segment].append((offset, length, position))
+        for segment, positions in by_segment.items():
+            path = self._segment_path(segment)
+            try:
+                if path.endswith('.gz'):
+                    self._read_compressed(path, sorted(positions), lines)
+                    continue
+                with open(path, 'rb') as f:
+                    for offset, length, position in sorted(positions):
+                        if length is None:
+                            # Legacy per-request file holding one pretty-printed record
+                            record = json.loads(f.read().decode('utf-8'))
+                            lines[position] = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+                        else:
+                            f.seek(offset)
+                            lines[position] = f.read(length).decode('utf-8').rstrip('\n')
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning(f"Could not read conversation logs from {segment}: {e}")
+        return lines
+
+    def _where(self, since: Optional[str], until: Optional[str], session_id: Optional[str]):
+        clauses, params = [], []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        return clauses, params
+
+    def query(self, limit: int = 50, cursor: Optional[str] = None, since: Optional[str] = None,
+              until: Optional[str] = None, session_id: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Return one page of records, newest first, and the cursor of the next page (None at the end)"""
+        clauses, params = self._where(since, until, session_id)
+        if cursor:
+            timestamp, row_id = decode_cursor(cursor)
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([timestamp, timestamp, row_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connection().execute(
+            f"SELECT id, timestamp, segment, offset, length FROM conversations {where} "
+            f"ORDER BY timestamp DESC, id DESC LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        lines = self._read_lines([row[2:] for row in rows])
+        return [json.loads(line) for line in lines if line is not None], next_cursor
+
+    def export(self, since: Optional[str] = None, until: Optional[str] = None,
+               session_id: Optional[str] = None) -> Iterator[str]:
+        """Yield matching records as NDJSON lines, oldest first, without loading them all"""
+        clauses, params = self._where(since, until, session_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # A dedicated connection so a long export does not hold the request thread's one
+        connection = sqlite3.connect(self.path, timeout=5)
+        try:
+            rows = connection.execute(
+                f"SELECT segment, offset, length FROM conversations {where} ORDER BY timestamp, id", params
+            )
+            while True:
+                batch = rows.fetchmany(EXPORT_BATCH_SIZE)
+                if not batch:
+                    break
+                for line in self._read_lines(batch):
+                    if line is not None:
+                        yield line + '\n'
+        finally:
+            connection.close()
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def rebuild(self):
+        """Re-index every segment and legacy per-request log file in the log directory"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM conversations")
+            connection.execute("DELETE FROM segment_blocks")
+        for filename in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, filename)
+            if filename.startswith(SEGMENT_PREFIX) and (filename.endswith('.jsonl') or filename.endswith('.jsonl.gz')):
+                entries = ((record, offset, length) for offset, length, record in iter_segment_entries(path))
+                if filename.endswith('.gz'):
+                    self.add_blocks(filename, gzip_member_offsets(path))
+            elif filename.endswith('.json'):
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = [(json.load(f), 0, None)]
+            else:
+                continue
+            self.add(entries, filename)
+        logger.info(f"Indexed {self.count()} conversation logs from {self.directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the conversation log index")
+    parser.add_argument('--rebuild', action='store_true', help="re-index all segments and legacy log files")
+    parser.add_argument('--directory', default='logs')
+    args = parser.parse_args()
+
+    index = ConversationLogIndex(os.path.join(args.directory, 'index.sqlite3'))
+    if args.rebuild:
+        index.rebuild()
+    print(f"{index.count()} conversation logs indexed")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
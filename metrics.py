@@ -0,0 +1,403 @@
+"""
+In-process metrics, served in the Prometheus text format on /metrics.
+
+Counters, gauges and histograms are plain Python objects. Recording a value
+is one dict lookup for the labelled child (hot paths can bind it once with
+.labels()), a bisect over the bucket bounds and a few additions under an
+uncontended lock, which costs about a microsecond.
+
+Each gunicorn worker keeps its own values. When METRICS_DIR is set
+(gunicorn.conf.py sets it for every master), each worker also writes a
+snapshot of its values there every METRICS_FLUSH_SECONDS and when it exits.
+/metrics adds the other workers' snapshots to its own live values, so any
+worker can answer for the whole server; the other workers' values may lag by
+up to one flush interval. Counters and histograms of exited workers keep
+counting, while gauges only include live workers.
+
+Stage timings are also summed per request while start_request_timings() is
+active in the current context (the app uses them for the Server-Timing
+header). Stages that run on another thread, such as the Gemini call itself,
+are not included.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+# Seconds; covers sub-millisecond stages up to slow Gemini calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds per stage of the request being handled in this context, or None
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class _CounterChild:
+    __slots__ = ('_lock', 'value')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('_lock', '_bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        # One count per bucket (not cumulative); the last one is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        bucket = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+
+    def time(self) -> '_Timer':
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+
+class _StageChild(_HistogramChild):
+    __slots__ = ('stage',)
+
+    def __init__(self, bounds: Tuple[float, ...], stage: str):
+        super().__init__(bounds)
+        self.stage = stage
+
+    def observe(self, value: float):
+        _HistogramChild.observe(self, value)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.stage] = timings.get(self.stage, 0.0) + value
+
+
+class _Timer:
+    __slots__ = ('_child', '_started')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._exporter_pid = None
+
+    def register(self, metric: '_Metric'):
+        self._metrics.append(metric)
+
+    def register_collector(self, collect: Callable[[], List[Tuple[str, str, str, Sequence[str], List[Tuple[tuple, float]]]]]):
+        """
+        Add a callable read at scrape time, for values kept elsewhere (cache stats).
+        It returns (name, type, help, label names, [(label values, value)]) families.
+        """
+        self._collectors.append(collect)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Every metric family of this process: name -> {type, help, labelnames, samples}"""
+        families = {}
+        for metric in self._metrics:
+            families[metric.name] = {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, 'buckets', ())),
+                "samples": [[list(values), child.snapshot()] for values, child in list(metric._children.items())]
+            }
+        for collect in self._collectors:
+            try:
+                for name, kind, documentation, labelnames, samples in collect():
+                    families[name] = {
+                        "type": kind,
+                        "help": documentation,
+                        "labelnames": list(labelnames),
+                        "buckets": [],
+                        "samples": [[list(values), value] for values, value in samples]
+                    }
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return families
+
+    def collect(self) -> Dict[str, dict]:
+        """This process's families merged with the snapshots other workers left in METRICS_DIR"""
+        families = self.snapshot()
+        for pid, snapshot in read_snapshots(exclude_pid=os.getpid()):
+            alive = pid_alive(pid)
+            for name, family in snapshot.items():
+                if family["type"] == 'gauge' and not alive:
+                    continue
+                merged = families.setdefault(name, dict(family, samples=[]))
+                if merged["type"] != family["type"] or merged["buckets"] != family["buckets"]:
+                    continue
+                merge_samples(merged, family["samples"])
+        return families
+
+    def render(self) -> str:
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family["labelnames"]
+            for values, value in family["samples"]:
+                if family["type"] == 'histogram':
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(family["buckets"] + ['+Inf'], counts):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else format_value(bound)
+                        lines.append(f"{name}_bucket{format_labels(labelnames + ['le'], values + [le])} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labelnames, values)} {format_value(total)}")
+                    lines.append(f"{name}_count{format_labels(labelnames, values)} {cumulative}")
+                else:
+                    lines.append(f"{name}{format_labels(labelnames, values)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Zero every value in place (children bound by callers stay valid)"""
+        for metric in self._metrics:
+            for child in list(metric._children.values()):
+                child.reset()
+
+    def write_snapshot(self):
+        if not METRICS_DIR:
+            return
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {path}: {e}")
+
+    def start_exporter(self):
+        """Write this process's snapshot to METRICS_DIR periodically and at exit (call once per worker)"""
+        if not METRICS_DIR or self._exporter_pid == os.getpid():
+            return
+        self._exporter_pid = os.getpid()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(METRICS_FLUSH_SECONDS)
+                self.write_snapshot()
+
+        threading.Thread(target=run, name='metrics-exporter', daemon=True).start()
+        atexit.register(self.write_snapshot)
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def _new_child(self, values: tuple):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for these label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child(values)
+        return child
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self, values: tuple):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self, values: tuple):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._unlabelled.dec(amount)
+
+    def set(self, value: float):
+        self._unlabelled.set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self, values: tuple):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._unlabelled.observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled.time()
+
+
+class StageHistogram(Histogram):
+    """Histogram labelled by stage whose observations also add up in the current request's timings"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, documentation, ['stage'], buckets, registry)
+
+    def _new_child(self, values: tuple):
+        return _StageChild(self.buckets, values[0])
+
+
+def start_request_timings() -> contextvars.Token:
+    """Start summing stage timings for the request handled in this context"""
+    return _request_timings.set({})
+
+
+def request_timings() -> Dict[str, float]:
+    """Seconds per stage observed so far in this context's request"""
+    return _request_timings.get() or {}
+
+
+def stop_request_timings(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def read_snapshots(exclude_pid: Optional[int] = None) -> List[Tuple[int, Dict[str, dict]]]:
+    snapshots = []
+    if not METRICS_DIR:
+        return snapshots
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return snapshots
+    for name in names:
+        if not name.endswith('.json') or not name[:-5].isdigit() or int(name[:-5]) == exclude_pid:
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), 'r', encoding='utf-8') as f:
+                snapshots.append((int(name[:-5]), json.load(f)))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_samples(family: dict, samples: List[list]):
+    """Add samples into a family's samples, matching on label values"""
+    by_labels = {tuple(values): i for i, (values, _) in enumerate(family["samples"])}
+    for values, value in samples:
+        i = by_labels.get(tuple(values))
+        if i is None:
+            by_labels[tuple(values)] = len(family["samples"])
+            family["samples"].append([values, value])
+        elif family["type"] == 'histogram':
+            counts, total = family["samples"][i][1]
+            family["samples"][i][1] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+        else:
+            family["samples"][i][1] += value
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+# Shared by the engines and the app: one histogram child per request pipeline stage
+STAGE_SECONDS = StageHistogram('ipc_stage_duration_seconds', 'Time spent in each request pipeline stage')
@@ -1,16 +1,23 @@
 import os
 import json
 import numpy as np
-import pandas as pd
 from typing import List, Dict, Tuple, Optional
-# from sentence_transformers import SentenceTransformer  # Temporarily disabled due to NumPy compatibility
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
-import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 import re
-from difflib import SequenceMatcher
+import threading
+import time
+
+from bm25_index import RETRIEVAL_BACKEND, BM25Index
+from dense_index import encode_sections, load_dense_encoder
+from keyword_index import FuzzyKeywordIndex, MatchedKeywordEngine
+from llm_cache import get_llm_cache
+from metrics import STAGE_SECONDS
+from llm_client import get_gemini_client, get_gemini_model_name
+from ranking import top_k_indices
+from section_store import SectionHit, get_section_store
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +26,11 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+KEYWORD_EXTRACTION_SECONDS = STAGE_SECONDS.labels('keyword_extraction')
+SEMANTIC_SEARCH_SECONDS = STAGE_SECONDS.labels('semantic_search')
+TFIDF_SEARCH_SECONDS = STAGE_SECONDS.labels('tfidf_search')
+FALLBACK_MATCHING_SECONDS = STAGE_SECONDS.labels('fallback_matching')
+
 class MLEnhancer:
     def __init__(self):
         """Initialize ML models and configurations"""
@@ -26,30 +38,21 @@ class MLEnhancer:
         self.use_semantic_search = os.getenv('USE_SEMANTIC_SEARCH', 'true').lower() == 'true'
         self.similarity_threshold = float(os.getenv('SIMILARITY_THRESHOLD', '0.3'))
         
-        # Initialize Gemini client
-        self.gemini_client = None
-        
-        if self.use_llm and os.getenv('GEMINI_API_KEY'):
-            try:
-                genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-                self.gemini_client = genai.GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-1.5-pro'))
-                logger.info("Gemini client initialized successfully")
-            except Exception as e:
-                logger.warning(f"Failed to initialize Gemini client: {e}")
-                self.use_llm = False
-        else:
-            logger.warning("No Gemini API key configured")
+        # Initialize Gemini client (shared with the app, None without an API key)
+        self.gemini_client = get_gemini_client() if self.use_llm else None
+        self.gemini_model_name = get_gemini_model_name()
+        self.llm_cache = get_llm_cache()
+        if self.gemini_client is None:
             self.use_llm = False
         
-        # Initialize sentence transformer model (temporarily disabled)
+        # Initialize the local dense encoder (LSA, or a sentence-transformers model on disk)
         self.sentence_model = None
-        # if self.use_semantic_search:
-        #     try:
-        #         self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-        #         logger.info("Sentence transformer model loaded successfully")
-        #     except Exception as e:
-        #         logger.warning(f"Failed to load sentence transformer: {e}")
-        #         self.use_semantic_search = False
+        if self.use_semantic_search:
+            try:
+                self.sentence_model = load_dense_encoder()
+            except Exception as e:
+                logger.warning(f"Failed to load dense encoder: {e}")
+                self.use_semantic_search = False
         
         # Initialize TF-IDF vectorizer as fallback
         self.tfidf_vectorizer = TfidfVectorizer(
@@ -60,38 +63,54 @@ class MLEnhancer:
         
         # Load IPC sections
         self.ipc_sections = self.load_ipc_sections()
+        self.keyword_index = FuzzyKeywordIndex(
+            [section['keywords'] for section in self.ipc_sections],
+            min_similarity=0.5
+        )
+        self.matched_keyword_engine = MatchedKeywordEngine(self.keyword_index, threshold=0.7)
         self.section_embeddings = None
         self.tfidf_matrix = None
         
         # Pre-compute embeddings if semantic search is enabled
         if self.use_semantic_search and self.sentence_model:
             self.precompute_embeddings()
+        
+        # Inverted-index BM25 in place of the TF-IDF matrix scan (RETRIEVAL_BACKEND=bm25 or maxscore)
+        self.bm25_index = None
+        if RETRIEVAL_BACKEND in ('bm25', 'maxscore'):
+            self.bm25_index = BM25Index(
+                [self.section_text(section) for section in self.ipc_sections],
+                self.tfidf_vectorizer.build_analyzer()
+            )
     
     def load_ipc_sections(self) -> List[Dict]:
-        """Load IPC sections from JSON file"""
-        try:
-            with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('sections', [])
-        except Exception as e:
-            logger.error(f"Failed to load IPC sections: {e}")
-            return []
+        """IPC sections from the shared read-only section store"""
+        return get_section_store().sections
     
     def precompute_embeddings(self):
         """Pre-compute embeddings for all IPC sections"""
         try:
             # Create combined text for each section
-            section_texts = []
-            for section in self.ipc_sections:
-                text = f"{section['title']} {section['description']} {' '.join(section['keywords'])}"
-                section_texts.append(text)
+            section_texts = [self.section_text(section) for section in self.ipc_sections]
             
-            # Compute TF-IDF matrix (sentence embeddings temporarily disabled)
+            # Compute TF-IDF matrix
             self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(section_texts)
             
             logger.info(f"Pre-computed TF-IDF embeddings for {len(self.ipc_sections)} sections")
         except Exception as e:
             logger.error(f"Failed to precompute embeddings: {e}")
+        
+        try:
+            # Dense section vectors (float32, unit length) for semantic search
+            self.section_embeddings = encode_sections(self.sentence_model, section_texts)
+            logger.info(f"Pre-computed {self.section_embeddings.shape[1]}-dimensional "
+                        f"{self.sentence_model.name} embeddings for {len(self.ipc_sections)} sections")
+        except Exception as e:
+            logger.error(f"Failed to precompute dense embeddings: {e}")
+            self.section_embeddings = None
+    
+    def section_text(self, section: Dict) -> str:
+        return f"{section['title']} {section['description']} {' '.join(section['keywords'])}"
     
     def extract_keywords_advanced(self, text: str) -> List[str]:
         """Advanced keyword extraction using multiple techniques"""
@@ -120,27 +139,56 @@ class MLEnhancer:
         return keywords + bigrams
     
     def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
-        """Perform semantic search using sentence transformers (temporarily disabled)"""
-        # Temporarily disabled due to NumPy compatibility issues
-        return []
+        """Perform semantic search against the precomputed dense section vectors"""
+        return self.semantic_search_batch([query], top_k)[0]
+    
+    def semantic_search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """Dense search for many queries: one encode, one float32 matrix product and per-row top-k"""
+        if self.section_embeddings is None:
+            return [[] for _ in queries]
+        with SEMANTIC_SEARCH_SECONDS.time():
+            return self._semantic_search_batch(queries, top_k)
+    
+    def _semantic_search_batch(self, queries: List[str], top_k: int) -> List[List[Tuple[int, float]]]:
+        try:
+            query_vectors = self.sentence_model.encode(queries)
+            # Unit vectors, so the dot product is the cosine similarity
+            similarities = query_vectors @ self.section_embeddings.T
+            return [
+                [(idx, float(row[idx])) for idx in top_k_indices(row, top_k) if row[idx] > self.similarity_threshold]
+                for row in similarities
+            ]
+        except Exception as e:
+            logger.error(f"Semantic search failed: {e}")
+            return [[] for _ in queries]
     
     def tfidf_search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """Perform TF-IDF based search as fallback"""
+        return self.tfidf_search_batch([query], top_k)[0]
+    
+    def tfidf_search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """TF-IDF search for many queries with one transform, one sparse product and per-row top-k"""
+        with TFIDF_SEARCH_SECONDS.time():
+            return self._tfidf_search_batch(queries, top_k)
+    
+    def _tfidf_search_batch(self, queries: List[str], top_k: int) -> List[List[Tuple[int, float]]]:
+        if self.bm25_index is not None:
+            return self.bm25_index.search_batch(queries, top_k, self.similarity_threshold, prune=RETRIEVAL_BACKEND == 'maxscore')
         try:
-            # Transform query
-            query_vector = self.tfidf_vectorizer.transform([query])
-            
-            # Calculate similarities
-            similarities = cosine_similarity(query_vector, self.tfidf_matrix)[0]
+            # Transform all queries at once
+            query_vectors = self.tfidf_vectorizer.transform(queries)
             
-            # Get top-k results
-            top_indices = np.argsort(similarities)[::-1][:top_k]
+            # Calculate similarities (queries x sections)
+            similarities = cosine_similarity(query_vectors, self.tfidf_matrix)
             
-            results = [(idx, similarities[idx]) for idx in top_indices if similarities[idx] > self.similarity_threshold]
-            return results
+            # Get top-k results per query
+            return [
+                [(idx, row[idx]) for idx in top_k_indices(row, top_k) if row[idx] > self.similarity_threshold]
+                for row in similarities
+            ]
         except Exception as e:
             logger.error(f"TF-IDF search failed: {e}")
-            return []
+            return [[] for _ in queries]
     
     def llm_enhance_analysis(self, query: str, relevant_sections: List[Dict]) -> Dict:
         """Use Gemini to enhance the analysis and provide suggestions"""
@@ -182,11 +230,13 @@ Format your response as JSON with the following structure:
 Keep the response concise but comprehensive.
 """
             
-            # Use Gemini for analysis
-            response = self.gemini_client.generate_content(
-                f"You are a legal expert specializing in Indian Penal Code analysis.\n\n{prompt}"
+            # Use Gemini for analysis (answered from the persistent cache when possible)
+            full_prompt = f"You are a legal expert specializing in Indian Penal Code analysis.\n\n{prompt}"
+            content = self.llm_cache.get_or_generate(
+                self.gemini_model_name,
+                full_prompt,
+                lambda: self.gemini_client.generate_content(full_prompt).text
             )
-            content = response.text
             
             # Parse JSON response
             try:
@@ -202,58 +252,76 @@ Keep the response concise but comprehensive.
     
     def find_relevant_sections_enhanced(self, user_input: str) -> List[Dict]:
         """Enhanced section finding using multiple ML techniques"""
+        semantic_results = self.semantic_search(user_input) if self.use_semantic_search else []
+        tfidf_results = []
+        if not semantic_results and self.retrieval_ready():
+            tfidf_results = self.tfidf_search(user_input)
+        return self.rank_sections(user_input, semantic_results, tfidf_results)
+    
+    def find_relevant_sections_batch(self, queries: List[str]) -> List[List[Dict]]:
+        """find_relevant_sections_enhanced for many queries, scoring TF-IDF for all of them at once"""
+        semantic_results = self.semantic_search_batch(queries) if self.use_semantic_search else [[] for _ in queries]
+        tfidf_results = [[] for _ in queries]
+        pending = [i for i, results in enumerate(semantic_results) if not results]
+        if pending and self.retrieval_ready():
+            batch_results = self.tfidf_search_batch([queries[i] for i in pending])
+            for i, results in zip(pending, batch_results):
+                tfidf_results[i] = results
+        return [
+            self.rank_sections(query, semantic, tfidf)
+            for query, semantic, tfidf in zip(queries, semantic_results, tfidf_results)
+        ]
+    
+    def retrieval_ready(self) -> bool:
+        return self.bm25_index is not None or self.tfidf_matrix is not None
+    
+    def rank_sections(self, user_input: str, semantic_results: List[Tuple[int, float]],
+                      tfidf_results: List[Tuple[int, float]]) -> List[Dict]:
+        """Turn semantic or TF-IDF hits of one query into results, falling back to keyword matching"""
         results = []
         
         # Extract keywords
-        keywords = self.extract_keywords_advanced(user_input)
+        with KEYWORD_EXTRACTION_SECONDS.time():
+            keywords = self.extract_keywords_advanced(user_input)
         
         # Method 1: Semantic Search
-        if self.use_semantic_search:
-            semantic_results = self.semantic_search(user_input)
+        if semantic_results:
             for idx, score in semantic_results:
-                section = self.ipc_sections[idx].copy()
-                section['score'] = score
-                section['method'] = 'semantic_search'
-                section['matched_keywords'] = [kw for kw in keywords if any(
-                    SequenceMatcher(None, kw.lower(), sk.lower()).ratio() > 0.7 
-                    for sk in section['keywords']
-                )]
-                results.append(section)
+                results.append(SectionHit(
+                    self.ipc_sections[idx], score, 'semantic_search',
+                    self.matched_keyword_engine.matched_keywords(keywords, idx)
+                ))
         
-        # Method 2: TF-IDF Search (if semantic search failed or as backup)
-        if not results and self.tfidf_matrix is not None:
-            tfidf_results = self.tfidf_search(user_input)
+        # Method 2: TF-IDF (or BM25) Search (if semantic search failed or as backup)
+        if not results:
+            method = 'bm25_search' if self.bm25_index is not None else 'tfidf_search'
             for idx, score in tfidf_results:
-                section = self.ipc_sections[idx].copy()
-                section['score'] = score
-                section['method'] = 'tfidf_search'
-                section['matched_keywords'] = [kw for kw in keywords if any(
-                    SequenceMatcher(None, kw.lower(), sk.lower()).ratio() > 0.7 
-                    for sk in section['keywords']
-                )]
-                results.append(section)
+                results.append(SectionHit(
+                    self.ipc_sections[idx], score, method,
+                    self.matched_keyword_engine.matched_keywords(keywords, idx)
+                ))
         
         # Method 3: Traditional keyword matching (fallback)
         if not results:
-            for section in self.ipc_sections:
+            fallback_started = time.perf_counter()
+            section_matches = self.keyword_index.match(keywords)
+            for section_idx in sorted(section_matches):
+                section = self.ipc_sections[section_idx]
                 score = 0
                 matched_keywords = []
                 
-                for keyword in keywords:
-                    for section_keyword in section['keywords']:
-                        similarity = SequenceMatcher(None, keyword.lower(), section_keyword.lower()).ratio()
-                        if similarity > 0.7:
-                            score += similarity * 2
-                            matched_keywords.append(keyword)
-                        elif similarity > 0.5:
-                            score += similarity
+                for keyword, _, similarity in section_matches[section_idx]:
+                    if similarity > 0.7:
+                        score += similarity * 2
+                        matched_keywords.append(keyword)
+                    elif similarity > 0.5:
+                        score += similarity
                 
                 if score > 0:
-                    section_copy = section.copy()
-                    section_copy['score'] = score / len(keywords) if keywords else 0
-                    section_copy['method'] = 'keyword_matching'
-                    section_copy['matched_keywords'] = matched_keywords
-                    results.append(section_copy)
+                    results.append(SectionHit(
+                        section, score / len(keywords) if keywords else 0, 'keyword_matching', matched_keywords
+                    ))
+            FALLBACK_MATCHING_SECONDS.observe(time.perf_counter() - fallback_started)
         
         # Sort by score and remove duplicates
         seen_sections = set()
@@ -265,8 +333,8 @@ Keep the response concise but comprehensive.
         
         return unique_results[:5]
     
-    def generate_enhanced_response(self, user_input: str, relevant_sections: List[Dict]) -> Dict:
-        """Generate enhanced response with LLM suggestions"""
+    def generate_enhanced_response(self, user_input: str, relevant_sections: List[Dict], include_llm: bool = True) -> Dict:
+        """Generate enhanced response with LLM suggestions (include_llm=False renders the sections only)"""
         if not relevant_sections:
             return {
                 "message": "I couldn't find any specific IPC sections that match your description. Please try rephrasing your query or provide more details about the incident.",
@@ -300,7 +368,7 @@ Keep the response concise but comprehensive.
         # Get LLM enhancement if available
         enhanced_analysis = None
         suggestions = []
-        if self.use_llm:
+        if self.use_llm and include_llm:
             logger.info("Attempting LLM enhancement...")
             enhanced_analysis = self.llm_enhance_analysis(user_input, relevant_sections)
             logger.info(f"LLM enhancement result: {enhanced_analysis}")
@@ -373,4 +441,22 @@ Keep the response concise but comprehensive.
         }
 
 # Global instance
-ml_enhancer = MLEnhancer()
+_ml_enhancer = None
+_ml_enhancer_lock = threading.Lock()
+
+
+def get_ml_enhancer() -> MLEnhancer:
+    """Return the process-wide MLEnhancer, building it on first use"""
+    global _ml_enhancer
+    if _ml_enhancer is None:
+        with _ml_enhancer_lock:
+            if _ml_enhancer is None:
+                _ml_enhancer = MLEnhancer()
+    return _ml_enhancer
+
+
+def __getattr__(name):
+    # `from ml_enhancer import ml_enhancer` keeps working but no longer builds at import time
+    if name == 'ml_enhancer':
+        return get_ml_enhancer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,87 @@
+"""
+Single-pass multi-pattern matcher for crime patterns.
+
+``pattern_matching`` used to call ``re.search`` once per pattern, so its cost
+grew with the number of patterns. PatternAutomaton compiles every literal crime
+pattern into one Aho-Corasick automaton; a single scan of the lowercased query
+reports all (possibly overlapping) occurrences. Patterns containing regex
+syntax are precompiled and checked separately so ``re.search`` semantics are
+preserved for them. The category scores are the same as the per-pattern
+``re.search`` loop produced.
+"""
+import re
+from collections import defaultdict, deque
+from typing import Dict, List, Tuple
+
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+
+class PatternAutomaton:
+    def __init__(self, crime_patterns: Dict[str, List[str]]):
+        """Compile crime patterns (category -> patterns)"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+        # Output id -> category of the pattern
+        self._targets: List[str] = []
+        self._regex_patterns: List[Tuple[str, re.Pattern]] = []
+        self._categories = list(crime_patterns)
+
+        for category, patterns in crime_patterns.items():
+            for pattern in patterns:
+                if REGEX_METACHARACTERS.intersection(pattern):
+                    self._regex_patterns.append((category, re.compile(pattern)))
+                else:
+                    self._add(pattern, category)
+
+        self._build_failure_links()
+
+    def _add(self, text: str, category: str):
+        state = 0
+        for char in text:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(len(self._targets))
+        self._targets.append(category)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state].extend(self._outputs[self._fail[next_state]])
+
+    def scan(self, text: str) -> Dict[str, float]:
+        """Scan the query once; returns category -> number of its patterns found in the query"""
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found.update(outputs[state])
+
+        category_scores = defaultdict(float)
+        for target_id in found:
+            category_scores[self._targets[target_id]] += 1.0
+
+        for category, pattern in self._regex_patterns:
+            if pattern.search(text):
+                category_scores[category] += 1.0
+
+        # In crime_patterns order, like the per-pattern loop, so callers sum boosts in the same order
+        return {category: category_scores[category] for category in self._categories if category in category_scores}
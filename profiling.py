@@ -0,0 +1,114 @@
+"""
+Opt-in cProfile capture of single requests.
+
+A request to a profiled endpoint is profiled when it carries
+`X-Profile: true` together with a valid admin token, or when it is drawn by
+PROFILE_SAMPLE_RATE (a fraction of requests, 0 by default). The profile is
+stored under PROFILE_DIR as a pstats file (open it with `python -m pstats`,
+snakeviz, ...) next to a small JSON description; only the newest
+PROFILE_MAX_FILES are kept. One request is profiled at a time per process, so
+a burst of sampled requests never stacks profilers.
+"""
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from cProfile import Profile
+from io import StringIO
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9]+-[0-9a-f]{8}$')
+
+
+class ProfileStore:
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._active = threading.Lock()
+
+    def start(self) -> Optional[Profile]:
+        """A running profiler for the calling thread, or None while another request is being profiled"""
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiling tool is active in this interpreter
+            self._active.release()
+            logger.warning(f"Could not start request profiler: {e}")
+            return None
+        return profiler
+
+    def stop(self, profiler: Profile):
+        profiler.disable()
+        self._active.release()
+
+    def save(self, profiler: Profile, description: Dict) -> str:
+        """Store a stopped profiler's stats with a description; returns the profile id"""
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        profiler.dump_stats(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        with open(os.path.join(self.directory, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(dict(description, id=profile_id, created_at=time.time()), f)
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        profiles = self.list()
+        for profile in profiles[self.max_files:]:
+            for extension in ('.prof', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, profile['id'] + extension))
+                except OSError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        """Descriptions of the stored profiles, newest first"""
+        profiles = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return profiles
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda profile: profile.get('created_at', 0), reverse=True)
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """The pstats file of a stored profile, or None for an unknown or malformed id"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
+
+    def render_text(self, profile_id: str, sort: str = 'cumulative', limit: int = 50) -> Optional[str]:
+        """The top functions of a stored profile as pstats text"""
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        output = StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+
+def sampled(rate: float = PROFILE_SAMPLE_RATE) -> bool:
+    return rate > 0 and random.random() < rate
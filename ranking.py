@@ -0,0 +1,27 @@
+"""
+Shared top-k selection for the retrieval engines.
+"""
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k highest scores, best first. Equal scores are ordered by
+    higher index first, like the `np.argsort(scores)[::-1][:top_k]` this replaces.
+    Uses partial selection, so the cost is O(n + k log k) instead of a full sort,
+    also when many scores tie with the k-th one (e.g. zeros in a sparse TF-IDF row).
+    """
+    scores = np.asarray(scores)
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < scores.size:
+        kth_score = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+        above = np.flatnonzero(scores > kth_score)
+        # argpartition is arbitrary among scores equal to the k-th one, so pick those ties by index
+        tied = np.flatnonzero(scores == kth_score)
+        candidates = np.concatenate([above, tied[len(tied) - (top_k - len(above)):]])
+    else:
+        candidates = np.arange(scores.size)
+    # Sort by score, then index, both descending
+    order = np.lexsort((-candidates, -scores[candidates]))
+    return candidates[order]
@@ -0,0 +1,166 @@
+"""
+Journal of admin edits (add, update, retire) to the IPC sections.
+
+An edit made through the admin API is applied to the running engine in place
+(AccuracyImprover.add_section / update_section / retire_section) and appended
+as one JSON line to data/section_edits.jsonl. The first line of the journal
+records the hash of data/ipc_sections.json the edits apply to, so an engine
+built from that file can replay them (after a restart, or in another gunicorn
+worker) and an engine built from a different file ignores them.
+
+data/ipc_sections.json stays the source of truth for full builds. Compaction
+folds the journal into it and removes the journal; the rebuild that follows
+refits the TF-IDF vocabulary and IDF over every section exactly.
+
+The journal methods do not lock by themselves: callers hold ``locked()``, an
+exclusive file lock that also serializes workers sharing the data directory.
+"""
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from index_artifacts import IPC_SECTIONS_PATH, file_sha256
+
+logger = logging.getLogger(__name__)
+
+SECTION_EDITS_PATH = os.getenv('SECTION_EDITS_PATH', 'data/section_edits.jsonl')
+EDIT_OPS = ('add', 'update', 'retire')
+
+
+class SectionExistsError(ValueError):
+    """Adding a section whose number is already in use"""
+
+
+def validate_section(section: Dict) -> Dict:
+    """Check the fields of a section submitted through the admin API; returns a normalized copy"""
+    if not isinstance(section, dict):
+        raise ValueError("A section must be a JSON object")
+    section = dict(section)
+    section_number = str(section.get('section_number', '')).strip()
+    if not section_number:
+        raise ValueError("section_number is required")
+    section['section_number'] = section_number
+    for field in ('title', 'description'):
+        if not isinstance(section.get(field), str) or not section[field].strip():
+            raise ValueError(f"{field} is required and must be a string")
+    keywords = section.get('keywords', [])
+    if not isinstance(keywords, (list, tuple)) or not all(isinstance(keyword, str) for keyword in keywords):
+        raise ValueError("keywords must be a list of strings")
+    section['keywords'] = list(keywords)
+    section.pop('expanded_keywords', None)
+    return section
+
+
+def merge_section(current: Dict, fields: Dict) -> Dict:
+    """The section that results from updating current with fields (section_number cannot change)"""
+    section_number = str(current['section_number'])
+    if str(fields.get('section_number', section_number)) != section_number:
+        raise ValueError("section_number cannot be changed; retire the section and add a new one")
+    merged = {key: value for key, value in current.items() if key != 'expanded_keywords'}
+    merged.update(fields)
+    return validate_section(merged)
+
+
+def apply_section_edit(sections: List[Dict], edit: Dict):
+    """Apply one journal edit to a list of section dicts in place (KeyError/ValueError if it does not apply)"""
+    op = edit.get('op')
+    if op == 'add':
+        section = validate_section(edit['section'])
+        if any(str(existing['section_number']) == section['section_number'] for existing in sections):
+            raise SectionExistsError(f"Section {section['section_number']} already exists")
+        sections.append(section)
+        return
+    if op not in EDIT_OPS:
+        raise ValueError(f"Unknown section edit: {op}")
+
+    section_number = str(edit['section_number'])
+    for position, existing in enumerate(sections):
+        if str(existing['section_number']) == section_number:
+            break
+    else:
+        raise KeyError(section_number)
+    if op == 'update':
+        sections[position] = merge_section(existing, edit['section'])
+    else:
+        del sections[position]
+
+
+class SectionEditJournal:
+    def __init__(self, path: str = SECTION_EDITS_PATH, sections_path: str = IPC_SECTIONS_PATH):
+        self.path = path
+        self.sections_path = sections_path
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock over the journal and the sections file, across threads and processes"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self) -> Tuple[Optional[str], List[Dict]]:
+        """Return (hash of the sections file the edits apply to, edits); (None, []) without a journal"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None, []
+        # A line without its newline is still being appended by another process
+        lines = content.split('\n')[:-1]
+        if not lines:
+            return None, []
+        base = json.loads(lines[0]).get('base_sha256')
+        return base, [json.loads(line) for line in lines[1:] if line.strip()]
+
+    def append(self, edit: Dict) -> Tuple[str, int]:
+        """Append one edit; returns (base hash, number of edits in the journal)"""
+        base, edits = self.read()
+        lines = []
+        if base is None:
+            base = file_sha256(self.sections_path)
+            lines.append(json.dumps({'base_sha256': base}))
+        lines.append(json.dumps(edit, ensure_ascii=False))
+        payload = ''.join(line + '\n' for line in lines).encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return base, len(edits) + 1
+
+    def pending(self) -> int:
+        return len(self.read()[1])
+
+    def fold(self) -> int:
+        """Write the journaled edits into the sections file and remove the journal; returns how many were folded"""
+        base, edits = self.read()
+        if not edits:
+            return 0
+        with open(self.sections_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if base != file_sha256(self.sections_path):
+            logger.warning(f"{self.sections_path} changed after the section edits were journaled, folding them anyway")
+
+        sections = data.get('sections', [])
+        for edit in edits:
+            try:
+                apply_section_edit(sections, edit)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping section edit that no longer applies ({edit.get('op')}): {e}")
+        data['sections'] = sections
+
+        with open(self.sections_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(self.sections_path + '.tmp', self.sections_path)
+        os.remove(self.path)
+        logger.info(f"Folded {len(edits)} section edits into {self.sections_path}")
+        return len(edits)
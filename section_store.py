@@ -0,0 +1,164 @@
+"""
+Shared, read-only store of IPC sections.
+
+data/ipc_sections.json is parsed once per process into compact SectionRecord
+objects (``__slots__``, interned strings, keyword tuples) that every engine
+shares, with O(1) lookup by section number. Search results are SectionHit
+objects that reference their section instead of copying it. Both are
+read-only Mappings, so existing ``section['title']`` style access keeps
+working; use ``dict(record)`` (or to_json_compatible) to serialize them.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IPC_SECTIONS_PATH = 'data/ipc_sections.json'
+SECTION_FIELDS = ('section_number', 'title', 'keywords', 'description', 'punishment')
+_MISSING = object()
+
+
+def _intern_keywords(keywords: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(sys.intern(str(keyword)) for keyword in keywords)
+
+
+class SectionRecord(Mapping):
+    """One IPC section; expanded_keywords is only present on expanded sections"""
+    __slots__ = SECTION_FIELDS + ('expanded_keywords', 'extra')
+
+    def __init__(self, section_number, title, keywords, description, punishment=_MISSING,
+                 expanded_keywords=None, extra: Optional[Dict] = None):
+        self.section_number = sys.intern(str(section_number))
+        self.title = sys.intern(title)
+        self.keywords = _intern_keywords(keywords)
+        self.description = sys.intern(description)
+        self.punishment = sys.intern(punishment) if isinstance(punishment, str) else punishment
+        self.expanded_keywords = _intern_keywords(expanded_keywords) if expanded_keywords is not None else None
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, section: Dict) -> 'SectionRecord':
+        known = SECTION_FIELDS + ('expanded_keywords',)
+        return cls(
+            section['section_number'], section['title'], section.get('keywords', ()), section.get('description', ''),
+            section.get('punishment', _MISSING), section.get('expanded_keywords'),
+            {key: value for key, value in section.items() if key not in known}
+        )
+
+    def with_expanded_keywords(self, expanded_keywords: Iterable[str]) -> 'SectionRecord':
+        """A copy of this section carrying expanded_keywords; the other fields are shared, not copied"""
+        record = SectionRecord.__new__(SectionRecord)
+        for field in SECTION_FIELDS + ('extra',):
+            setattr(record, field, getattr(self, field))
+        record.expanded_keywords = _intern_keywords(expanded_keywords)
+        return record
+
+    def __getitem__(self, key):
+        if key in SECTION_FIELDS or key == 'expanded_keywords':
+            value = getattr(self, key)
+            if value is not _MISSING and not (key == 'expanded_keywords' and value is None):
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in SECTION_FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self.extra:
+            yield from self.extra
+        if self.expanded_keywords is not None:
+            yield 'expanded_keywords'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SectionRecord({self.section_number!r}, {self.title!r})"
+
+
+class SectionHit(Mapping):
+    """A scored search result: the fields of its section plus score, method and matched_keywords"""
+    __slots__ = ('section', 'score', 'method', 'matched_keywords')
+    HIT_FIELDS = ('score', 'method', 'matched_keywords')
+
+    def __init__(self, section: Mapping, score: float, method: str, matched_keywords: List[str]):
+        self.section = section
+        self.score = score
+        self.method = method
+        self.matched_keywords = matched_keywords
+
+    def __getitem__(self, key):
+        if key in SectionHit.HIT_FIELDS:
+            return getattr(self, key)
+        return self.section[key]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.section
+        yield from SectionHit.HIT_FIELDS
+
+    def __len__(self) -> int:
+        return len(self.section) + len(SectionHit.HIT_FIELDS)
+
+    def __repr__(self):
+        return f"SectionHit({self.section['section_number']!r}, score={self.score!r}, method={self.method!r})"
+
+
+class SectionStore:
+    def __init__(self, sections: Iterable[SectionRecord]):
+        self.sections = tuple(sections)
+        self.by_number = {section.section_number: section for section in self.sections}
+
+    @classmethod
+    def from_file(cls, path: str = IPC_SECTIONS_PATH) -> 'SectionStore':
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Failed to load IPC sections: {e}")
+            return cls(())
+        return cls(SectionRecord.from_dict(section) for section in data.get('sections', []))
+
+    def get(self, section_number) -> Optional[SectionRecord]:
+        return self.by_number.get(str(section_number))
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    def __iter__(self) -> Iterator[SectionRecord]:
+        return iter(self.sections)
+
+    def __getitem__(self, idx: int) -> SectionRecord:
+        return self.sections[idx]
+
+
+_stores: Dict[str, Tuple[Tuple[int, int], SectionStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def get_section_store(path: str = IPC_SECTIONS_PATH) -> SectionStore:
+    """Return the process-wide store for path, re-reading the file only when it changed on disk"""
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = (0, 0)
+    with _stores_lock:
+        cached = _stores.get(path)
+        if cached is None or cached[0] != version:
+            cached = (version, SectionStore.from_file(path))
+            _stores[path] = cached
+        return cached[1]
+
+
+def to_json_compatible(value):
+    """json.dumps default= hook for SectionRecord and SectionHit"""
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -256,6 +256,33 @@ function App() {
       .replace(/\n/g, '<br>')
   }
 
+  // Read a Server-Sent Events response body and call onEvent(event, data) for each event
+  const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    let chunk = await reader.read()
+    while (!chunk.done) {
+      buffer += decoder.decode(chunk.value, { stream: true })
+
+      let boundary
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+
+        let event = 'message'
+        let data = ''
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7)
+          else if (line.startsWith('data: ')) data += line.slice(6)
+        }
+        if (data) onEvent(event, JSON.parse(data))
+      }
+      chunk = await reader.read()
+    }
+  }
+
   const sendMessage = async () => {
     const message = inputValue.trim()
     if (!message || isLoading) return
@@ -273,8 +300,38 @@ function App() {
     setIsTyping(true)
     setIsLoading(true)
 
+    const botMessageId = Date.now() + 1
+    let baseContent = ''
+    let summary = ''
+
+    const showBotMessage = (content) => {
+      setMessages(prev => {
+        if (prev.some(msg => msg.id === botMessageId)) {
+          return prev.map(msg => msg.id === botMessageId ? { ...msg, content } : msg)
+        }
+        return [...prev, { id: botMessageId, type: 'bot', content }]
+      })
+    }
+
+    const handleEvent = (event, data) => {
+      if (event === 'sections') {
+        // Local retrieval is done: show the sections right away
+        baseContent = data.message
+        showBotMessage(baseContent)
+        setIsTyping(false)
+        if (data.suggestions && data.suggestions.length > 0) {
+          setSuggestions(data.suggestions)
+        }
+      } else if (event === 'summary') {
+        summary += data.text
+        showBotMessage(`${baseContent}\n\n🤖 **AI Summary:** ${summary}`)
+      } else if (event === 'error') {
+        showBotMessage(`❌ Error: ${data.error || 'Something went wrong. Please try again.'}`)
+      }
+    }
+
     try {
-      const response = await fetch('/api/analyze', {
+      const response = await fetch('/api/analyze/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -282,23 +339,12 @@ function App() {
         body: JSON.stringify({ description: message })
       })
 
-      const data = await response.json()
-
-      if (response.ok) {
-        const botMessage = {
-          id: Date.now() + 1,
-          type: 'bot',
-          content: data.message
-        }
-        setMessages(prev => [...prev, botMessage])
-        
-        // Set suggestions if available
-        if (data.suggestions && data.suggestions.length > 0) {
-          setSuggestions(data.suggestions)
-        }
+      if (response.ok && response.body) {
+        await readEventStream(response, handleEvent)
       } else {
+        const data = await response.json()
         const errorMessage = {
-          id: Date.now() + 1,
+          id: botMessageId,
           type: 'bot',
           content: `❌ Error: ${data.error || 'Something went wrong. Please try again.'}`
         }
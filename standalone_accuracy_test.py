@@ -2,11 +2,15 @@ import json
 import numpy as np
 from typing import List, Dict, Tuple
 import re
+import time
 from difflib import SequenceMatcher
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
+from evaluation_metrics import MetricsAccumulator, score_case
+from section_store import SectionHit, get_section_store
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,14 +28,8 @@ class StandaloneAccuracyEvaluator:
         self.precompute_embeddings()
         
     def load_ipc_sections(self) -> List[Dict]:
-        """Load IPC sections from JSON file"""
-        try:
-            with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('sections', [])
-        except Exception as e:
-            logger.error(f"Failed to load IPC sections: {e}")
-            return []
+        """IPC sections from the shared read-only section store"""
+        return get_section_store().sections
     
     def precompute_embeddings(self):
         """Pre-compute TF-IDF embeddings for all IPC sections"""
@@ -103,14 +101,12 @@ class StandaloneAccuracyEvaluator:
         if self.tfidf_matrix is not None:
             tfidf_results = self.tfidf_search(user_input)
             for idx, score in tfidf_results:
-                section = self.ipc_sections[idx].copy()
-                section['score'] = score
-                section['method'] = 'tfidf_search'
-                section['matched_keywords'] = [kw for kw in keywords if any(
+                section = self.ipc_sections[idx]
+                matched_keywords = [kw for kw in keywords if any(
                     SequenceMatcher(None, kw.lower(), sk.lower()).ratio() > 0.7 
                     for sk in section['keywords']
                 )]
-                results.append(section)
+                results.append(SectionHit(section, score, 'tfidf_search', matched_keywords))
         
         # Method 2: Traditional keyword matching (fallback)
         if not results:
@@ -128,11 +124,9 @@ class StandaloneAccuracyEvaluator:
                             score += similarity
                 
                 if score > 0:
-                    section_copy = section.copy()
-                    section_copy['score'] = score / len(keywords) if keywords else 0
-                    section_copy['method'] = 'keyword_matching'
-                    section_copy['matched_keywords'] = matched_keywords
-                    results.append(section_copy)
+                    results.append(SectionHit(
+                        section, score / len(keywords) if keywords else 0, 'keyword_matching', matched_keywords
+                    ))
         
         # Sort by score and remove duplicates
         seen_sections = set()
@@ -243,40 +237,13 @@ class StandaloneAccuracyEvaluator:
     def evaluate_single_case(self, test_case: Dict) -> Dict:
         """Evaluate a single test case"""
         query = test_case["query"]
-        expected_sections = set(test_case["expected_sections"])
         
         # Get predictions from ML enhancer
+        start = time.perf_counter()
         relevant_sections = self.find_relevant_sections_enhanced(query)
-        predicted_sections = set([section['section_number'] for section in relevant_sections])
-        
-        # Calculate metrics
-        true_positives = len(expected_sections.intersection(predicted_sections))
-        false_positives = len(predicted_sections - expected_sections)
-        false_negatives = len(expected_sections - predicted_sections)
-        
-        precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-        recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-        accuracy = 1 if expected_sections == predicted_sections else 0
+        latency_ms = (time.perf_counter() - start) * 1000
         
-        # Calculate confidence scores
-        avg_confidence = np.mean([section['score'] for section in relevant_sections]) if relevant_sections else 0
-        
-        return {
-            "query": query,
-            "expected_sections": list(expected_sections),
-            "predicted_sections": list(predicted_sections),
-            "precision": precision,
-            "recall": recall,
-            "f1_score": f1,
-            "accuracy": accuracy,
-            "avg_confidence": avg_confidence,
-            "true_positives": true_positives,
-            "false_positives": false_positives,
-            "false_negatives": false_negatives,
-            "category": test_case["category"],
-            "description": test_case["description"]
-        }
+        return score_case(test_case, relevant_sections, latency_ms)
     
     def evaluate_all_cases(self) -> Dict:
         """Evaluate all test cases and calculate overall metrics"""
@@ -299,59 +266,18 @@ class StandaloneAccuracyEvaluator:
     
     def calculate_overall_metrics(self, results: List[Dict]) -> Dict:
         """Calculate overall accuracy metrics"""
-        total_cases = len(results)
-        
-        # Micro-averaging for precision, recall, F1
-        total_tp = sum(r['true_positives'] for r in results)
-        total_fp = sum(r['false_positives'] for r in results)
-        total_fn = sum(r['false_negatives'] for r in results)
-        
-        micro_precision = total_tp / (total_tp + total_fp) if (total_tp + total_fp) > 0 else 0
-        micro_recall = total_tp / (total_tp + total_fn) if (total_tp + total_fn) > 0 else 0
-        micro_f1 = 2 * (micro_precision * micro_recall) / (micro_precision + micro_recall) if (micro_precision + micro_recall) > 0 else 0
-        
-        # Macro-averaging
-        macro_precision = np.mean([r['precision'] for r in results])
-        macro_recall = np.mean([r['recall'] for r in results])
-        macro_f1 = np.mean([r['f1_score'] for r in results])
-        
-        # Overall accuracy
-        overall_accuracy = np.mean([r['accuracy'] for r in results])
-        avg_confidence = np.mean([r['avg_confidence'] for r in results])
-        
-        return {
-            "total_cases": total_cases,
-            "micro_precision": micro_precision,
-            "micro_recall": micro_recall,
-            "micro_f1": micro_f1,
-            "macro_precision": macro_precision,
-            "macro_recall": macro_recall,
-            "macro_f1": macro_f1,
-            "overall_accuracy": overall_accuracy,
-            "avg_confidence": avg_confidence
-        }
+        return self.accumulate(results).overall()
     
     def calculate_category_metrics(self, results: List[Dict]) -> Dict:
         """Calculate metrics by category"""
-        categories = {}
-        
+        return self.accumulate(results).categories()
+    
+    @staticmethod
+    def accumulate(results: List[Dict]) -> MetricsAccumulator:
+        accumulator = MetricsAccumulator()
         for result in results:
-            category = result['category']
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(result)
-        
-        category_metrics = {}
-        for category, category_results in categories.items():
-            category_metrics[category] = {
-                "count": len(category_results),
-                "avg_precision": np.mean([r['precision'] for r in category_results]),
-                "avg_recall": np.mean([r['recall'] for r in category_results]),
-                "avg_f1": np.mean([r['f1_score'] for r in category_results]),
-                "avg_accuracy": np.mean([r['accuracy'] for r in category_results])
-            }
-        
-        return category_metrics
+            accumulator.add(result)
+        return accumulator
     
     def generate_accuracy_report(self) -> str:
         """Generate a comprehensive accuracy report"""
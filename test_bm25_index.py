@@ -0,0 +1,50 @@
+"""
+MaxScore pruning must return exactly the exhaustive BM25 top-k: same sections,
+same order, same scores. Run with: python -m pytest test_bm25_index.py
+"""
+import json
+import random
+
+from bm25_synthetic import build_index, synthetic_corpus
+
+
+def assert_same_results(index, queries, top_k, exclude=frozenset()):
+    for query in queries:
+        exhaustive = index.search(query, top_k, exclude=exclude)
+        pruned = index.search(query, top_k, exclude=exclude, prune=True)
+        assert pruned == exhaustive, query
+
+
+def test_maxscore_matches_exhaustive_on_synthetic_corpus():
+    docs, queries = synthetic_corpus(3000)
+    index = build_index(docs)
+    for top_k in (1, 5, 10, 50):
+        assert_same_results(index, queries, top_k)
+
+
+def test_maxscore_matches_exhaustive_with_excluded_sections():
+    docs, queries = synthetic_corpus(2000, seed=1)
+    index = build_index(docs)
+    exclude = frozenset(random.Random(1).sample(range(len(docs)), 300))
+    assert_same_results(index, queries, 5, exclude)
+
+
+def test_maxscore_matches_exhaustive_after_incremental_additions():
+    docs, queries = synthetic_corpus(1000, seed=2)
+    index = build_index(docs[:800])
+    for doc_id, doc in enumerate(docs[800:], start=800):
+        index.add_document(doc_id, doc)
+    assert_same_results(index, queries, 5)
+
+
+def test_maxscore_matches_exhaustive_on_ipc_sections():
+    with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
+        sections = json.load(f)['sections']
+    index = build_index([f"{s['title']} {s['description']} {' '.join(s['keywords'])}" for s in sections])
+    queries = [
+        "Someone stole my phone", "A person hit me with a stick during an argument",
+        "Someone threatened me with a knife and demanded money", "My business partner embezzled company funds",
+        "the accused shall be punished with imprisonment and fine", "kidnapping abduction of a minor girl"
+    ]
+    for top_k in (1, 3, 5, 10):
+        assert_same_results(index, queries, top_k)
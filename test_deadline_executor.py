@@ -0,0 +1,58 @@
+"""
+DeadlineExecutor.stream: every call ends with exactly one final status, within
+the deadline, and the pool slot is released. Run with: python -m pytest test_deadline_executor.py
+"""
+import threading
+import time
+
+from deadline_executor import CHUNK, COMPLETED, FAILED, SKIPPED, TIMED_OUT, DeadlineExecutor
+
+
+def test_items_are_relayed_then_completed():
+    executor = DeadlineExecutor(max_workers=1, max_pending=1)
+    assert list(executor.stream(lambda: iter(['a', 'b']), timeout=5)) == [(CHUNK, 'a'), (CHUNK, 'b'), (COMPLETED, None)]
+
+
+def test_producer_that_raises_before_yielding_fails_immediately():
+    def connect():
+        raise RuntimeError("connection refused")
+
+    executor = DeadlineExecutor(max_workers=1, max_pending=1)
+    started = time.monotonic()
+    assert list(executor.stream(connect, timeout=5)) == [(FAILED, None)]
+    assert time.monotonic() - started < 1
+
+
+def test_slow_producer_times_out_and_is_closed():
+    closed = threading.Event()
+
+    def slow():
+        try:
+            yield 'first'
+            time.sleep(0.5)
+            yield 'late'
+        finally:
+            closed.set()
+
+    executor = DeadlineExecutor(max_workers=1, max_pending=1)
+    assert list(executor.stream(slow, timeout=0.2)) == [(CHUNK, 'first'), (TIMED_OUT, None)]
+    assert closed.wait(2)
+
+
+def test_saturated_pool_skips_the_call():
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(2)
+        yield 'done'
+
+    executor = DeadlineExecutor(max_workers=1, max_pending=1)
+    results = []
+    consumer = threading.Thread(target=lambda: results.extend(executor.stream(blocking, timeout=5)))
+    consumer.start()
+    assert started.wait(2)
+    assert list(executor.stream(lambda: iter([]), timeout=5)) == [(SKIPPED, None)]
+    release.set()
+    consumer.join()
+    assert results == [(CHUNK, 'done'), (COMPLETED, None)]
@@ -0,0 +1,110 @@
+"""
+FuzzyKeywordIndex must return exactly what the nested SequenceMatcher loops it
+replaced returned: same sections, same (query keyword, section keyword,
+similarity) tuples, in the same order, including similarities that fall
+exactly on the threshold. Run with: python -m pytest test_keyword_index.py
+"""
+import json
+import random
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from keyword_index import FuzzyKeywordIndex, MatchedKeywordEngine, simple_stem
+
+
+@lru_cache(maxsize=None)
+def ratio(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def brute_force_match(keyword_lists, tokens, min_similarity):
+    """The original fallback loops: every token against every keyword of every section"""
+    section_matches = {}
+    for section_idx, section_keywords in enumerate(keyword_lists):
+        matches = []
+        for token in tokens:
+            for section_keyword in section_keywords:
+                similarity = ratio(token.lower(), section_keyword.lower())
+                if similarity > min_similarity:
+                    matches.append((token, section_keyword.lower(), similarity))
+        if matches:
+            section_matches[section_idx] = matches
+    return section_matches
+
+
+def synthetic_keywords(section_count, seed=0):
+    """Short words over a small alphabet, so many pairs land exactly on 0.4, 0.5 and 0.6"""
+    rng = random.Random(seed)
+    word = lambda: ''.join(rng.choices('abcde', k=rng.randint(2, 6)))
+    keyword_lists = [
+        [word() if rng.random() < 0.8 else f"{word()} {word()}" for _ in range(rng.randint(1, 8))]
+        for _ in range(section_count)
+    ]
+    # Mixed case and repeated keywords within a section
+    keyword_lists[0] += [keyword_lists[0][0].upper(), keyword_lists[0][0]]
+    tokens = [[word() for _ in range(rng.randint(1, 4))] for _ in range(60)]
+    return keyword_lists, tokens
+
+
+def load_ipc_keywords():
+    with open('data/ipc_sections.json', 'r', encoding='utf-8') as f:
+        return [section['keywords'] for section in json.load(f)['sections']]
+
+
+IPC_QUERIES = [
+    ["stole", "phone"], ["hit", "stick", "argument"], ["threatened", "knife"], ["broke", "house", "laptop"],
+    ["theft", "thef", "theif", "stealing"], ["murdr", "kiled", "kidnaped"], ["molested", "crowded", "bus"],
+    ["embezzled", "company", "funds"], ["defamation", "rumours", "rumors"], ["assault", "assaulted", "assualt"]
+]
+
+
+def test_fuzzy_index_matches_brute_force_at_threshold_boundaries():
+    keyword_lists, token_lists = synthetic_keywords(150)
+    for min_similarity in (0.4, 0.5, 0.6, 0.7):
+        index = FuzzyKeywordIndex(keyword_lists, min_similarity=min_similarity)
+        for tokens in token_lists:
+            assert dict(index.match(tokens)) == brute_force_match(keyword_lists, tokens, min_similarity), tokens
+
+
+def test_fuzzy_index_excludes_similarity_equal_to_threshold():
+    # ratio("ab", "ac") == 0.5 exactly; the original loops used a strict comparison
+    index = FuzzyKeywordIndex([["ac"], ["abc"]], min_similarity=0.5)
+    assert SequenceMatcher(None, "ab", "ac").ratio() == 0.5
+    assert dict(index.match(["ab"])) == {1: [("ab", "abc", SequenceMatcher(None, "ab", "abc").ratio())]}
+
+
+def test_fuzzy_index_matches_brute_force_after_added_sections():
+    keyword_lists, token_lists = synthetic_keywords(150, seed=1)
+    index = FuzzyKeywordIndex(keyword_lists[:100], min_similarity=0.5)
+    for section_idx, section_keywords in enumerate(keyword_lists[100:], start=100):
+        index.add_section(section_idx, section_keywords)
+    for tokens in token_lists:
+        assert dict(index.match(tokens)) == brute_force_match(keyword_lists, tokens, 0.5), tokens
+
+
+def test_fuzzy_index_matches_brute_force_on_ipc_keywords():
+    keyword_lists = load_ipc_keywords()
+    for min_similarity in (0.4, 0.5, 0.7):
+        index = FuzzyKeywordIndex(keyword_lists, min_similarity=min_similarity)
+        for tokens in IPC_QUERIES:
+            # Twice: the second lookup is served from the memo
+            for _ in range(2):
+                assert dict(index.match(tokens)) == brute_force_match(keyword_lists, tokens, min_similarity), tokens
+
+
+def test_matched_keywords_match_brute_force_plus_stemmed_hits():
+    keyword_lists = load_ipc_keywords()
+    for min_similarity, threshold in ((0.5, 0.7), (0.4, 0.6)):
+        engine = MatchedKeywordEngine(FuzzyKeywordIndex(keyword_lists, min_similarity=min_similarity), threshold)
+        for tokens in IPC_QUERIES:
+            for section_idx, section_keywords in enumerate(keyword_lists):
+                section_stems = {simple_stem(keyword.lower()) for keyword in section_keywords}
+                # Exact hits always pass the fuzzy test (ratio 1.0); stemmed hits are accepted on purpose
+                expected = [
+                    token for token in tokens
+                    if simple_stem(token.lower()) in section_stems or any(
+                        ratio(token.lower(), keyword.lower()) > threshold
+                        for keyword in section_keywords
+                    )
+                ]
+                assert engine.matched_keywords(tokens, section_idx) == expected, (tokens, section_idx)
@@ -0,0 +1,141 @@
+"""
+Persistent LLM response cache: TTL, size-based LRU eviction, serving stale
+entries on error, and persistence across instances (process restarts).
+Run with: python -m pytest test_llm_cache.py
+"""
+import sqlite3
+import threading
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'llm_responses.sqlite3')
+
+
+def failing_call():
+    raise RuntimeError("Gemini unavailable")
+
+
+def test_response_survives_a_new_instance(cache_path):
+    LLMResponseCache(cache_path).put('gemini-flash', 'prompt', 'summary')
+    cache = LLMResponseCache(cache_path)
+    assert cache.get('gemini-flash', 'prompt') == 'summary'
+    # Keyed by model and prompt
+    assert cache.get('gemini-pro', 'prompt') is None
+    assert cache.get('gemini-flash', 'prompt ') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_entries_expire_after_ttl(cache_path, clock):
+    cache = LLMResponseCache(cache_path, ttl_seconds=3600)
+    cache.put('model', 'prompt', 'summary')
+    clock.now += 3600
+    assert cache.get('model', 'prompt') == 'summary'
+    clock.now += 1
+    assert cache.get('model', 'prompt') is None
+
+
+def test_least_recently_used_entries_are_evicted_beyond_max_bytes(cache_path, clock):
+    cache = LLMResponseCache(cache_path, max_bytes=250)
+    for name in ('a', 'b'):
+        cache.put('model', name, name * 100)
+        clock.now += 1
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('model', 'a') == 'a' * 100
+    clock.now += 1
+    cache.put('model', 'c', 'c' * 100)
+    assert cache.get('model', 'b') is None
+    assert cache.get('model', 'a') == 'a' * 100
+    assert cache.get('model', 'c') == 'c' * 100
+
+
+def stored_sizes(cache_path):
+    connection = sqlite3.connect(cache_path)
+    try:
+        total = connection.execute("SELECT value FROM cache_meta WHERE name = 'total_size'").fetchone()[0]
+        return total, connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_running_size_total_matches_the_stored_responses(cache_path, clock):
+    cache = LLMResponseCache(cache_path, max_bytes=1000)
+    cache.put('model', 'a', 'a' * 300)
+    cache.put('model', 'a', 'a' * 100)  # replaced, not added
+    assert stored_sizes(cache_path) == (100, 100)
+    for i in range(10):
+        clock.now += 1
+        cache.put('model', f"prompt {i}", 'x' * 150)
+    total, actual = stored_sizes(cache_path)
+    assert total == actual <= 1000
+
+    # Several instances (worker processes) writing the same file concurrently
+    def write(worker):
+        other = LLMResponseCache(cache_path, max_bytes=1000)
+        for i in range(50):
+            other.put('model', f"prompt {i % 20}", str(worker) * (50 + i))
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total, actual = stored_sizes(cache_path)
+    assert total == actual <= 1000
+
+
+def test_get_or_generate_calls_the_model_once(cache_path):
+    cache = LLMResponseCache(cache_path)
+    calls = []
+    generate = lambda: calls.append(1) or 'summary'
+    assert cache.get_or_generate('model', 'prompt', generate) == 'summary'
+    assert cache.get_or_generate('model', 'prompt', generate) == 'summary'
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_served_when_the_call_fails(cache_path, clock):
+    cache = LLMResponseCache(cache_path, ttl_seconds=60)
+    cache.put('model', 'prompt', 'old summary')
+    clock.now += 120
+    assert cache.get_or_generate('model', 'prompt', failing_call) == 'old summary'
+    assert (cache.errors, cache.stale_hits) == (1, 1)
+    # A successful call replaces the stale entry
+    assert cache.get_or_generate('model', 'prompt', lambda: 'new summary') == 'new summary'
+    assert cache.get('model', 'prompt') == 'new summary'
+
+
+def test_errors_propagate_without_a_stale_entry_or_when_disabled(cache_path, clock):
+    cache = LLMResponseCache(cache_path, ttl_seconds=60, serve_stale_on_error=False)
+    cache.put('model', 'prompt', 'old summary')
+    clock.now += 120
+    with pytest.raises(RuntimeError):
+        cache.get_or_generate('model', 'prompt', failing_call)
+    with pytest.raises(RuntimeError):
+        LLMResponseCache(cache_path).get_or_generate('model', 'other prompt', failing_call)
+
+
+def test_disabled_cache_stores_nothing(cache_path):
+    cache = LLMResponseCache(cache_path, enabled=False)
+    cache.put('model', 'prompt', 'summary')
+    assert cache.get('model', 'prompt') is None
+    assert LLMResponseCache(cache_path).get('model', 'prompt') is None
@@ -0,0 +1,97 @@
+"""
+Conversation log index: records are stored once, in the segments, and the
+index only points at them, including after a segment has been compressed.
+Run with: python -m pytest test_log_index.py
+"""
+import json
+import os
+import sqlite3
+
+import pytest
+
+import conversation_log
+from conversation_log import ConversationLogWriter, gzip_member_offsets
+from log_index import ConversationLogIndex
+
+
+def write_logs(directory, count, compress=False, max_segment_bytes=64 * 1024 * 1024):
+    index = ConversationLogIndex(os.path.join(directory, 'index.sqlite3'))
+    writer = ConversationLogWriter(directory=directory, index=index, compress=compress,
+                                   max_segment_bytes=max_segment_bytes)
+    records = [
+        {'timestamp': f"2026-01-01T00:00:{i:02d}", 'session_id': f"s{i % 3}", 'user_input': f"query {i} – ünïcode"}
+        for i in range(count)
+    ]
+    for record in records:
+        writer.write(record)
+        # Segments rotate between batches
+        writer.flush()
+    writer.close()
+    return index, records
+
+
+def read_all_pages(index, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = index.query(limit=7, cursor=cursor, **filters)
+        pages.extend(page)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_pages_and_export_read_records_from_segments(tmp_path, compress):
+    index, records = write_logs(str(tmp_path), 40, compress=compress, max_segment_bytes=1000)
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith('conversations-'))
+    assert len(segments) > 1
+    assert all(name.endswith('.jsonl.gz') for name in segments) == compress
+
+    assert read_all_pages(index) == records[::-1]
+    assert read_all_pages(index, session_id='s1') == [r for r in records[::-1] if r['session_id'] == 's1']
+    assert [json.loads(line) for line in index.export(since='2026-01-01T00:00:10')] == records[10:]
+
+
+def test_index_stores_positions_not_records(tmp_path):
+    index, _ = write_logs(str(tmp_path), 5)
+    columns = [row[1] for row in sqlite3.connect(index.path).execute("PRAGMA table_info(conversations)")]
+    assert 'record' not in columns
+    assert {'segment', 'offset', 'length'} <= set(columns)
+
+
+def test_compression_renames_indexed_segment(tmp_path):
+    index, _ = write_logs(str(tmp_path), 3, compress=True)
+    segments = {row[0] for row in sqlite3.connect(index.path).execute("SELECT segment FROM conversations")}
+    assert len(segments) == 1 and segments.pop().endswith('.jsonl.gz')
+
+
+def test_rebuild_indexes_segments_and_legacy_files(tmp_path):
+    index, records = write_logs(str(tmp_path), 10, compress=True)
+    legacy = {'timestamp': '2025-12-31T23:59:59', 'session_id': 's0', 'user_input': 'legacy'}
+    with open(tmp_path / 'conversation_legacy.json', 'w', encoding='utf-8') as f:
+        json.dump(legacy, f, indent=2)
+    index.rebuild()
+    assert index.count() == 11
+    assert read_all_pages(index) == records[::-1] + [legacy]
+
+
+def test_compressed_records_are_read_from_their_own_block(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation_log, 'COMPRESSED_BLOCK_BYTES', 256)
+    index, records = write_logs(str(tmp_path), 40, compress=True)
+    (segment,) = [name for name in os.listdir(tmp_path) if name.endswith('.jsonl.gz')]
+    blocks = index._blocks(segment)
+    assert len(blocks) > 10
+    # The writer's block table is what a rebuild recovers from the gzip members
+    assert gzip_member_offsets(str(tmp_path / segment)) == blocks
+
+    # Records crossing block boundaries, read in any order
+    assert read_all_pages(index) == records[::-1]
+    index.rebuild()
+    assert index._blocks(segment) == blocks
+    assert read_all_pages(index) == records[::-1]
+
+    # The newest record is still readable with the start of the segment destroyed,
+    # so reading it did not decompress the blocks before its own
+    with open(tmp_path / segment, 'r+b') as f:
+        f.write(b'\0' * blocks[1][1])
+    page, _ = index.query(limit=1)
+    assert page == [records[-1]]
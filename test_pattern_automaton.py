@@ -0,0 +1,48 @@
+"""
+PatternAutomaton must return exactly what the per-pattern re.search loop it
+replaced returned, including the category order that callers sum boosts in.
+Run with: python -m pytest test_pattern_automaton.py
+"""
+import re
+from collections import defaultdict
+
+from improve_accuracy import AccuracyImprover
+from pattern_automaton import PatternAutomaton
+
+
+def re_search_loop(crime_patterns, query):
+    """The original pattern_matching body"""
+    pattern_scores = defaultdict(float)
+    for category, patterns in crime_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, query.lower()):
+                pattern_scores[category] += 1.0
+    return dict(pattern_scores)
+
+
+def assert_same(crime_patterns, query):
+    expected = re_search_loop(crime_patterns, query)
+    actual = PatternAutomaton(crime_patterns).scan(query)
+    assert actual == expected and list(actual) == list(expected), query
+
+
+def test_matches_re_search_on_crime_patterns():
+    crime_patterns = AccuracyImprover.load_crime_patterns(None)
+    queries = [
+        "stole phone", "hit stick argument", "threatened knife", "broke house laptop", "murdr kiled kidnaped",
+        "molested crowded bus", "embezzled company funds", "Someone STOLE my phone and threatened to kill me",
+        "he beat and assaulted my brother with a rod", "they kidnapped and abducted the child",
+        "forged documents, cheated and defrauded us", ""
+    ]
+    for query in queries:
+        assert_same(crime_patterns, query)
+
+
+def test_overlapping_duplicate_and_regex_patterns():
+    crime_patterns = {
+        'regex': [r'\bhit\b', 'st.le'],
+        'theft': ['steal', 'stole', 'stole'],
+        'overlap': ['he', 'she', 'hers', 'his'],
+    }
+    for query in ("ushers stole and stole", "she hit him", "white shirt", "stale hitch", "his"):
+        assert_same(crime_patterns, query)
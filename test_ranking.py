@@ -0,0 +1,58 @@
+"""
+top_k_indices must return what the full sort it replaced returned,
+np.argsort(scores)[::-1][:top_k] with ties by higher index first, without
+sorting more than top_k candidates. Run with: python -m pytest test_ranking.py
+"""
+import numpy as np
+
+import ranking
+from ranking import top_k_indices
+
+
+def full_sort_top_k(scores, top_k):
+    return np.argsort(scores, kind='stable')[::-1][:top_k]
+
+
+def test_matches_full_sort_with_many_ties():
+    rng = np.random.default_rng(0)
+    for size in (1, 2, 7, 50, 1000):
+        for _ in range(50):
+            # Few distinct values, so the k-th score is usually tied
+            scores = rng.integers(0, 4, size).astype(np.float64) / 4
+            for top_k in (1, 3, 5, 10, size, size + 5):
+                assert top_k_indices(scores, top_k).tolist() == full_sort_top_k(scores, top_k).tolist()
+
+
+def test_matches_full_sort_on_continuous_scores():
+    rng = np.random.default_rng(1)
+    scores = rng.random(5000)
+    for top_k in (1, 5, 100):
+        assert top_k_indices(scores, top_k).tolist() == full_sort_top_k(scores, top_k).tolist()
+
+
+def test_all_zero_and_sparse_rows():
+    zeros = np.zeros(100)
+    assert top_k_indices(zeros, 3).tolist() == [99, 98, 97]
+    sparse = np.zeros(100)
+    sparse[[10, 40]] = [0.2, 0.5]
+    assert top_k_indices(sparse, 5).tolist() == [40, 10, 99, 98, 97]
+
+
+def test_sorts_only_top_k_candidates_when_most_scores_tie(monkeypatch):
+    sorted_sizes = []
+    lexsort = np.lexsort
+
+    def recording_lexsort(keys):
+        sorted_sizes.append(len(keys[0]))
+        return lexsort(keys)
+
+    monkeypatch.setattr(ranking.np, 'lexsort', recording_lexsort)
+    scores = np.zeros(100_000)
+    scores[[5, 500]] = [0.3, 0.1]
+    assert top_k_indices(scores, 10)[:2].tolist() == [5, 500]
+    assert sorted_sizes == [10]
+
+
+def test_empty_inputs():
+    assert top_k_indices(np.array([]), 5).tolist() == []
+    assert top_k_indices(np.array([0.5, 0.1]), 0).tolist() == []
@@ -0,0 +1,109 @@
+"""
+Section lookup cache: LRU and TTL eviction, and invalidation through the
+engine generation that is part of every cache key in app.py.
+Run with: python -m pytest test_result_cache.py
+"""
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_normalize_query_collapses_case_and_whitespace():
+    assert normalize_query("  Someone   STOLE\tmy phone \n") == "someone stole my phone"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put('a', 1)
+    clock.now += 59.9
+    assert cache.get('a') == 1
+    clock.now += 0.1
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries'], stats['evictions']) == (1, 1, 0, 1)
+
+
+def test_invalidate_drops_every_entry():
+    cache = ResultCache()
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.invalidate()
+    assert cache.get('a') is None and cache.get('b') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_zero_size_disables_caching():
+    cache = ResultCache(max_entries=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert cache.stats()['enabled'] is False
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    os.environ.setdefault('ENABLE_CONVERSATION_LOGS', 'false')
+    os.environ.setdefault('IPC_DATA_AUTO_RELOAD', 'false')
+    import app
+    return app
+
+
+def test_engine_swap_starts_a_new_cache_generation(app_module):
+    app = app_module
+    query = "Someone stole my phone"
+    app.result_cache.invalidate()
+    first = app.find_relevant_sections(query)
+    hits = app.result_cache.hits
+    # Differently spelled, same normalized query
+    assert app.find_relevant_sections("  someone STOLE my phone ") == first
+    assert app.result_cache.hits == hits + 1
+
+    generation = app.engine_generation
+    app.swap_engine(app.get_engine())
+    assert app.engine_generation == generation + 1
+    assert app.result_cache.stats()['entries'] == 0
+
+    # An entry written under the old generation (a lookup that raced the swap) is never served
+    stale_key = (app.get_active_engine_name(), generation, normalize_query(query))
+    app.result_cache.put(stale_key, [])
+    misses = app.result_cache.misses
+    assert app.find_relevant_sections(query) == first
+    assert app.result_cache.misses == misses + 1
+
+
+def test_batch_lookups_share_the_cache(app_module):
+    app = app_module
+    app.result_cache.invalidate()
+    single = app.find_relevant_sections("A person hit me with a stick")
+    hits = app.result_cache.hits
+    batch = app.find_relevant_sections_batch(["a person hit me with a stick", "Someone kidnapped my child"])
+    assert batch[0] == single
+    assert app.result_cache.hits == hits + 1